@@ -3,6 +3,8 @@ import json
 import asyncio
 import os
 
+from utils.tracing import span
+
 
 class MultiMCPClient:
 
@@ -32,8 +34,11 @@ class MultiMCPClient:
     async def call_mcp_tool(self, mcp_name: str, tool_name: str, args: dict):
         client = MultiServerMCPClient(self.mcp_config)
         try:
-            async with client.session(mcp_name) as session:
-                res = await session.call_tool(tool_name, args)
+            # 外层区间包含会话建立与关闭，与内层工具调用区间的差值即会话开销
+            with span("mcp_session", "mcp", server=mcp_name):
+                async with client.session(mcp_name) as session:
+                    with span(f"mcp_call:{tool_name}", "mcp"):
+                        res = await session.call_tool(tool_name, args)
             return res
         finally:
             # 确保客户端被正确关闭
@@ -1,6 +1,7 @@
 import sys
 import os
 from pathlib import Path
+from typing import Union
 
 # 添加项目根目录到Python路径
 project_root = Path(__file__).parent.parent
@@ -10,6 +11,10 @@ from mcp.server.fastmcp import FastMCP
 from tools.local_tools import web_search, read_file, file_generation, image_generation, data_chart
 from openai import OpenAI
 import mcp_server_fetch
+from config import settings
+from tools.llm_usage import ROUTE_CHAT, ROUTE_GENERATE, track_llm_call
+from tools.worker_pool import ToolWorkerPool
+from utils.tokens import estimate_tokens
 
 
 # 创建 FastMCP 服务器
@@ -21,64 +26,83 @@ mcp = FastMCP(
     port=8001,
 )
 
+# 工具执行池：CPU密集的工具（图表代码执行、文件解析）在工作进程中并行执行，其余工具在线程中执行，
+# 服务器事件循环不被同步工具阻塞，多个用户的调用可同时进行。
+# 工具中的LLM调用用量随结果返回（回答类工具的文本结果此时包装为字典，返回类型因此声明为Union[str, dict]）
+tool_workers = ToolWorkerPool(
+    settings.TOOL_PROCESS_WORKERS,
+    settings.TOOL_PROCESS_TOOLS,
+    settings.TOOL_PROCESS_MAX_TASKS_PER_CHILD
+)
+
 # 注册所有工具到MCP服务器
 @mcp.tool()
-def web_search_tool(query: str) -> dict:
+async def web_search_tool(query: str) -> dict:
     """使用searxng搜索网络信息，获取最新资讯和相关页面"""
-    return web_search(query)
+    return await tool_workers.run("web_search_tool", web_search, query)
 
 @mcp.tool()
-def read_file_tool(file_path: str) -> str:
+async def read_file_tool(file_path: str) -> str:
     """读取各种类型的文件内容，支持txt、pdf、docx、xlsx、图片等格式"""
-    return read_file(file_path)
+    return await tool_workers.run("read_file_tool", read_file, file_path)
 
 @mcp.tool()
-def file_generation_tool(prompt: str, file_type: str, file_name: str, output_dir: str = "./generated_files") -> dict:
+async def file_generation_tool(prompt: str, file_type: str, file_name: str, output_dir: str = "./generated_files") -> dict:
     """根据提示词生成各种类型的文件，如txt、py、html、md、json等"""
-    return file_generation(prompt, file_type, file_name, output_dir)
+    return await tool_workers.run("file_generation_tool", file_generation, prompt, file_type, file_name, output_dir)
 
 @mcp.tool()
-def image_generation_tool(prompt: str, negative_prompt: str = "", size: str = "1024x1024", n: int = 1) -> dict:
+async def image_generation_tool(prompt: str, negative_prompt: str = "", size: str = "1024x1024", n: int = 1) -> dict:
     """根据文本描述生成图片，支持各种尺寸和风格"""
-    return image_generation(prompt, negative_prompt, size, n)
+    return await tool_workers.run("image_generation_tool", image_generation, prompt, negative_prompt, size, n)
 
 @mcp.tool()
-def data_chart_tool(data_description: str, chart_type: str = "bar") -> dict:
+async def data_chart_tool(data_description: str, chart_type: str = "bar") -> dict:
     """根据数据描述生成图表"""
-    return data_chart(data_description, chart_type)
+    return await tool_workers.run("data_chart_tool", data_chart, data_description, chart_type)
 
 @mcp.tool()
-def generate_answer_tool(query: str) -> str:
+async def generate_answer_tool(query: str) -> Union[str, dict]:
     """使用AI大模型回答用户问题，进行文本分析、总结、翻译、解释等"""
+    return await tool_workers.run("generate_answer_tool", _generate_answer, query)
+
+def _generate_answer(query: str) -> str:
     client = OpenAI(api_key="sk-proj-1234567890", base_url="http://180.153.21.76:17009/v1")
     try:
         print(f"🤖 AI正在思考: {query[:50]}...")
-        response = client.chat.completions.create(
-            model="Qwen-72B",
-            messages=[
-                {"role": "system", "content": "你是一个有用的AI助手，请直接回答用户的问题。"}, 
-                {"role": "user", "content": query}
-            ],
-            temperature=0.5,
-            stream=True
-        )
-        
-        # 处理流式响应
-        full_response = ""
-        for chunk in response:
-            if chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
-                print(content, end="", flush=True)
-                full_response += content
-        print()  # 换行
+        with track_llm_call(ROUTE_GENERATE, default_model="Qwen-72B", latency_budget=60) as call:
+            response = client.chat.completions.create(
+                model=call.model,
+                timeout=call.timeout,
+                messages=[
+                    {"role": "system", "content": "你是一个有用的AI助手，请直接回答用户的问题。"}, 
+                    {"role": "user", "content": query}
+                ],
+                temperature=0.5,
+                stream=True
+            )
+            
+            # 处理流式响应
+            full_response = ""
+            for chunk in response:
+                if chunk.choices[0].delta.content:
+                    content = chunk.choices[0].delta.content
+                    print(content, end="", flush=True)
+                    full_response += content
+            print()  # 换行
+            call.prompt_tokens = estimate_tokens(query)
+            call.completion_tokens = estimate_tokens(full_response)
         
         return full_response
     except Exception as e:
         return f"AI回答失败: {str(e)}"
 
 @mcp.tool()
-def rhetorical_reason(user_query: str) -> str:
+async def rhetorical_reason(user_query: str) -> Union[str, dict]:
     """如果用户问题需要追问，才可以更好的解决用户问题，则调用该工具"""
+    return await tool_workers.run("rhetorical_reason", _rhetorical_reason, user_query)
+
+def _rhetorical_reason(user_query: str) -> str:
     REASON_SYSTEM_PROMPT = """
 # 角色：
 
@@ -93,28 +117,35 @@ def rhetorical_reason(user_query: str) -> str:
     client = OpenAI(api_key="sk-proj-1234567890", base_url="http://180.153.21.76:17009/v1")
     
     print(f"🤔 分析用户需求: {user_query[:50]}...")
-    response = client.chat.completions.create(
-        model="Qwen-72B",
-        messages=[
-            {"role": "system", "content": REASON_SYSTEM_PROMPT}, 
-            {"role": "user", "content": user_query}
-        ],
-        stream=True
-    )
-    
-    # 处理流式响应
-    full_response = ""
-    for chunk in response:
-        if chunk.choices[0].delta.content:
-            content = chunk.choices[0].delta.content
-            print(content, end="", flush=True)
-            full_response += content
-    print()  # 换行
+    with track_llm_call(ROUTE_CHAT, default_model="Qwen-72B", latency_budget=10) as call:
+        response = client.chat.completions.create(
+            model=call.model,
+            timeout=call.timeout,
+            messages=[
+                {"role": "system", "content": REASON_SYSTEM_PROMPT}, 
+                {"role": "user", "content": user_query}
+            ],
+            stream=True
+        )
+        
+        # 处理流式响应
+        full_response = ""
+        for chunk in response:
+            if chunk.choices[0].delta.content:
+                content = chunk.choices[0].delta.content
+                print(content, end="", flush=True)
+                full_response += content
+        print()  # 换行
+        call.prompt_tokens = estimate_tokens(REASON_SYSTEM_PROMPT + user_query)
+        call.completion_tokens = estimate_tokens(full_response)
     
     return full_response
 
 if __name__ == "__main__":
-    mcp.run(transport="streamable-http")
+    try:
+        mcp.run(transport="streamable-http")
+    finally:
+        tool_workers.shutdown()
 
 
 # sk-8c40f79ea2044d0cbb9f7056aa5ec298
\ No newline at end of file
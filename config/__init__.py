@@ -3,4 +3,8 @@
 包含系统配置和设置
 """
 
-__all__ = [] 
\ No newline at end of file
+from . import settings
+
+__all__ = [
+    'settings'
+]
\ No newline at end of file
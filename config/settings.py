@@ -0,0 +1,191 @@
+"""
+系统配置
+各配置项均可通过环境变量覆盖，便于按部署环境调整
+"""
+
+import os
+from pathlib import Path
+
+# ========== 任务规划 ==========
+
+# 任务分诊模式：
+#   parallel - 改进检测、对话检测、明确度分析、任务类型分析分别调用并行执行
+#   combined - 单次结构化输出调用同时得出全部分诊结果
+TRIAGE_MODE = os.getenv("TRIAGE_MODE", "parallel")
+
+# 执行模式：
+#   sequential - 完整计划生成后再执行
+#   pipelined  - 流式规划过程中每解析出一个步骤就立即执行，首个结果无需等待整个计划生成
+EXECUTION_MODE = os.getenv("EXECUTION_MODE", "sequential")
+# 同时执行的步骤数上限（所有任务共享），互不依赖的步骤在该上限内并行执行
+MAX_PARALLEL_STEPS = int(os.getenv("MAX_PARALLEL_STEPS", "4"))
+# 单个工具的并发上限，格式 "工具名:上限,工具名:上限"，未配置的工具只受全局上限约束
+TOOL_CONCURRENCY_LIMITS = {
+    name.strip(): int(limit) for name, limit in (
+        item.split(":", 1) for item in os.getenv("TOOL_CONCURRENCY_LIMITS", "image_generation_tool:1").split(",")
+        if ":" in item
+    )
+}
+
+# 工具调用超时(秒)，超时的步骤标记为失败并释放并发名额；实际等待不超过任务剩余时间
+TOOL_DEFAULT_TIMEOUT = float(os.getenv("TOOL_DEFAULT_TIMEOUT", "300"))
+# 单个工具的超时，格式 "工具名:秒数,工具名:秒数"，未配置的工具使用TOOL_DEFAULT_TIMEOUT
+TOOL_TIMEOUTS = {
+    name.strip(): float(timeout) for name, timeout in (
+        item.split(":", 1) for item in os.getenv(
+            "TOOL_TIMEOUTS", "web_search_tool:60,read_file_tool:120,image_generation_tool:240"
+        ).split(",") if ":" in item
+    )
+}
+# 图片生成任务轮询的最长等待(秒)
+IMAGE_GENERATION_POLL_TIMEOUT = float(os.getenv("IMAGE_GENERATION_POLL_TIMEOUT", "180"))
+# 图表生成（含代码修正重试）的最长耗时(秒)
+CHART_GENERATION_TIMEOUT = float(os.getenv("CHART_GENERATION_TIMEOUT", "240"))
+
+# 是否启用本地对话分类器（高置信度时直接判断对话/任务，不调用LLM）
+# 默认关闭：需先用包含"问候+任务"混合输入的基准测试确认不会把任务误判为对话
+CONVERSATION_CLASSIFIER_ENABLED = os.getenv("CONVERSATION_CLASSIFIER_ENABLED", "false").lower() == "true"
+# 本地对话分类器置信度阈值，低于该值时交由LLM判断
+CONVERSATION_CLASSIFIER_THRESHOLD = float(os.getenv("CONVERSATION_CLASSIFIER_THRESHOLD", "0.99"))
+# 训练本地对话分类器所用的历史报告目录
+CONVERSATION_CLASSIFIER_REPORTS_DIR = os.getenv(
+    "CONVERSATION_CLASSIFIER_REPORTS_DIR",
+    str(Path(__file__).parent.parent / "execution_results" / "reports")
+)
+
+# ========== 计划缓存 ==========
+
+# 是否启用执行计划缓存（按归一化输入 + 工具清单版本缓存LLM生成的计划）
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE_ENABLED", "true").lower() == "true"
+# 内存中最多缓存的计划数
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "256"))
+# 缓存有效期(秒)，<=0 表示永不过期
+PLAN_CACHE_TTL = float(os.getenv("PLAN_CACHE_TTL", "3600"))
+# 磁盘缓存目录，为空时仅使用内存缓存
+PLAN_CACHE_DIR = os.getenv("PLAN_CACHE_DIR", "")
+
+# ========== 工具结果缓存 ==========
+
+# 是否启用工具结果缓存（相同参数的工具调用复用结果，不再经过MCP）
+TOOL_CACHE_ENABLED = os.getenv("TOOL_CACHE_ENABLED", "true").lower() == "true"
+# 各工具的缓存策略，格式 "工具名:file,工具名:ttl:秒数"：
+#   file - 按文件路径 + 修改时间 + 大小缓存，文件变化后失效
+#   ttl  - 按参数缓存指定秒数
+# 未配置的工具（文件、图片、图表生成等有副作用的工具）不缓存
+TOOL_CACHE_POLICIES = os.getenv("TOOL_CACHE_POLICIES", "read_file_tool:file,web_search_tool:ttl:600")
+# 内存中缓存结果序列化后的总字节上限
+TOOL_CACHE_MAX_BYTES = int(os.getenv("TOOL_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# 磁盘缓存目录，为空时仅使用内存缓存
+TOOL_CACHE_DIR = os.getenv("TOOL_CACHE_DIR", "")
+
+# ========== 工具执行 ==========
+
+# MCP服务器的工作进程数，CPU密集的工具在工作进程中并行执行；<=0 时所有工具都在线程中执行
+# 每个工作进程单独导入pandas、plotly等依赖，默认只启动少量进程，并发的CPU密集调用较多时再调大
+TOOL_PROCESS_WORKERS = int(os.getenv("TOOL_PROCESS_WORKERS", "2"))
+# 在工作进程中执行的工具（逗号分隔），其余同步工具在线程中执行
+TOOL_PROCESS_TOOLS = [
+    name.strip() for name in os.getenv("TOOL_PROCESS_TOOLS", "read_file_tool,data_chart_tool").split(",")
+    if name.strip()
+]
+# 每个工作进程最多执行的调用数，达到后替换为新进程；<=0 表示不替换
+TOOL_PROCESS_MAX_TASKS_PER_CHILD = int(os.getenv("TOOL_PROCESS_MAX_TASKS_PER_CHILD", "50"))
+
+# ========== 模型路由 ==========
+
+# 默认模型，调用方未指定模型且类别未配置模型时使用
+LLM_DEFAULT_MODEL = os.getenv("DEFAULT_MODEL_NAME", "Qwen-72B")
+# 小模型：分类、对话等对延迟敏感的调用，为空时使用调用方的默认模型
+LLM_SMALL_MODEL = os.getenv("LLM_SMALL_MODEL", "")
+# 大模型：计划与内容生成，为空时使用调用方的默认模型
+LLM_LARGE_MODEL = os.getenv("LLM_LARGE_MODEL", "")
+# 调用类别到模型的映射，可用 MODEL_ROUTE_<类别> 单独覆盖
+MODEL_ROUTES = {
+    "classify": os.getenv("MODEL_ROUTE_CLASSIFY", LLM_SMALL_MODEL),
+    "chat": os.getenv("MODEL_ROUTE_CHAT", LLM_SMALL_MODEL),
+    "plan": os.getenv("MODEL_ROUTE_PLAN", LLM_LARGE_MODEL),
+    "generate": os.getenv("MODEL_ROUTE_GENERATE", LLM_LARGE_MODEL),
+}
+# 类别延迟预算(秒)，格式 "类别:秒数,类别:秒数"，配置后覆盖调用点声明的预算
+MODEL_ROUTE_LATENCY_BUDGETS = {
+    route.strip(): float(budget) for route, budget in (
+        item.split(":", 1) for item in os.getenv("MODEL_ROUTE_LATENCY_BUDGETS", "").split(",") if ":" in item
+    )
+}
+
+# ========== LLM调用策略 ==========
+
+# 单个任务（规划+执行）的截止时间(秒)，<=0 表示不限制
+TASK_DEADLINE = float(os.getenv("TASK_DEADLINE", "900"))
+# 单个任务内所有LLM调用共享的重试次数（含对冲请求）
+TASK_RETRY_BUDGET = int(os.getenv("TASK_RETRY_BUDGET", "4"))
+# 单次LLM调用的超时(秒)，实际超时不超过任务剩余时间，<=0 表示只受任务截止时间约束
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "180"))
+# 首次重试前的等待(秒)，之后每次翻倍
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.5"))
+# 是否启用对冲请求：调用耗时超过该调用点的历史分位延迟时再发出一个相同请求，取先返回的结果
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+# 触发对冲的分位延迟
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+# 调用点样本数达到该值后才启用对冲
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+# ========== 任务调度 ==========
+
+# 同时执行的任务数
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", "4"))
+# 排队任务总数上限，超过时拒绝提交（HTTP 429）
+TASK_QUEUE_MAX = int(os.getenv("TASK_QUEUE_MAX", "100"))
+# 单个用户排队任务数上限
+TASK_QUEUE_MAX_PER_USER = int(os.getenv("TASK_QUEUE_MAX_PER_USER", "5"))
+
+# ========== 执行日志 ==========
+
+# 是否记录执行日志（每个任务一个JSONL文件，进程重启后从最后完成的步骤恢复未完成的任务）
+EXECUTION_JOURNAL_ENABLED = os.getenv("EXECUTION_JOURNAL_ENABLED", "true").lower() == "true"
+# 执行日志目录，成功完成的任务删除日志，失败、取消或无法恢复的任务归档到其中的finished子目录
+EXECUTION_JOURNAL_DIR = os.getenv(
+    "EXECUTION_JOURNAL_DIR",
+    str(Path(__file__).parent.parent / "execution_results" / "journal")
+)
+# 每条记录写入后是否同步到磁盘（不同步时进程崩溃不丢记录，断电可能丢失最后几条）
+EXECUTION_JOURNAL_FSYNC = os.getenv("EXECUTION_JOURNAL_FSYNC", "false").lower() == "true"
+# 同一任务最多恢复的次数，超过后放弃该任务
+EXECUTION_JOURNAL_MAX_RESUMES = int(os.getenv("EXECUTION_JOURNAL_MAX_RESUMES", "2"))
+# 归档日志的保留时长(秒)，启动时删除更早的归档，<=0表示不按时长清理
+EXECUTION_JOURNAL_ARCHIVE_TTL = float(os.getenv("EXECUTION_JOURNAL_ARCHIVE_TTL", str(7 * 24 * 3600)))
+# 最多保留的归档日志数，启动时只保留最新的这些
+EXECUTION_JOURNAL_ARCHIVE_MAX_ENTRIES = int(os.getenv("EXECUTION_JOURNAL_ARCHIVE_MAX_ENTRIES", "200"))
+
+# ========== 任务追踪 ==========
+
+# 是否记录任务追踪（规划、LLM调用、MCP会话、工具执行、文件登记、报告写入的耗时区间），关闭时几乎没有开销
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "false").lower() == "true"
+# 追踪文件目录，每个任务写出一个Chrome trace-event格式的 trace_<任务ID>.json（chrome://tracing 或 Perfetto 打开）
+TRACE_DIR = os.getenv(
+    "TRACE_DIR",
+    str(Path(__file__).parent.parent / "execution_results" / "logs")
+)
+
+# ========== 工具检索 ==========
+
+# 是否启用工具检索（工具较多时规划提示词只包含核心工具与检索出的相关工具）
+TOOL_RETRIEVAL_ENABLED = os.getenv("TOOL_RETRIEVAL_ENABLED", "true").lower() == "true"
+# 每次规划检索的相关工具数量
+TOOL_RETRIEVAL_TOP_K = int(os.getenv("TOOL_RETRIEVAL_TOP_K", "5"))
+# 始终提供给规划器的核心工具（逗号分隔）
+TOOL_RETRIEVAL_CORE_TOOLS = [
+    name.strip() for name in os.getenv(
+        "TOOL_RETRIEVAL_CORE_TOOLS",
+        "generate_answer_tool,file_generation_tool,web_search_tool,read_file_tool,image_generation_tool"
+    ).split(",") if name.strip()
+]
+
+# ========== 用户上下文 ==========
+
+# 内存中最多保存上下文（最后完成的任务）的用户数，超出后淘汰最久未活动的用户
+USER_CONTEXT_MAX_USERS = int(os.getenv("USER_CONTEXT_MAX_USERS", "1024"))
+# 内存中用户上下文序列化后的总字节上限
+USER_CONTEXT_MAX_BYTES = int(os.getenv("USER_CONTEXT_MAX_BYTES", str(64 * 1024 * 1024)))
+# 溢出目录，内存淘汰的用户上下文写入该目录并在用户再次访问时恢复；为空时直接丢弃
+USER_CONTEXT_SPILL_DIR = os.getenv("USER_CONTEXT_SPILL_DIR", "")
@@ -3,24 +3,38 @@
 包含任务规划、执行、文件管理等核心功能
 """
 
+from utils.tracing import TaskTrace, task_trace, span, traced, get_current_trace
 from .models import (
-    TaskStatus, StepStatus, Step, Plan, TaskPlan, ExecutionResult,
+    TaskStatus, StepStatus, Step, Plan, TaskPlan, ExecutionResult, Artifact,
     TaskType, TaskNeedClarification, TaskClarityScore
 )
-from .event_emitter import ExecutionEventEmitter
-from .task_planner import TaskPlanner, TaskClarityAnalyzer
+from .event_emitter import ExecutionEventEmitter, PacedEventListener
+from .task_planner import TaskPlanner, TaskClarityAnalyzer, PlanAbandonedError
+from .plan_cache import PlanCache
+from .prompt_compiler import PromptCompiler
+from .plan_stream_parser import IncrementalPlanParser
+from .conversation_classifier import ConversationClassifier
+from .context_store import UserContextStore
+from .step_references import StepReferenceResolver, StepReferenceError
+from .model_router import ModelRouter, get_model_router
+from .call_policy import CallPolicy, get_call_policy, task_deadline, DeadlineExceededError
+from .execution_context import ExecutionContext, execution_context, get_execution_context
+from .execution_journal import ExecutionJournal, JournalState
 from .task_executor import TaskExecutor
+from .task_scheduler import TaskScheduler, QueueFullError
 from .file_manager import FileManager
 from .result_collector import ResultCollector
 
 __all__ = [
     # 数据模型
-    'TaskStatus', 'StepStatus', 'Step', 'Plan', 'TaskPlan', 'ExecutionResult',
+    'TaskStatus', 'StepStatus', 'Step', 'Plan', 'TaskPlan', 'ExecutionResult', 'Artifact',
     'TaskType', 'TaskNeedClarification', 'TaskClarityScore',
     # 事件系统
-    'ExecutionEventEmitter',
+    'ExecutionEventEmitter', 'PacedEventListener',
     # 任务规划
-    'TaskPlanner', 'TaskClarityAnalyzer',
+    'TaskPlanner', 'TaskClarityAnalyzer', 'PlanAbandonedError', 'PlanCache', 'PromptCompiler', 'IncrementalPlanParser',
+    'ConversationClassifier', 'UserContextStore', 'ModelRouter', 'get_model_router',
+    'CallPolicy', 'get_call_policy', 'task_deadline', 'DeadlineExceededError',
     # 核心组件
-    'TaskExecutor', 'FileManager', 'ResultCollector'
+    'TaskExecutor', 'ExecutionContext', 'execution_context', 'get_execution_context', 'ExecutionJournal', 'JournalState', 'TaskTrace', 'task_trace', 'span', 'traced', 'get_current_trace', 'TaskScheduler', 'QueueFullError', 'StepReferenceResolver', 'StepReferenceError', 'FileManager', 'ResultCollector'
 ] 
\ No newline at end of file
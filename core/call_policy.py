@@ -0,0 +1,231 @@
+"""
+LLM调用策略
+任务级截止时间与重试预算通过contextvars传递到该任务内的每一次LLM调用和工具调用；
+每个调用点维护延迟直方图，调用超过该调用点的历史分位延迟时可发出对冲请求
+"""
+
+import asyncio
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from openai import APIConnectionError, InternalServerError, RateLimitError
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 直方图桶上界(秒)：50ms起按约1.5倍递增到10分钟
+_BUCKET_BOUNDS: List[float] = [round(0.05 * 1.5 ** i, 3) for i in range(24)] + [600.0]
+
+# 可重试的错误：超时、连接失败、限流与服务端错误
+RETRYABLE_ERRORS = (asyncio.TimeoutError, APIConnectionError, RateLimitError, InternalServerError)
+
+
+class DeadlineExceededError(Exception):
+    """任务截止时间已到，不再发起新的调用"""
+
+
+class TaskDeadline:
+    """任务截止时间与重试预算，同一任务内的所有调用共享"""
+
+    def __init__(self, timeout: Optional[float] = None, retry_budget: int = 0):
+        """
+        初始化任务截止时间
+
+        Args:
+            timeout: 任务总时长(秒)，为空或<=0表示不限制
+            retry_budget: 整个任务内允许的重试次数（含对冲请求）
+        """
+        self.timeout = timeout if timeout and timeout > 0 else None
+        self.expires_at = time.monotonic() + self.timeout if self.timeout else None
+        self.retry_budget = retry_budget
+        self.retries_used = 0
+
+    def remaining(self) -> Optional[float]:
+        """剩余时间(秒)，不限制时返回None"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def try_spend_retry(self) -> bool:
+        """消耗一次重试预算，预算用尽时返回False"""
+        if self.retries_used >= self.retry_budget:
+            return False
+        self.retries_used += 1
+        return True
+
+
+_current_deadline: ContextVar[Optional[TaskDeadline]] = ContextVar("task_deadline", default=None)
+
+
+@contextmanager
+def task_deadline(timeout: Optional[float] = None, retry_budget: Optional[int] = None) -> Iterator[TaskDeadline]:
+    """
+    为当前任务设置截止时间与重试预算
+
+    作用域内创建的asyncio任务会继承同一个TaskDeadline，重试预算在整个任务内共享
+
+    用法：
+        with task_deadline(settings.TASK_DEADLINE, settings.TASK_RETRY_BUDGET):
+            task_plan = await planner.analyze_task(user_input)
+    """
+    deadline = TaskDeadline(
+        settings.TASK_DEADLINE if timeout is None else timeout,
+        settings.TASK_RETRY_BUDGET if retry_budget is None else retry_budget
+    )
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def get_task_deadline() -> Optional[TaskDeadline]:
+    """获取当前任务的截止时间，不在任务作用域内时返回None"""
+    return _current_deadline.get()
+
+
+def call_timeout(default: Optional[float] = None) -> Optional[float]:
+    """
+    计算单次调用的超时时间：调用超时与任务剩余时间中较小者
+
+    Args:
+        default: 调用自身的超时(秒)
+
+    Raises:
+        DeadlineExceededError: 任务截止时间已到
+    """
+    deadline = get_task_deadline()
+    if deadline is None:
+        return default
+    if deadline.expired():
+        raise DeadlineExceededError(f"任务已超过截止时间({deadline.timeout}s)")
+    remaining = deadline.remaining()
+    if remaining is None:
+        return default
+    return remaining if default is None else min(default, remaining)
+
+
+class LatencyHistogram:
+    """延迟直方图 - 固定对数分桶，按桶上界估算分位数"""
+
+    def __init__(self):
+        self.counts = [0] * len(_BUCKET_BOUNDS)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, latency: float) -> None:
+        index = min(bisect.bisect_left(_BUCKET_BOUNDS, latency), len(_BUCKET_BOUNDS) - 1)
+        self.counts[index] += 1
+        self.total += 1
+        self.sum += latency
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """估算分位延迟(秒)，没有样本时返回None"""
+        if not self.total:
+            return None
+        target = pct / 100 * self.total
+        cumulative = 0
+        for bound, count in zip(_BUCKET_BOUNDS, self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return _BUCKET_BOUNDS[-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.total,
+            "mean": round(self.sum / self.total, 3) if self.total else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99)
+        }
+
+
+class CallPolicy:
+    """LLM调用策略 - 调用超时、重试退避与对冲阈值，按调用点统计延迟"""
+
+    def __init__(self, call_timeout: Optional[float] = None, retry_backoff: Optional[float] = None,
+                 hedging_enabled: Optional[bool] = None, hedge_percentile: Optional[float] = None,
+                 hedge_min_samples: Optional[int] = None):
+        """
+        初始化调用策略，未指定的参数取settings中的配置
+
+        Args:
+            call_timeout: 单次调用超时(秒)
+            retry_backoff: 首次重试前的等待(秒)，之后每次翻倍
+            hedging_enabled: 是否启用对冲请求
+            hedge_percentile: 调用耗时超过该调用点此分位延迟时发出对冲请求
+            hedge_min_samples: 调用点样本数达到该值后才启用对冲
+        """
+        self.call_timeout = settings.LLM_CALL_TIMEOUT if call_timeout is None else call_timeout
+        self.retry_backoff = settings.LLM_RETRY_BACKOFF if retry_backoff is None else retry_backoff
+        self.hedging_enabled = settings.LLM_HEDGING_ENABLED if hedging_enabled is None else hedging_enabled
+        self.hedge_percentile = settings.LLM_HEDGE_PERCENTILE if hedge_percentile is None else hedge_percentile
+        self.hedge_min_samples = settings.LLM_HEDGE_MIN_SAMPLES if hedge_min_samples is None else hedge_min_samples
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, call_site: str, latency: float) -> None:
+        """记录调用点一次成功调用的延迟"""
+        with self._lock:
+            self._histograms.setdefault(call_site, LatencyHistogram()).observe(latency)
+
+    def count(self, call_site: str, event: str) -> None:
+        """累加调用点的重试/对冲/超时等计数"""
+        with self._lock:
+            counters = self._counters.setdefault(call_site, {})
+            counters[event] = counters.get(event, 0) + 1
+
+    def get_hedge_delay(self, call_site: str) -> Optional[float]:
+        """对冲请求的发出时机(秒)，未启用或样本不足时返回None"""
+        if not self.hedging_enabled:
+            return None
+        with self._lock:
+            histogram = self._histograms.get(call_site)
+            if histogram is None or histogram.total < self.hedge_min_samples:
+                return None
+            return histogram.percentile(self.hedge_percentile)
+
+    def get_call_timeout(self) -> Optional[float]:
+        """单次调用的超时，受当前任务剩余时间约束"""
+        return call_timeout(self.call_timeout or None)
+
+    def get_backoff(self, attempt: int) -> float:
+        return self.retry_backoff * (2 ** attempt)
+
+    @staticmethod
+    def is_retryable(error: BaseException) -> bool:
+        return isinstance(error, RETRYABLE_ERRORS)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各调用点的延迟分布与重试/对冲计数"""
+        with self._lock:
+            sites = set(self._histograms) | set(self._counters)
+            return {
+                site: {
+                    **(self._histograms[site].to_dict() if site in self._histograms else {"count": 0}),
+                    **self._counters.get(site, {})
+                }
+                for site in sorted(sites)
+            }
+
+
+_default_policy: Optional[CallPolicy] = None
+
+
+def get_call_policy() -> CallPolicy:
+    """获取进程内共享的调用策略"""
+    global _default_policy
+    if _default_policy is None:
+        _default_policy = CallPolicy()
+    return _default_policy
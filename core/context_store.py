@@ -0,0 +1,167 @@
+"""
+用户上下文存储
+按用户/会话保存规划所需的上下文（最后完成的任务），用于检测改进请求。
+内存按LRU淘汰并统计序列化后的字节数，可选将淘汰的上下文写入磁盘，再次访问时恢复
+"""
+
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from pydantic import ValidationError
+
+from .models import TaskPlan
+
+logger = logging.getLogger(__name__)
+
+
+class UserContextStore:
+    """用户上下文存储 - LRU淘汰 + 内存字节统计，可选溢出到磁盘"""
+
+    def __init__(self, max_users: int = 1024, max_bytes: int = 64 * 1024 * 1024,
+                 spill_dir: Optional[str] = None):
+        """
+        初始化用户上下文存储
+
+        Args:
+            max_users: 内存中最多保存的用户数
+            max_bytes: 内存中上下文序列化后的总字节上限
+            spill_dir: 溢出目录，内存淘汰的上下文写入该目录；为空时直接丢弃
+        """
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        # 以序列化后的JSON保存，字节数即实际占用，且调用方修改返回的对象不会影响存储内容
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.spills = 0
+        self.restores = 0
+
+        if self.spill_dir:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+
+        logger.info(
+            f"UserContextStore初始化完成，用户上限: {max_users}，内存上限: {max_bytes}字节，溢出目录: {self.spill_dir or '无'}"
+        )
+
+    def get_last_task(self, user_id: str) -> Optional[TaskPlan]:
+        """
+        获取用户最后完成的任务
+
+        Args:
+            user_id: 用户/会话ID
+
+        Returns:
+            Optional[TaskPlan]: 最后完成的任务，不存在时返回None
+        """
+        entry = self._entries.get(user_id)
+        if entry is None:
+            entry = self._restore_from_disk(user_id)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        try:
+            task_plan = TaskPlan.model_validate_json(entry["last_task"])
+        except ValidationError as e:
+            logger.warning(f"用户上下文已损坏，已清除: {user_id} - {e}")
+            self._remove(user_id)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return task_plan
+
+    def set_last_task(self, user_id: str, task_plan: TaskPlan) -> None:
+        """
+        设置用户最后完成的任务
+
+        Args:
+            user_id: 用户/会话ID
+            task_plan: 已完成的任务计划
+        """
+        data = task_plan.model_dump_json()
+        self._remove(user_id)
+        self._store(user_id, {"last_task": data, "size": len(data.encode("utf-8")), "updated_at": time.time()})
+
+    def clear(self, user_id: str) -> None:
+        """清除用户上下文（内存与磁盘）"""
+        self._remove(user_id)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._entries or (self.spill_dir is not None and self._spill_file(user_id).exists())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计"""
+        return {
+            "users_in_memory": len(self._entries),
+            "max_users": self.max_users,
+            "memory_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "spills": self.spills,
+            "restores": self.restores
+        }
+
+    def _store(self, user_id: str, entry: Dict[str, Any]) -> None:
+        """写入内存并按LRU淘汰，直到用户数与字节数均不超过上限（至少保留刚写入的条目）"""
+        self._entries[user_id] = entry
+        self._entries.move_to_end(user_id)
+        self.total_bytes += entry["size"]
+
+        while len(self._entries) > 1 and (len(self._entries) > self.max_users or self.total_bytes > self.max_bytes):
+            evicted_id, evicted = self._entries.popitem(last=False)
+            self.total_bytes -= evicted["size"]
+            self.evictions += 1
+            self._spill_to_disk(evicted_id, evicted)
+
+    def _remove(self, user_id: str) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self.total_bytes -= entry["size"]
+        if self.spill_dir:
+            self._spill_file(user_id).unlink(missing_ok=True)
+
+    def _spill_file(self, user_id: str) -> Path:
+        # 用户ID来自URL，哈希后作为文件名避免路径问题
+        return self.spill_dir / f"{hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:32]}.json"
+
+    def _spill_to_disk(self, user_id: str, entry: Dict[str, Any]) -> None:
+        if not self.spill_dir:
+            return
+        spill_file = self._spill_file(user_id)
+        try:
+            spill_file.write_text(entry["last_task"], encoding="utf-8")
+            self.spills += 1
+        except OSError as e:
+            logger.warning(f"写入用户上下文溢出文件失败: {spill_file} - {e}")
+
+    def _restore_from_disk(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """从溢出目录恢复上下文并重新放入内存"""
+        if not self.spill_dir:
+            return None
+        spill_file = self._spill_file(user_id)
+        if not spill_file.exists():
+            return None
+        try:
+            data = spill_file.read_text(encoding="utf-8")
+            spill_file.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"读取用户上下文溢出文件失败: {spill_file} - {e}")
+            return None
+
+        entry = {"last_task": data, "size": len(data.encode("utf-8")), "updated_at": time.time()}
+        self.restores += 1
+        self._store(user_id, entry)
+        return entry
@@ -0,0 +1,238 @@
+"""
+本地对话检测
+基于字符n-gram与关键词特征的朴素贝叶斯分类器，无需调用LLM即可判断输入是对话还是任务。
+只有置信度达到阈值时才给出结论，其余情况交由LLM判断。
+朴素贝叶斯的置信度并不可靠（"你能帮我写个爬虫吗"也会以0.99以上判为对话），
+因此对话结论只在输入很短且不含任何任务/动作关键词（纯问候、感谢）时给出，宁可交给LLM也不把任务判为对话。
+"""
+
+import glob
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION = "conversation"
+TASK = "task"
+
+# 种子样本：覆盖常见问候、感谢、闲聊、系统询问以及典型任务请求
+SEED_EXAMPLES: List[Tuple[str, str]] = [
+    ("你好", CONVERSATION), ("您好", CONVERSATION), ("你好呀", CONVERSATION), ("嗨", CONVERSATION),
+    ("hi", CONVERSATION), ("hello", CONVERSATION), ("hey", CONVERSATION), ("早上好", CONVERSATION),
+    ("下午好", CONVERSATION), ("晚上好", CONVERSATION), ("晚安", CONVERSATION), ("在吗", CONVERSATION),
+    ("谢谢", CONVERSATION), ("谢谢你", CONVERSATION), ("谢谢你的帮助", CONVERSATION), ("非常感谢", CONVERSATION),
+    ("感谢", CONVERSATION), ("多谢", CONVERSATION), ("thanks", CONVERSATION), ("thank you", CONVERSATION),
+    ("太好了", CONVERSATION), ("不错", CONVERSATION), ("好的", CONVERSATION), ("好的谢谢", CONVERSATION),
+    ("辛苦了", CONVERSATION), ("再见", CONVERSATION), ("拜拜", CONVERSATION), ("bye", CONVERSATION),
+    ("你是谁", CONVERSATION), ("你叫什么名字", CONVERSATION), ("你好吗", CONVERSATION), ("最近怎么样", CONVERSATION),
+    ("你能做什么", CONVERSATION), ("你有什么功能", CONVERSATION), ("你的功能是什么", CONVERSATION),
+    ("介绍一下你自己", CONVERSATION), ("今天天气怎么样", CONVERSATION), ("哈哈", CONVERSATION),
+    ("真棒", CONVERSATION), ("厉害", CONVERSATION), ("早", CONVERSATION), ("嗯嗯", CONVERSATION),
+    ("生成一个Python hello world程序", TASK), ("生成一个程序", TASK), ("搜索Python教程", TASK),
+    ("帮我处理文件", TASK), ("搜索最新AI技术趋势", TASK), ("生成一张科技背景图片", TASK),
+    ("帮我写一篇关于人工智能的文章", TASK), ("创建一个网页", TASK), ("分析这份数据", TASK),
+    ("把这个文件转换成PDF", TASK), ("制定一个健身计划", TASK), ("我想学习机器学习", TASK),
+    ("请帮我制定学习计划", TASK), ("我需要一份周报", TASK), ("读取report.txt的内容", TASK),
+    ("画一个柱状图", TASK), ("生成销售数据的图表", TASK), ("翻译这段话", TASK), ("写一个爬虫", TASK),
+    ("帮我查一下明天北京的天气", TASK), ("总结这篇文章", TASK), ("做一个贪吃蛇游戏", TASK),
+    ("生成一个txt文件", TASK), ("用pygame实现五子棋", TASK), ("添加音效", TASK), ("修改颜色为蓝色", TASK),
+    ("优化界面", TASK), ("帮我增加一个好看的背景", TASK), ("整理一份会议纪要", TASK), ("计算1到100的和", TASK),
+]
+
+# 关键词特征：命中时作为额外特征参与分类
+TASK_KEYWORDS = [
+    "生成", "创建", "搜索", "查找", "分析", "转换", "制定", "学习", "写", "做", "画", "帮我", "请帮",
+    "需要", "想要", "我想", "我希望", "计划", "文件", "程序", "代码", "图片", "图表", "报告", "实现",
+    "总结", "翻译", "整理", "计算", "读取", "修改", "添加", "增加", "优化",
+    "search", "generate", "create", "write", "analy", "make", "find", "draw", "translate", "summar",
+    "build", "convert", "report", "file", "code", "help me", "please", "can you", "could you"
+]
+CONVERSATION_KEYWORDS = [
+    "你好", "您好", "谢谢", "感谢", "再见", "拜拜", "晚安", "早上好", "你是谁", "你能做什么",
+    "hello", "thanks", "bye"
+]
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = "。.!！?？~～,，、 "
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE_PATTERN.sub(" ", text.strip().lower()).strip(_TRAILING_PUNCTUATION)
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = (1, 3)) -> List[str]:
+    """提取字符n-gram（含首尾边界标记）"""
+    padded = f"^{_normalize(text)}$"
+    ngrams = []
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        ngrams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return ngrams
+
+
+def extract_features(text: str) -> List[str]:
+    """
+    提取特征：字符n-gram、关键词命中与长度分桶
+
+    Args:
+        text: 用户输入
+
+    Returns:
+        List[str]: 特征列表
+    """
+    normalized = _normalize(text)
+    features = char_ngrams(text)
+    features.extend(f"KW_TASK:{kw}" for kw in TASK_KEYWORDS if kw in normalized)
+    features.extend(f"KW_CONV:{kw}" for kw in CONVERSATION_KEYWORDS if kw in normalized)
+    features.append(f"LEN:{min(len(normalized) // 5, 6)}")
+    return features
+
+
+def has_task_keyword(text: str) -> bool:
+    """输入中是否包含任务/动作关键词"""
+    normalized = _normalize(text)
+    return any(kw in normalized for kw in TASK_KEYWORDS)
+
+
+def load_report_samples(reports_dir: str) -> List[Tuple[str, str]]:
+    """
+    从历史执行报告中加载带标签的样本（按用户输入去重）
+
+    报告中任务类型为"对话"，或仅由一个回应问候/闲聊的回复步骤组成的记为对话，其余记为任务。
+
+    Args:
+        reports_dir: 报告目录
+
+    Returns:
+        List[Tuple[str, str]]: (用户输入, 标签) 列表
+    """
+    labels: Dict[str, str] = {}
+    for report_file in sorted(glob.glob(os.path.join(reports_dir, "*.json"))):
+        try:
+            with open(report_file, "r", encoding="utf-8") as f:
+                report = json.load(f)
+            task_info = report["task_info"]
+            user_input = task_info["user_input"]
+        except (OSError, KeyError, TypeError, json.JSONDecodeError):
+            continue
+
+        if user_input.startswith("改进: "):
+            # 改进任务的输入经过改写，不代表用户原始输入
+            continue
+
+        steps = report.get("step_details") or []
+        is_greeting_reply = (
+            len(steps) == 1
+            and steps[0].get("function_name") in ("generate_answer_tool", "chat_response")
+            and any(word in steps[0].get("step_description", "") for word in ("问候", "闲聊", "对话"))
+        )
+        label = CONVERSATION if task_info.get("task_type") == "对话" or is_greeting_reply else TASK
+        # 同一输入只要有一次被当作对话处理即记为对话
+        if labels.get(user_input) != CONVERSATION:
+            labels[user_input] = label
+    return list(labels.items())
+
+
+class ConversationClassifier:
+    """本地对话分类器 - 多项式朴素贝叶斯，置信度不足时返回None交由LLM判断"""
+
+    def __init__(self, threshold: float = 0.99, min_coverage: float = 0.5, max_conversation_length: int = 16):
+        """
+        初始化分类器
+
+        Args:
+            threshold: 置信度阈值，低于该值时不给出结论
+            min_coverage: 输入的n-gram特征中训练集已见过的最低比例，低于该值视为陌生输入不给出结论
+            max_conversation_length: 判为对话的最大输入长度（字符），更长的输入即使判为对话也交由LLM确认
+        """
+        self.threshold = threshold
+        self.min_coverage = min_coverage
+        self.max_conversation_length = max_conversation_length
+        self._feature_counts: Dict[str, Counter] = {CONVERSATION: Counter(), TASK: Counter()}
+        self._total_counts: Dict[str, int] = {CONVERSATION: 0, TASK: 0}
+        self._doc_counts: Dict[str, int] = {CONVERSATION: 0, TASK: 0}
+        self._vocabulary: set = set()
+
+    def fit(self, samples: Iterable[Tuple[str, str]]) -> "ConversationClassifier":
+        """
+        训练分类器（可多次调用累加样本）
+
+        Args:
+            samples: (文本, 标签) 序列，标签为conversation或task
+        """
+        for text, label in samples:
+            features = extract_features(text)
+            self._feature_counts[label].update(features)
+            self._total_counts[label] += len(features)
+            self._doc_counts[label] += 1
+            self._vocabulary.update(features)
+        return self
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        预测标签
+
+        Returns:
+            Tuple[str, float]: (标签, 置信度)
+        """
+        features = extract_features(text)
+        total_docs = sum(self._doc_counts.values())
+        vocabulary_size = len(self._vocabulary) + 1
+
+        log_scores = {}
+        for label in (CONVERSATION, TASK):
+            counts = self._feature_counts[label]
+            denominator = self._total_counts[label] + vocabulary_size
+            score = math.log((self._doc_counts[label] + 1) / (total_docs + 2))
+            for feature in features:
+                score += math.log((counts[feature] + 1) / denominator)
+            log_scores[label] = score
+
+        best = max(log_scores, key=log_scores.get)
+        max_score = log_scores[best]
+        normalizer = sum(math.exp(score - max_score) for score in log_scores.values())
+        return best, 1.0 / normalizer
+
+    def classify(self, text: str) -> Optional[bool]:
+        """
+        高置信度判断是否为对话
+
+        Returns:
+            Optional[bool]: True为对话，False为任务；置信度不足、输入陌生，
+                或判为对话但输入较长/含任务关键词（如"早上好，请搜索最新新闻"）时为None
+        """
+        if not self._vocabulary:
+            return None
+
+        ngrams = char_ngrams(text)
+        known = sum(1 for f in ngrams if f in self._vocabulary)
+        if not ngrams or known / len(ngrams) < self.min_coverage:
+            return None
+
+        label, confidence = self.predict(text)
+        if confidence < self.threshold:
+            return None
+        if label == CONVERSATION and not self._is_plain_chat(text):
+            return None
+        return label == CONVERSATION
+
+    def _is_plain_chat(self, text: str) -> bool:
+        """是否为可以直接判为对话的纯问候/感谢：输入很短且不含任务关键词"""
+        return len(_normalize(text)) <= self.max_conversation_length and not has_task_keyword(text)
+
+    @classmethod
+    def from_reports(cls, reports_dir: str, threshold: float = 0.99, min_coverage: float = 0.5,
+                     max_conversation_length: int = 16) -> "ConversationClassifier":
+        """基于种子样本与历史报告训练分类器"""
+        report_samples = load_report_samples(reports_dir)
+        classifier = cls(
+            threshold=threshold, min_coverage=min_coverage, max_conversation_length=max_conversation_length
+        ).fit(SEED_EXAMPLES + report_samples)
+        logger.info(
+            f"本地对话分类器训练完成：种子样本{len(SEED_EXAMPLES)}条，报告样本{len(report_samples)}条，阈值{threshold}"
+        )
+        return classifier
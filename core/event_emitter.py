@@ -4,24 +4,35 @@
 """
 
 import asyncio
+import inspect
 import json
 import logging
 from datetime import datetime
-from typing import List, Dict, Any, Callable
+from typing import List, Dict, Any, Callable, Optional
 
 from .models import TaskPlan, Step, ExecutionResult
+from .execution_context import get_execution_context
 
 logger = logging.getLogger(__name__)
 
 
 class ExecutionEventEmitter:
-    """执行事件发射器"""
+    """执行事件发射器
     
-    def __init__(self):
+    通过add_listener添加的监听器接收所有任务的事件；只关心单个任务的监听器放在该任务的执行上下文中，
+    事件按当前执行上下文路由，并发执行的任务互不干扰
+    """
+    
+    def __init__(self, print_events: bool = True):
+        """
+        Args:
+            print_events: 是否在终端打印格式化的事件（无界面的批量执行时关闭）
+        """
         self.listeners: List[Callable] = []
+        self.print_events = print_events
     
     def add_listener(self, callback: Callable):
-        """添加事件监听器"""
+        """添加接收所有任务事件的监听器"""
         self.listeners.append(callback)
     
     def remove_listener(self, callback: Callable):
@@ -38,18 +49,22 @@ class ExecutionEventEmitter:
         }
         
         # 格式化输出事件
-        formatted_event = self._format_event_output(event)
-        print(formatted_event)
+        if self.print_events:
+            print(self._format_event_output(event))
         
-        # 通知所有监听器
+        # 通知全局监听器
         for listener in self.listeners:
             try:
-                if asyncio.iscoroutinefunction(listener):
-                    await listener(event)
-                else:
-                    listener(event)
+                result = listener(event)
+                if inspect.isawaitable(result):
+                    await result
             except Exception as e:
                 logger.error(f"事件监听器执行失败: {e}")
+        
+        # 通知当前任务的监听器
+        context = get_execution_context()
+        if context is not None:
+            await context.dispatch(event)
     
     def _format_event_output(self, event: Dict[str, Any]) -> str:
         """格式化事件输出"""
@@ -175,6 +190,8 @@ class ExecutionEventEmitter:
             "task_id": task_plan.task_id,
             "success": execution_result.success,
             "execution_time": execution_result.execution_time,
+            "wall_clock_time": execution_result.wall_clock_time,
+            "sequential_time": execution_result.sequential_time,
             "files_generated": execution_result.files_generated
         })
     
@@ -195,6 +212,18 @@ class ExecutionEventEmitter:
             "message": f"检测到任务类型: {task_type} (置信度: {confidence:.1%})"
         })
     
+    async def emit_triage_complete(self, decision: str, timings: Dict[str, float], 
+                                   cancelled: list = None, elapsed: float = 0.0):
+        """发射任务分诊完成事件（包含各分类器耗时）"""
+        timing_text = ", ".join(f"{name} {duration:.2f}s" for name, duration in timings.items())
+        await self.emit_event("triage_complete", {
+            "decision": decision,
+            "timings": timings,
+            "cancelled": cancelled or [],
+            "elapsed": elapsed,
+            "message": f"任务分诊完成: {decision}，总耗时 {elapsed:.2f}s ({timing_text})"
+        })
+    
     async def emit_clarity_check_start(self):
         """发射明确度检查开始事件"""
         await self.emit_event("clarity_check_start", {
@@ -217,14 +246,15 @@ class ExecutionEventEmitter:
             "message": f"开始生成执行计划 (复杂度: {complexity_level})..."
         })
     
-    async def emit_plan_step_generated(self, step_index: int, total_steps: int, step_description: str, tool_name: str):
-        """发射计划步骤生成事件"""
+    async def emit_plan_step_generated(self, step_index: int, total_steps: Optional[int], step_description: str, tool_name: str):
+        """发射计划步骤生成事件（流式生成时总步骤数未知，total_steps为None）"""
+        progress = f"{step_index + 1}/{total_steps}" if total_steps else f"{step_index + 1}"
         await self.emit_event("plan_step_generated", {
             "step_index": step_index,
             "total_steps": total_steps,
             "step_description": step_description,
             "tool_name": tool_name,
-            "message": f"步骤 {step_index + 1}/{total_steps}: {step_description}"
+            "message": f"步骤 {progress}: {step_description}"
         })
     
     async def emit_plan_generated(self, task_id: str, total_steps: int, task_type: str):
@@ -301,4 +331,106 @@ class ExecutionEventEmitter:
             else:
                 return f"📝 文本结果: {result[:100]}..."
         else:
-            return f"📊 数据: {str(result)[:100]}..." 
\ No newline at end of file
+            return f"📊 数据: {str(result)[:100]}..."
+
+
+class PacedEventListener:
+    """
+    展示节奏控制监听器
+    
+    事件到达时只放入队列并立即返回，由后台协程按事件类型的最小显示间隔依次投递给
+    实际监听器。节奏控制只作用于展示通道（如WebSocket），规划与执行流程全速运行；
+    终端和无界面模式不挂载该监听器，因此没有任何人为延迟。
+    流式文本通过wrap_stream进入同一队列，与事件按发生顺序到达前端；
+    任务结束时调用finish，剩余事件立即投递，不再按显示间隔等待。
+    """
+    
+    # 各类事件投递后保留的最小显示间隔(秒)
+    DEFAULT_INTERVALS = {
+        "task_analysis_start": 0.5,
+        "clarity_check_start": 0.3,
+        "clarity_score": 0.5,
+        "task_type_detected": 0.3,
+        "plan_generation_start": 0.5,
+        "plan_step_generated": 0.2,
+        "plan_generated": 0.5,
+        "general_progress": 0.3
+    }
+    
+    def __init__(self, listener: Callable, intervals: Optional[Dict[str, float]] = None):
+        """
+        初始化节奏控制监听器
+        
+        Args:
+            listener: 实际的事件监听器（同步或异步函数）
+            intervals: 事件类型到显示间隔的映射，默认使用DEFAULT_INTERVALS
+        """
+        self.listener = listener
+        self.intervals = self.DEFAULT_INTERVALS if intervals is None else intervals
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        # 置位后跳过剩余的显示间隔（包括正在进行的等待）
+        self._hurry = asyncio.Event()
+    
+    def __call__(self, event: Dict[str, Any]):
+        """接收事件：入队后立即返回，不阻塞事件发射方"""
+        self._enqueue(self.listener, event, self.intervals.get(event.get("type"), 0))
+    
+    def wrap_stream(self, stream_callback: Callable[[str], Any]) -> Callable[[str], Any]:
+        """
+        包装流式文本回调，使流式文本与事件经过同一队列按顺序投递
+        
+        Args:
+            stream_callback: 实际的流式文本回调（同步或异步函数）
+            
+        Returns:
+            入队后立即返回的异步回调
+        """
+        async def paced_stream(text: str):
+            self._enqueue(stream_callback, text, 0)
+        
+        return paced_stream
+    
+    def _enqueue(self, callback: Callable, payload: Any, interval: float):
+        self._queue.put_nowait((callback, payload, interval))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._drain())
+    
+    async def _drain(self):
+        """按显示间隔依次投递队列中的事件"""
+        while True:
+            callback, payload, interval = await self._queue.get()
+            try:
+                result = callback(payload)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"事件监听器执行失败: {e}")
+            finally:
+                self._queue.task_done()
+            
+            if interval > 0 and not self._hurry.is_set():
+                try:
+                    await asyncio.wait_for(self._hurry.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    pass
+    
+    async def flush(self):
+        """等待已入队的事件按显示节奏全部投递完成"""
+        await self._queue.join()
+    
+    async def finish(self):
+        """立即投递剩余事件，不再等待显示间隔；用于任务结束时，最终结果不被积压的进度事件拖后"""
+        self._hurry.set()
+        await self._queue.join()
+    
+    async def close(self):
+        """立即投递剩余事件后停止后台协程"""
+        await self.finish()
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
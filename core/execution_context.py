@@ -0,0 +1,110 @@
+"""
+执行上下文
+每次任务执行一个上下文，携带任务、用户、事件订阅、流式输出回调与取消令牌；
+上下文通过contextvars传递到该任务内创建的所有asyncio任务，
+共享的规划器、执行器与事件发射器据此把事件和输出路由到发起任务的用户，多个任务可以并发执行
+"""
+
+import asyncio
+import inspect
+import logging
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from .models import TaskPlan
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutionContext:
+    """单次任务执行的上下文"""
+
+    def __init__(self, user_id: str = "default", listeners: Optional[List[Callable]] = None,
+                 stream_callback: Optional[Callable[[str], Awaitable[None]]] = None):
+        """
+        初始化执行上下文
+
+        Args:
+            user_id: 用户ID
+            listeners: 只接收本次执行事件的监听器
+            stream_callback: 规划过程中流式文本输出的回调，为空时使用规划器自身的输出方式
+        """
+        self.execution_id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.listeners: List[Callable] = list(listeners or [])
+        self.stream_callback = stream_callback
+        self.task_plan: Optional[TaskPlan] = None
+        self.cancel_reason: Optional[str] = None
+        # 进入上下文的asyncio任务，取消令牌通过取消该任务中止执行
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def task_id(self) -> Optional[str]:
+        return self.task_plan.task_id if self.task_plan else None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_reason is not None
+
+    def cancel(self, reason: str = "任务已取消") -> bool:
+        """
+        取消本次执行，取消会传播到规划中的LLM调用和正在执行的步骤
+
+        Returns:
+            bool: 是否有正在执行的任务被取消
+        """
+        self.cancel_reason = reason
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            return True
+        return False
+
+    async def dispatch(self, event: Dict[str, Any]) -> None:
+        """将事件投递给本次执行的监听器"""
+        for listener in self.listeners:
+            try:
+                result = listener(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"事件监听器执行失败: {e}")
+
+    def attach(self) -> Token:
+        """设为当前上下文，返回用于detach的令牌"""
+        try:
+            self._task = asyncio.current_task()
+        except RuntimeError:
+            self._task = None
+        return _current_context.set(self)
+
+    def detach(self, token: Token) -> None:
+        _current_context.reset(token)
+
+
+_current_context: ContextVar[Optional[ExecutionContext]] = ContextVar("execution_context", default=None)
+
+
+@contextmanager
+def execution_context(user_id: str = "default", listeners: Optional[List[Callable]] = None,
+                      stream_callback: Optional[Callable[[str], Awaitable[None]]] = None) -> Iterator[ExecutionContext]:
+    """
+    在作用域内执行一次任务
+
+    用法：
+        with execution_context(user_id, listeners=[listener]) as context:
+            task_plan = await planner.analyze_task(user_input, user_id=user_id)
+            result = await executor.execute_plan(task_plan, user_id)
+    """
+    context = ExecutionContext(user_id, listeners, stream_callback)
+    token = context.attach()
+    try:
+        yield context
+    finally:
+        context.detach(token)
+
+
+def get_execution_context() -> Optional[ExecutionContext]:
+    """获取当前执行上下文，不在任务作用域内时返回None"""
+    return _current_context.get()
@@ -0,0 +1,293 @@
+"""
+执行日志
+每个任务一个只追加的JSONL文件，记录执行计划、步骤开始/完成及步骤结果；
+进程重启后按日志恢复未完成的任务，已完成的步骤直接复用结果，只执行剩余步骤。
+成功完成的任务删除日志；失败、取消或无法恢复的任务归档到finished子目录，启动时按保留时长与数量清理。
+记录在事件循环中序列化后交给单个后台写入协程，磁盘写入（含fsync）在线程中执行，不阻塞事件循环
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .models import Step, StepStatus, TaskPlan, TaskStatus
+
+logger = logging.getLogger(__name__)
+
+# 已结束任务的日志移入该子目录，启动时只扫描日志目录顶层
+_FINISHED_DIR = "finished"
+
+# 写入队列中的操作：追加一行记录，归档日志文件，或删除日志文件
+_OP_APPEND = "append"
+_OP_ARCHIVE = "archive"
+_OP_DELETE = "delete"
+
+
+class JournalState:
+    """由日志重建的任务状态"""
+
+    def __init__(self, task_plan: TaskPlan, user_id: str, completed_steps: Dict[str, Dict[str, Any]],
+                 resume_count: int = 0):
+        self.task_plan = task_plan
+        self.user_id = user_id
+        # 步骤ID到步骤完成记录的映射（含结果、状态、起止时间与生成的文件）
+        self.completed_steps = completed_steps
+        self.resume_count = resume_count
+
+
+class ExecutionJournal:
+    """执行日志 - 按任务记录执行进度，支持崩溃后恢复"""
+
+    def __init__(self, journal_dir: str, fsync: bool = False, max_resumes: int = 2,
+                 archive_ttl: float = 7 * 24 * 3600, archive_max_entries: int = 200):
+        """
+        初始化执行日志
+
+        Args:
+            journal_dir: 日志目录
+            fsync: 每条记录写入后是否同步到磁盘（关闭时进程崩溃不丢记录，断电可能丢失最后几条）
+            max_resumes: 同一任务最多恢复的次数，超过后放弃（避免反复导致崩溃的任务无限恢复）
+            archive_ttl: 归档日志的保留时长(秒)，<=0表示不按时长清理
+            archive_max_entries: 最多保留的归档日志数
+        """
+        self.journal_dir = Path(journal_dir)
+        self.fsync = fsync
+        self.max_resumes = max_resumes
+        self.archive_ttl = archive_ttl
+        self.archive_max_entries = archive_max_entries
+        # 关闭后不再写入：停机时被取消的任务不记为结束，下次启动时恢复
+        self._closed = False
+        # 已写入记录（可能仍在队列中）的任务
+        self._active: Set[str] = set()
+        # 待写入的操作按提交顺序由单个写入协程处理，保证每个任务的记录顺序
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+        (self.journal_dir / _FINISHED_DIR).mkdir(parents=True, exist_ok=True)
+        self._prune_archive()
+        logger.info(f"ExecutionJournal初始化完成，日志目录: {self.journal_dir}")
+
+    def begin(self, task_plan: TaskPlan, user_id: str) -> None:
+        """记录任务的执行计划"""
+        self._append(task_plan.task_id, {
+            "event": "plan",
+            "user_id": user_id,
+            "task_plan": task_plan.model_dump(mode="json")
+        })
+
+    def step_started(self, task_id: str, step: Step) -> None:
+        self._append(task_id, {"event": "step_start", "step_id": step.step_id})
+
+    def step_finished(self, task_id: str, step: Step, result: Any, files: List[str]) -> None:
+        """记录步骤完成（成功或失败）及其结果"""
+        self._append(task_id, {
+            "event": "step_complete",
+            "step_id": step.step_id,
+            "status": step.status.value,
+            "result": result,
+            "error_message": step.error_message,
+            "start_time": step.start_time.isoformat() if step.start_time else None,
+            "end_time": step.end_time.isoformat() if step.end_time else None,
+            "files": files
+        })
+
+    def resumed(self, task_id: str) -> None:
+        self._append(task_id, {"event": "resume"})
+
+    def finish(self, task_id: str, status: TaskStatus) -> None:
+        """记录任务结束：成功完成的任务删除日志，其余归档供排查；任务没有日志时忽略"""
+        journal_file = self._journal_file(task_id)
+        if self._closed or (task_id not in self._active and not journal_file.exists()):
+            return
+        if status == TaskStatus.COMPLETED:
+            self._active.discard(task_id)
+            self._submit((_OP_DELETE, journal_file, None))
+            return
+        self._append(task_id, {"event": "task_end", "status": status.value})
+        self._active.discard(task_id)
+        self._submit((_OP_ARCHIVE, journal_file, None))
+
+    async def flush(self) -> None:
+        """等待已提交的记录全部写入磁盘"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self) -> None:
+        """停止接收新记录，写完已提交的记录后停止写入协程；之后结束的任务保留为未完成状态"""
+        self._closed = True
+        await self.flush()
+        if self._writer and not self._writer.done():
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+        self._writer = None
+
+    def load(self, task_id: str) -> Optional[JournalState]:
+        """
+        回放任务日志
+
+        Returns:
+            Optional[JournalState]: 任务状态；日志不存在、没有执行计划或任务已结束时返回None
+        """
+        journal_file = self._journal_file(task_id)
+        if not journal_file.exists():
+            return None
+
+        plan_record = None
+        completed_steps = {}
+        resume_count = 0
+        with open(journal_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 崩溃时可能留下写了一半的最后一行
+                    logger.warning(f"跳过无法解析的日志记录: {journal_file}")
+                    continue
+                event = record.get("event")
+                if event == "plan":
+                    plan_record = record
+                elif event == "step_complete":
+                    completed_steps[record["step_id"]] = record
+                elif event == "resume":
+                    resume_count += 1
+                elif event == "task_end":
+                    return None
+
+        if plan_record is None:
+            return None
+        task_plan = TaskPlan(**plan_record["task_plan"])
+        return JournalState(task_plan, plan_record["user_id"], completed_steps, resume_count)
+
+    def find_unfinished(self) -> List[JournalState]:
+        """
+        查找可恢复的未完成任务
+
+        没有执行计划（规划期间中断）或恢复次数已达上限的日志直接归档，不再恢复
+        """
+        states = []
+        for journal_file in sorted(self.journal_dir.glob("*.jsonl"), key=lambda path: path.stat().st_mtime):
+            try:
+                state = self.load(journal_file.stem)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"读取执行日志失败: {journal_file} - {e}")
+                state = None
+            if state is None or state.resume_count >= self.max_resumes:
+                logger.info(f"执行日志无法恢复，已归档: {journal_file.name}")
+                self._archive(journal_file)
+                continue
+            states.append(state)
+        return states
+
+    @staticmethod
+    def restore_step(step: Step, record: Dict[str, Any]) -> None:
+        """将步骤完成记录写回步骤"""
+        step.status = StepStatus(record["status"])
+        step.result = record["result"]
+        step.error_message = record["error_message"]
+        step.start_time = datetime.fromisoformat(record["start_time"]) if record["start_time"] else None
+        step.end_time = datetime.fromisoformat(record["end_time"]) if record["end_time"] else None
+
+    def _journal_file(self, task_id: str) -> Path:
+        return self.journal_dir / f"{task_id}.jsonl"
+
+    def _append(self, task_id: str, record: Dict[str, Any]) -> None:
+        if self._closed:
+            return
+        record["timestamp"] = datetime.now().isoformat()
+        # 在提交时序列化，之后对结果对象的修改不影响已提交的记录
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        self._active.add(task_id)
+        self._submit((_OP_APPEND, self._journal_file(task_id), line))
+
+    def _submit(self, op: Tuple[str, Path, Optional[str]]) -> None:
+        """提交写入操作；没有运行中的事件循环时直接写入"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._apply_batch([op])
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._queue.put_nowait(op)
+        if self._writer is None or self._writer.done():
+            self._writer = loop.create_task(self._write_loop())
+
+    async def _write_loop(self) -> None:
+        """依次取出队列中积累的操作，在线程中批量写入"""
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._apply_batch, batch)
+            except Exception as e:
+                logger.warning(f"写入执行日志失败: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _apply_batch(self, batch: List[Tuple[str, Path, Optional[str]]]) -> None:
+        """
+        执行一批写入操作：同一文件的记录合并为一次写入，归档前先写完该文件之前的记录，
+        删除时丢弃该文件尚未写入的记录
+        """
+        pending: Dict[Path, List[str]] = {}
+        for kind, journal_file, line in batch:
+            if kind == _OP_APPEND:
+                pending.setdefault(journal_file, []).append(line)
+            elif kind == _OP_DELETE:
+                pending.pop(journal_file, None)
+                self._delete(journal_file)
+            else:
+                self._write_lines(journal_file, pending.pop(journal_file, []))
+                self._archive(journal_file)
+        for journal_file, lines in pending.items():
+            self._write_lines(journal_file, lines)
+
+    def _write_lines(self, journal_file: Path, lines: List[str]) -> None:
+        if not lines:
+            return
+        try:
+            with open(journal_file, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        except OSError as e:
+            logger.warning(f"写入执行日志失败: {journal_file} - {e}")
+
+    def _archive(self, journal_file: Path) -> None:
+        try:
+            shutil.move(str(journal_file), str(self.journal_dir / _FINISHED_DIR / journal_file.name))
+        except OSError as e:
+            logger.warning(f"归档执行日志失败: {journal_file} - {e}")
+
+    def _delete(self, journal_file: Path) -> None:
+        try:
+            journal_file.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"删除执行日志失败: {journal_file} - {e}")
+
+    def _prune_archive(self) -> None:
+        """清理归档目录：按修改时间删除超过保留时长的日志，并只保留最新的archive_max_entries个"""
+        archived = []
+        for journal_file in (self.journal_dir / _FINISHED_DIR).glob("*.jsonl"):
+            try:
+                archived.append((journal_file.stat().st_mtime, journal_file))
+            except OSError:
+                continue
+        archived.sort(key=lambda item: item[0], reverse=True)
+
+        now = time.time()
+        for index, (mtime, journal_file) in enumerate(archived):
+            if index >= self.archive_max_entries or (self.archive_ttl > 0 and now - mtime > self.archive_ttl):
+                self._delete(journal_file)
@@ -11,8 +11,13 @@ import json
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from pathlib import Path
+from urllib.parse import urlparse
 import uuid
 
+from pydantic import ValidationError
+
+from .models import Artifact
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
@@ -121,6 +126,65 @@ class FileManager:
             logger.error(f"注册文件失败: {e}")
             return False
     
+    def ingest_artifacts(self, task_id: str, artifacts: List[Dict[str, Any]], step_id: str = None,
+                         description: str = "") -> List[Dict[str, Any]]:
+        """
+        按工具返回的产出物清单登记文件
+        
+        清单中的路径、大小、MIME类型与哈希由工具写文件时给出，这里直接采用，不访问文件系统；
+        远程资源（如生成图片的URL）同样登记，file_path为空、url为资源地址。
+        同一任务中路径或内容哈希相同的产出物只登记一次
+        
+        Args:
+            task_id: 任务ID
+            artifacts: 产出物清单（字段见 core.models.Artifact）
+            step_id: 生成这些文件的步骤ID
+            description: 清单条目没有描述时使用的描述
+            
+        Returns:
+            List[Dict]: 新登记的文件信息
+        """
+        if task_id not in self.task_files:
+            self.task_files[task_id] = {"files": [], "metadata": {}}
+        files = self.task_files[task_id]["files"]
+        known = {file_info.get("file_path") or file_info.get("url") for file_info in files}
+        known.update(file_info["sha256"] for file_info in files if file_info.get("sha256"))
+        
+        ingested = []
+        for item in artifacts:
+            try:
+                artifact = Artifact(**item)
+            except (TypeError, ValidationError) as e:
+                logger.warning(f"忽略无效的产出物清单条目: {item} - {e}")
+                continue
+            location = artifact.path or artifact.url
+            if not location:
+                logger.warning(f"产出物既没有路径也没有URL，跳过: {artifact.name}")
+                continue
+            if location in known or (artifact.sha256 and artifact.sha256 in known):
+                continue
+            
+            file_info = {
+                "file_path": artifact.path,
+                "url": artifact.url,
+                "file_name": artifact.name,
+                "file_type": artifact.file_type,
+                "mime_type": artifact.mime_type,
+                "file_size": artifact.size,
+                "sha256": artifact.sha256,
+                "remote": artifact.is_remote,
+                "step_id": step_id,
+                "description": artifact.description or description,
+                "registered_at": datetime.now().isoformat()
+            }
+            files.append(file_info)
+            known.add(location)
+            if artifact.sha256:
+                known.add(artifact.sha256)
+            ingested.append(file_info)
+            logger.info(f"产出物已登记到任务 {task_id}: {location}")
+        return ingested
+    
     def _ensure_file_extension(self, file_name: str, file_type: str) -> str:
         """
         确保文件名包含正确的后缀名
@@ -192,12 +256,15 @@ class FileManager:
         
         # 获取已经注册的文件路径
         if task_id in self.task_files:
-            registered_files = {file_info["file_path"] for file_info in self.task_files[task_id]["files"]}
+            registered_files = {file_info.get("file_path") or file_info.get("url") for file_info in self.task_files[task_id]["files"]}
         
         try:
             # 从execution_result.files_generated收集
             if hasattr(execution_result, 'files_generated'):
                 for file_path in execution_result.files_generated:
+                    # 按产出物清单登记的文件（含远程资源）已在记录中
+                    if file_path in registered_files:
+                        continue
                     # 标准化文件路径
                     normalized_path = str(Path(file_path).resolve())
                     if normalized_path not in registered_files:
@@ -226,10 +293,21 @@ class FileManager:
                                     collected_files.append(file_path)
                                     registered_files.add(normalized_path)
                         
-                        # 处理图片生成结果
-                        elif 'url' in step_result and result.get('function_name') == 'image_generation':
-                            # 图片生成的结果处理逻辑
-                            pass
+                        # 处理没有产出物清单的图片生成结果：按images[*].url登记远程资源
+                        elif isinstance(step_result.get('images'), list) and not isinstance(step_result.get('artifacts'), list):
+                            description = result.get('step_description', '')
+                            artifacts = [
+                                {
+                                    "url": image["url"],
+                                    "name": os.path.basename(urlparse(image["url"]).path) or "image",
+                                    "file_type": "png"
+                                }
+                                for image in step_result['images']
+                                if isinstance(image, dict) and image.get('url')
+                            ]
+                            for file_info in self.ingest_artifacts(task_id, artifacts, step_id, description):
+                                collected_files.append(file_info["url"])
+                                registered_files.add(file_info["url"])
             
             logger.info(f"任务 {task_id} 共收集到 {len(collected_files)} 个新文件")
             return collected_files
@@ -259,6 +337,9 @@ class FileManager:
             
             for file_info in self.task_files[task_id]["files"]:
                 source_path = file_info["file_path"]
+                if not source_path:
+                    # 远程产出物没有本地文件
+                    continue
                 target_path = task_dir / file_info["file_name"]
                 
                 try:
@@ -309,6 +390,9 @@ class FileManager:
                 # 直接从注册的文件路径添加文件到ZIP
                 for file_info in self.task_files[task_id]["files"]:
                     source_path = file_info["file_path"]
+                    if not source_path:
+                        # 远程产出物只记录在元数据中
+                        continue
                     if os.path.exists(source_path):
                         # 使用文件名作为ZIP内的路径
                         arcname = file_info["file_name"]
@@ -357,7 +441,8 @@ class FileManager:
         if task_id in self.task_files:
             metadata = self.task_files[task_id]["metadata"].copy()
             metadata["file_count"] = len(self.task_files[task_id]["files"])
-            metadata["total_size"] = sum(f.get("file_size", 0) for f in self.task_files[task_id]["files"])
+            metadata["total_size"] = sum(f.get("file_size") or 0 for f in self.task_files[task_id]["files"])
+            metadata["remote_files"] = [f["url"] for f in self.task_files[task_id]["files"] if f.get("remote")]
             return metadata
         return {}
     
@@ -393,6 +478,7 @@ class FileManager:
                     "name": f["file_name"],
                     "type": f["file_type"],
                     "size": f["file_size"],
+                    "url": f.get("url"),
                     "description": f.get("description", "")
                 } for f in files
             ]
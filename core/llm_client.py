@@ -0,0 +1,256 @@
+"""
+LLM客户端适配
+统一规划阶段的LLM调用为异步方式，保证网络等待期间让出事件循环；
+每次调用按声明的类别经模型路由选择模型，并记录延迟与token用量；
+调用受当前任务的截止时间约束，失败时在任务重试预算内重试，可选对冲慢请求
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from openai import AsyncOpenAI, OpenAI
+
+from config import settings
+from utils.tracing import get_current_trace, span
+from .call_policy import CallPolicy, TaskDeadline, get_call_policy, get_task_deadline
+from .model_router import ROUTE_DEFAULT, ModelRouter, get_model_router
+from .prompt_compiler import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def to_async_client(llm_client: Union[OpenAI, AsyncOpenAI]) -> AsyncOpenAI:
+    """
+    获取异步LLM客户端
+
+    传入同步OpenAI客户端时，基于相同的api_key/base_url创建AsyncOpenAI客户端；
+    传入的已是异步客户端（或兼容对象）时原样返回。
+
+    Args:
+        llm_client: OpenAI或AsyncOpenAI客户端
+
+    Returns:
+        AsyncOpenAI: 异步客户端
+    """
+    if isinstance(llm_client, OpenAI):
+        logger.info("检测到同步OpenAI客户端，已转换为AsyncOpenAI客户端")
+        return AsyncOpenAI(
+            api_key=llm_client.api_key,
+            base_url=llm_client.base_url,
+            timeout=llm_client.timeout,
+            max_retries=llm_client.max_retries
+        )
+    return llm_client
+
+
+class LLMCaller:
+    """异步LLM调用封装 - 规划器各阶段共用的调用入口，按调用类别路由模型并记录统计"""
+
+    def __init__(self, llm_client: Union[OpenAI, AsyncOpenAI], model_name: str,
+                 router: Optional[ModelRouter] = None, policy: Optional[CallPolicy] = None):
+        """
+        初始化LLM调用封装
+
+        Args:
+            llm_client: OpenAI或AsyncOpenAI客户端
+            model_name: 默认模型名称，调用类别未配置模型时使用
+            router: 模型路由器，默认使用进程内共享的路由器
+            policy: 调用策略（超时、重试、对冲），默认使用进程内共享的策略
+        """
+        self.client = to_async_client(llm_client)
+        if hasattr(self.client, "with_options"):
+            # 重试统一由任务重试预算控制，关闭客户端自身的自动重试
+            self.client = self.client.with_options(max_retries=0)
+        self.model_name = model_name
+        self.router = router or get_model_router()
+        self.policy = policy or get_call_policy()
+
+    async def parse(self, messages: List[Dict[str, str]], response_format: Any,
+                    route: str = ROUTE_DEFAULT, latency_budget: Optional[float] = None,
+                    call_site: Optional[str] = None, **kwargs) -> Any:
+        """
+        结构化输出调用
+
+        Args:
+            messages: 消息列表
+            response_format: 输出模型
+            route: 调用类别，决定使用的模型
+            latency_budget: 调用点的延迟预算(秒)，超出时记录告警
+            call_site: 调用点名称，用于延迟直方图与对冲阈值，默认使用调用类别
+        """
+        return await self._call(
+            self.client.beta.chat.completions.parse, messages, route, latency_budget, call_site,
+            response_format=response_format, **kwargs
+        )
+
+    async def create(self, messages: List[Dict[str, str]], route: str = ROUTE_DEFAULT,
+                     latency_budget: Optional[float] = None, call_site: Optional[str] = None, **kwargs) -> Any:
+        """普通（非流式）调用，参数同parse"""
+        return await self._call(
+            self.client.chat.completions.create, messages, route, latency_budget, call_site, **kwargs
+        )
+
+    async def stream(self, messages: List[Dict[str, str]], route: str = ROUTE_DEFAULT,
+                     latency_budget: Optional[float] = None, call_site: Optional[str] = None,
+                     **kwargs) -> AsyncIterator[str]:
+        """
+        流式调用，逐段产出文本内容；服务端未返回用量时按文本估算token数
+
+        每个片段的等待时间受调用超时与任务剩余时间约束；只有在产出首个片段之前失败才会重试，
+        已产出内容后失败直接抛出，避免调用方收到重复内容。流式调用不发出对冲请求
+        """
+        model = self.router.resolve(route, self.model_name)
+        call_site = call_site or route
+        budget = self._get_retry_budget()
+        start_time = time.perf_counter()
+        # 流式调用跨越多次yield，结束时按起止时间记录区间（含首个片段的等待时间）
+        trace = get_current_trace()
+        start_ns = time.perf_counter_ns() if trace else 0
+        first_chunk_ns = None
+        usage = None
+        completion = []
+        success = False
+        attempt = 0
+        try:
+            while True:
+                try:
+                    async for chunk in self._stream_chunks(model=model, messages=messages, stream=True, **kwargs):
+                        if getattr(chunk, "usage", None):
+                            usage = chunk.usage
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            if trace and first_chunk_ns is None:
+                                first_chunk_ns = time.perf_counter_ns()
+                            completion.append(chunk.choices[0].delta.content)
+                            yield chunk.choices[0].delta.content
+                    break
+                except Exception as e:
+                    if completion or not await self._prepare_retry(call_site, e, attempt, budget):
+                        raise
+                    attempt += 1
+            success = True
+            self.policy.observe(call_site, time.perf_counter() - start_time)
+        finally:
+            if usage:
+                prompt_tokens, completion_tokens = usage.prompt_tokens or 0, usage.completion_tokens or 0
+            else:
+                prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in messages)
+                completion_tokens = estimate_tokens("".join(completion))
+            self.router.record(
+                route, model, time.perf_counter() - start_time, prompt_tokens, completion_tokens,
+                success=success, latency_budget=latency_budget
+            )
+            if trace:
+                trace.add(f"llm_stream:{call_site}", "llm", start_ns, time.perf_counter_ns(), {
+                    "model": model,
+                    "attempts": attempt + 1,
+                    "success": success,
+                    "first_chunk_ms": round((first_chunk_ns - start_ns) / 1e6, 1) if first_chunk_ns else None
+                })
+
+    async def _stream_chunks(self, **kwargs) -> AsyncIterator[Any]:
+        """发起一次流式请求，逐个产出响应片段；建立连接与等待每个片段都受调用超时约束"""
+        response = await asyncio.wait_for(self.client.chat.completions.create(**kwargs), self.policy.get_call_timeout())
+        chunks = response.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), self.policy.get_call_timeout())
+            except StopAsyncIteration:
+                return
+            yield chunk
+
+    async def _call(self, method, messages: List[Dict[str, str]], route: str,
+                    latency_budget: Optional[float], call_site: Optional[str] = None, **kwargs) -> Any:
+        """执行非流式调用（超时、重试与对冲）并记录延迟与token用量"""
+        model = self.router.resolve(route, self.model_name)
+        call_site = call_site or route
+        budget = self._get_retry_budget()
+        attempt = 0
+        while True:
+            start_time = time.perf_counter()
+            try:
+                with span(f"llm:{call_site}", "llm", model=model, attempt=attempt):
+                    response = await self._hedged_request(method, call_site, budget, model=model, messages=messages, **kwargs)
+            except Exception as e:
+                self.router.record(route, model, time.perf_counter() - start_time, success=False,
+                                   latency_budget=latency_budget)
+                if not await self._prepare_retry(call_site, e, attempt, budget):
+                    raise
+                attempt += 1
+                continue
+
+            latency = time.perf_counter() - start_time
+            self.policy.observe(call_site, latency)
+            usage = getattr(response, "usage", None)
+            self.router.record(
+                route, model, latency,
+                getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0,
+                latency_budget=latency_budget
+            )
+            return response
+
+    async def _hedged_request(self, method, call_site: str, budget: TaskDeadline, **kwargs) -> Any:
+        """
+        发出一次请求；耗时超过调用点的对冲阈值且重试预算允许时，再发出一个相同的请求，
+        取先成功返回的结果并取消另一个
+        """
+        timeout = self.policy.get_call_timeout()
+        hedge_delay = self.policy.get_hedge_delay(call_site)
+        if hedge_delay is None or (timeout is not None and hedge_delay >= timeout):
+            return await asyncio.wait_for(method(**kwargs), timeout)
+
+        start_time = time.perf_counter()
+        primary = asyncio.ensure_future(asyncio.wait_for(method(**kwargs), timeout))
+        requests = [primary]
+        try:
+            done, _ = await asyncio.wait(requests, timeout=hedge_delay)
+            if not done and budget.try_spend_retry():
+                self.policy.count(call_site, "hedges")
+                logger.info(f"🪁 {call_site} 调用超过对冲阈值 {hedge_delay:.2f}s，发出对冲请求")
+                remaining = None if timeout is None else max(0.0, timeout - (time.perf_counter() - start_time))
+                requests.append(asyncio.ensure_future(asyncio.wait_for(method(**kwargs), remaining)))
+
+            pending = set(requests)
+            first_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for request in done:
+                    if request.exception() is None:
+                        if request is not primary:
+                            self.policy.count(call_site, "hedge_wins")
+                        return request.result()
+                    first_error = first_error or request.exception()
+            raise first_error
+        finally:
+            for request in requests:
+                if not request.done():
+                    request.cancel()
+
+    async def _prepare_retry(self, call_site: str, error: Exception, attempt: int, budget: TaskDeadline) -> bool:
+        """
+        判断失败的调用能否重试：错误可重试、退避后仍在任务截止时间内且重试预算未用尽。
+        可以重试时等待退避时间后返回True
+        """
+        if isinstance(error, asyncio.TimeoutError):
+            self.policy.count(call_site, "timeouts")
+        if not self.policy.is_retryable(error):
+            return False
+
+        backoff = self.policy.get_backoff(attempt)
+        remaining = budget.remaining()
+        if (remaining is not None and backoff >= remaining) or not budget.try_spend_retry():
+            return False
+
+        self.policy.count(call_site, "retries")
+        logger.warning(
+            f"🔁 {call_site} 调用失败，{backoff:.1f}s后重试（重试预算 {budget.retries_used}/{budget.retry_budget}）: "
+            f"{type(error).__name__}: {error}"
+        )
+        await asyncio.sleep(backoff)
+        return True
+
+    @staticmethod
+    def _get_retry_budget() -> TaskDeadline:
+        """当前任务的重试预算；不在任务作用域内时每次调用单独使用一份预算"""
+        return get_task_deadline() or TaskDeadline(retry_budget=settings.TASK_RETRY_BUDGET)
@@ -0,0 +1,183 @@
+"""
+模型路由
+按调用类别选择模型：分类类调用走小模型，规划与文件生成保留大模型。
+各调用点声明自己的类别与延迟预算，路由记录每个类别的延迟与token统计
+"""
+
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Optional
+
+from config import settings
+from .call_policy import call_timeout
+
+logger = logging.getLogger(__name__)
+
+# 调用类别
+ROUTE_CLASSIFY = "classify"   # 分诊、明确度、任务类型等短结构化判断
+ROUTE_CHAT = "chat"           # 对话回复、追问等短文本
+ROUTE_PLAN = "plan"           # 执行计划与改进计划生成
+ROUTE_GENERATE = "generate"   # 文件、图表代码与回答内容生成
+ROUTE_DEFAULT = "default"     # 未声明类别的调用，使用调用方的默认模型
+
+# 每个类别保留的最近延迟样本数
+_LATENCY_WINDOW = 1000
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class RoutedCall:
+    """一次路由调用的模型、超时与token用量，供同步调用点在track上下文中填写"""
+
+    def __init__(self, route: str, model: str, timeout: Optional[float] = None):
+        self.route = route
+        self.model = model
+        # 调用超时（受当前任务剩余时间约束），传给客户端的timeout参数
+        self.timeout = timeout
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add_usage(self, usage: Any) -> None:
+        """累加响应中的token用量（usage为空时忽略）"""
+        if usage:
+            self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
+
+class ModelRouter:
+    """模型路由器 - 类别到模型的映射与分类别调用统计"""
+
+    def __init__(self, routes: Optional[Dict[str, str]] = None,
+                 latency_budgets: Optional[Dict[str, float]] = None):
+        """
+        初始化模型路由器
+
+        Args:
+            routes: 类别到模型名称的映射，未配置或为空的类别使用调用方的默认模型
+            latency_budgets: 类别的延迟预算(秒)，配置后覆盖调用点声明的预算
+        """
+        self.routes = {route: model for route, model in (routes or {}).items() if model}
+        self.latency_budgets = dict(latency_budgets or {})
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, route: str, default_model: Optional[str] = None) -> str:
+        """
+        获取类别对应的模型
+
+        Args:
+            route: 调用类别
+            default_model: 类别未配置模型时使用的模型
+
+        Returns:
+            str: 模型名称
+        """
+        return self.routes.get(route) or default_model or settings.LLM_DEFAULT_MODEL
+
+    def get_latency_budget(self, route: str, declared: Optional[float] = None) -> Optional[float]:
+        """获取类别的延迟预算，配置优先于调用点声明"""
+        return self.latency_budgets.get(route, declared)
+
+    def record(self, route: str, model: str, latency: float, prompt_tokens: int = 0,
+               completion_tokens: int = 0, success: bool = True,
+               latency_budget: Optional[float] = None) -> None:
+        """
+        记录一次调用
+
+        Args:
+            route: 调用类别
+            model: 实际使用的模型
+            latency: 调用耗时(秒)
+            prompt_tokens: 输入token数
+            completion_tokens: 输出token数
+            success: 调用是否成功
+            latency_budget: 调用点声明的延迟预算(秒)
+        """
+        budget = self.get_latency_budget(route, latency_budget)
+        over_budget = budget is not None and latency > budget
+        with self._lock:
+            stats = self._stats.setdefault(route, {
+                "model": model,
+                "calls": 0,
+                "errors": 0,
+                "over_budget": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "latency_budget": budget
+            })
+            stats["model"] = model
+            stats["latency_budget"] = budget
+            stats["calls"] += 1
+            stats["errors"] += int(not success)
+            stats["over_budget"] += int(over_budget)
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            self._latencies.setdefault(route, deque(maxlen=_LATENCY_WINDOW)).append(latency)
+
+        if over_budget:
+            logger.warning(f"⏱️ {route} 调用超出延迟预算: {latency:.2f}s > {budget}s（模型 {model}）")
+
+    def record_usage(self, usage: Dict[str, Any]) -> None:
+        """记录其他进程中完成的一次调用（如MCP工具结果中附带的llm_usage记录）"""
+        route = usage.get("route") or ROUTE_DEFAULT
+        self.record(
+            route, usage.get("model") or self.resolve(route), float(usage.get("latency") or 0.0),
+            int(usage.get("prompt_tokens") or 0), int(usage.get("completion_tokens") or 0),
+            success=bool(usage.get("success", True)), latency_budget=usage.get("latency_budget")
+        )
+
+    @contextmanager
+    def track(self, route: str, default_model: Optional[str] = None,
+              latency_budget: Optional[float] = None) -> Iterator[RoutedCall]:
+        """
+        同步调用点使用的路由上下文：进入时选择模型并计算调用超时，退出时记录延迟与token用量
+
+        用法：
+            with router.track(ROUTE_GENERATE, latency_budget=120) as call:
+                response = client.chat.completions.create(model=call.model, timeout=call.timeout, ...)
+                call.add_usage(response.usage)
+        """
+        call = RoutedCall(route, self.resolve(route, default_model), call_timeout(settings.LLM_CALL_TIMEOUT or None))
+        start_time = time.perf_counter()
+        success = False
+        try:
+            yield call
+            success = True
+        finally:
+            self.record(route, call.model, time.perf_counter() - start_time, call.prompt_tokens,
+                        call.completion_tokens, success=success, latency_budget=latency_budget)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各类别的调用次数、延迟分布与token统计"""
+        with self._lock:
+            result = {}
+            for route, stats in self._stats.items():
+                latencies = list(self._latencies.get(route, ()))
+                result[route] = {
+                    **stats,
+                    "mean_latency": round(statistics.mean(latencies), 3) if latencies else None,
+                    "p50_latency": round(_percentile(latencies, 50), 3) if latencies else None,
+                    "p95_latency": round(_percentile(latencies, 95), 3) if latencies else None
+                }
+            return result
+
+
+_default_router: Optional[ModelRouter] = None
+
+
+def get_model_router() -> ModelRouter:
+    """获取进程内共享的模型路由器（按settings.MODEL_ROUTES创建）"""
+    global _default_router
+    if _default_router is None:
+        _default_router = ModelRouter(settings.MODEL_ROUTES, settings.MODEL_ROUTE_LATENCY_BUDGETS)
+        logger.info(f"模型路由: {_default_router.routes or '全部使用默认模型'}")
+    return _default_router
@@ -29,6 +29,7 @@ class StepStatus(Enum):
     COMPLETED = "completed"
     FAILED = "failed"
     SKIPPED = "skipped"
+    CANCELLED = "cancelled"
 
 
 class Step(BaseModel):
@@ -38,6 +39,10 @@ class Step(BaseModel):
     function_name: str = Field(description="要调用的函数名")
     args: Dict[str, Any] = Field(description="函数参数")
     is_final: bool = Field(default=False, description="是否为最终步骤")
+    depends_on: Optional[List[int]] = Field(
+        default=None,
+        description="依赖的前序步骤序号（从1开始）；空列表表示不依赖任何步骤、可与其他步骤并行执行；不填表示依赖上一步"
+    )
     status: StepStatus = Field(default=StepStatus.PENDING)
     result: Optional[Any] = None
     error_message: Optional[str] = None
@@ -68,6 +73,22 @@ class TaskPlan(BaseModel):
     generated_files: List[str] = Field(default_factory=list, description="任务生成的文件列表")
 
 
+class Artifact(BaseModel):
+    """工具产出物清单条目，由工具在生成文件时填写，本地文件与远程资源（如生成图片的URL）统一描述"""
+    path: Optional[str] = Field(default=None, description="本地文件的绝对路径")
+    url: Optional[str] = Field(default=None, description="远程资源地址")
+    name: str = Field(description="文件名")
+    mime_type: str = Field(default="application/octet-stream", description="MIME类型")
+    size: Optional[int] = Field(default=None, description="文件大小(字节)，远程资源未知时为空")
+    sha256: Optional[str] = Field(default=None, description="内容哈希，远程资源为空")
+    file_type: str = Field(default="unknown", description="文件类型，如 py、html、png")
+    description: str = Field(default="", description="文件描述")
+
+    @property
+    def is_remote(self) -> bool:
+        return self.path is None and self.url is not None
+
+
 class ExecutionResult(BaseModel):
     """执行结果"""
     task_id: str
@@ -76,6 +97,9 @@ class ExecutionResult(BaseModel):
     error_message: Optional[str] = None
     execution_time: float = 0.0
     files_generated: List[str] = Field(default_factory=list)
+    time_to_first_result: Optional[float] = Field(default=None, description="从开始处理到首个步骤完成的耗时(秒)")
+    wall_clock_time: Optional[float] = Field(default=None, description="步骤执行阶段的实际耗时(秒)，从首个步骤开始到最后一个步骤结束")
+    sequential_time: Optional[float] = Field(default=None, description="各步骤耗时之和(秒)，即顺序执行所需的时间")
 
 
 class TaskType(BaseModel):
@@ -103,4 +127,23 @@ class IsTaskOrConversation(BaseModel):
     """任务类型"""
     type: Literal["conversation", "task"] = Field(
         description="任务类型，可选值：conversation, task"
-    )
\ No newline at end of file
+    )
+
+
+class CombinedTriage(BaseModel):
+    """合并分诊结果（单次结构化输出同时完成对话检测、明确度分析、任务类型分析和改进检测）"""
+    conversation: IsTaskOrConversation = Field(description="对话还是任务")
+    clarity: TaskClarityScore = Field(description="任务明确度评分")
+    task_type: TaskType = Field(description="任务类型")
+    is_improvement: bool = Field(description="是否为对上一个任务的改进请求")
+
+
+class TriageResult(BaseModel):
+    """任务分诊结果（改进检测、对话检测、明确度分析、任务类型分析的汇总）"""
+    is_improvement: bool = Field(default=False, description="是否为对上一个任务的改进请求")
+    is_conversation: bool = Field(default=False, description="是否为对话而非任务")
+    clarity: Optional[TaskClarityScore] = Field(default=None, description="任务明确度评分")
+    task_type: Optional[str] = Field(default=None, description="任务类型")
+    timings: Dict[str, float] = Field(default_factory=dict, description="各分类器耗时(秒)")
+    cancelled: List[str] = Field(default_factory=list, description="被提前取消的分类器")
+    elapsed: float = Field(default=0.0, description="分诊总耗时(秒)")
@@ -0,0 +1,203 @@
+"""
+执行计划缓存
+相同需求（归一化后的用户输入 + 工具清单版本）直接复用已生成的计划，跳过LLM规划调用
+"""
+
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .models import Plan, Step
+
+logger = logging.getLogger(__name__)
+
+# 缓存计划时保留的步骤字段（step_id、状态、结果等运行期字段不缓存）
+_CACHED_STEP_FIELDS = {"step_description", "function_name", "args", "is_final", "depends_on"}
+
+
+def normalize_user_input(user_input: str) -> str:
+    """
+    归一化用户输入
+
+    去除首尾空白与结尾标点、合并连续空白，
+    使 "生成一个Python hello world程序。" 与 "生成一个Python  hello world程序" 命中同一缓存；
+    不改变大小写，文件名、URL、代码标识符仅大小写不同的输入不会共用计划
+    """
+    text = re.sub(r"\s+", " ", user_input.strip())
+    return text.rstrip("。.!！?？~～ ")
+
+
+class PlanCache:
+    """执行计划缓存 - LRU + TTL淘汰，可选磁盘持久化"""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600, cache_dir: Optional[str] = None):
+        """
+        初始化计划缓存
+
+        Args:
+            max_entries: 内存中最多缓存的计划数，超出后淘汰最久未使用的条目
+            ttl: 缓存有效期(秒)，<=0 表示永不过期
+            cache_dir: 磁盘缓存目录，为空时仅使用内存缓存；目录中的文件数同样不超过max_entries
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.saved_seconds = 0.0
+
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._sweep_disk()
+
+        logger.info(f"PlanCache初始化完成，容量: {max_entries}，TTL: {ttl}s，磁盘目录: {self.cache_dir or '无'}")
+
+    @staticmethod
+    def make_key(user_input: str, catalog_version: str) -> str:
+        """根据归一化输入与工具清单版本生成缓存键"""
+        raw = f"{catalog_version}\n{normalize_user_input(user_input)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Plan]:
+        """
+        查询缓存
+
+        Returns:
+            Optional[Plan]: 命中时返回带有全新plan_id/step_id的计划，未命中返回None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._load_from_disk(key)
+            if entry is not None:
+                self._store(key, entry)
+
+        if entry is not None and self._is_expired(entry):
+            self.expirations += 1
+            self._remove(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.saved_seconds += entry["generation_time"]
+        return self._build_plan(entry["plan"])
+
+    def put(self, key: str, plan: Plan, generation_time: float) -> None:
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            plan: LLM生成的计划
+            generation_time: 生成该计划的耗时(秒)，用于统计缓存节省的时间
+        """
+        entry = {
+            "plan": {
+                "steps": [step.model_dump(mode="json", include=_CACHED_STEP_FIELDS) for step in plan.steps],
+                "estimated_duration": plan.estimated_duration
+            },
+            "generation_time": generation_time,
+            "created_at": time.time()
+        }
+        self._store(key, entry)
+        self._save_to_disk(key, entry)
+
+    def clear(self) -> None:
+        """清空内存与磁盘缓存"""
+        self._entries.clear()
+        if self.cache_dir:
+            for cache_file in self.cache_dir.glob("*.json"):
+                cache_file.unlink(missing_ok=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "saved_seconds": round(self.saved_seconds, 3)
+        }
+
+    def _build_plan(self, plan_data: Dict[str, Any]) -> Plan:
+        """由缓存数据重建计划，plan_id/step_id/created_at均重新生成"""
+        return Plan(
+            steps=[Step(**step_data) for step_data in plan_data["steps"]],
+            estimated_duration=plan_data.get("estimated_duration")
+        )
+
+    def _is_expired(self, entry: Dict[str, Any]) -> bool:
+        return self.ttl > 0 and time.time() - entry["created_at"] > self.ttl
+
+    def _store(self, key: str, entry: Dict[str, Any]) -> None:
+        """写入内存并按LRU淘汰"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted_key, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            if self.cache_dir:
+                (self.cache_dir / f"{evicted_key}.json").unlink(missing_ok=True)
+
+    def _remove(self, key: str) -> None:
+        self._entries.pop(key, None)
+        if self.cache_dir:
+            (self.cache_dir / f"{key}.json").unlink(missing_ok=True)
+
+    def _sweep_disk(self) -> None:
+        """
+        清理磁盘缓存目录（以前运行遗留的文件只在再次读取时才会被淘汰）
+
+        按修改时间删除过期文件，并只保留最新的max_entries个
+        """
+        cache_files = []
+        for cache_file in self.cache_dir.glob("*.json"):
+            try:
+                cache_files.append((cache_file.stat().st_mtime, cache_file))
+            except OSError:
+                continue
+        cache_files.sort(key=lambda item: item[0], reverse=True)
+
+        now = time.time()
+        for index, (mtime, cache_file) in enumerate(cache_files):
+            if index >= self.max_entries or (self.ttl > 0 and now - mtime > self.ttl):
+                cache_file.unlink(missing_ok=True)
+
+    def _load_from_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.cache_dir:
+            return None
+        cache_file = self.cache_dir / f"{key}.json"
+        if not cache_file.exists():
+            return None
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"读取计划缓存文件失败: {cache_file} - {e}")
+            return None
+
+    def _save_to_disk(self, key: str, entry: Dict[str, Any]) -> None:
+        if not self.cache_dir:
+            return
+        cache_file = self.cache_dir / f"{key}.json"
+        try:
+            with open(cache_file, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+        except OSError as e:
+            logger.warning(f"写入计划缓存文件失败: {cache_file} - {e}")
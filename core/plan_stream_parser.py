@@ -0,0 +1,177 @@
+"""
+流式计划解析
+在LLM流式输出计划的过程中增量扫描JSON，每当一个步骤对象闭合就立即解析为Step，
+并容忍代码块包裹、前后说明文字以及输出被截断的情况
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from .models import Plan, Step
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalPlanParser:
+    """增量计划解析器 - 逐段喂入流式文本，产出已闭合的步骤"""
+
+    def __init__(self):
+        self.steps: List[Step] = []
+        self.errors: List[str] = []
+
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+
+        self._root_start: Optional[int] = None
+        self._root_end: Optional[int] = None
+        self._steps_depth: Optional[int] = None
+        self._steps_closed = False
+        self._step_start: Optional[int] = None
+        self._steps_in_array = 0
+
+    @property
+    def truncated(self) -> bool:
+        """步骤数组是否尚未闭合（输出被截断或仍在生成中）"""
+        return self._steps_depth is not None and not self._steps_closed
+
+    def feed(self, text: str) -> List[Step]:
+        """
+        喂入一段流式文本
+
+        Args:
+            text: 新到达的文本片段
+
+        Returns:
+            List[Step]: 本次新闭合并解析成功的步骤
+        """
+        self._buffer += text
+        new_steps = []
+
+        while self._pos < len(self._buffer):
+            index = self._pos
+            char = self._buffer[index]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = self._buffer[self._string_start + 1:index]
+                continue
+
+            if char == '"':
+                if self._stack:
+                    self._in_string = True
+                    self._string_start = index
+            elif char == ":":
+                if self._stack and self._stack[-1] == "{":
+                    self._current_key = self._last_string
+            elif char == ",":
+                self._current_key = None
+            elif char in "{[":
+                self._open(char, index)
+            elif char in "}]":
+                step = self._close(char, index)
+                if step:
+                    new_steps.append(step)
+
+        return new_steps
+
+    def finish(self) -> Plan:
+        """
+        结束解析并组装计划
+
+        Returns:
+            Plan: 由已解析步骤组成的计划（步骤对象与流式阶段产出的为同一批实例）
+
+        Raises:
+            ValueError: 未解析出任何步骤
+        """
+        if not self.steps:
+            raise ValueError("未找到JSON格式的计划")
+
+        if self.truncated:
+            logger.warning(f"计划输出不完整，保留已闭合的{len(self.steps)}个步骤")
+        if not any(step.is_final for step in self.steps):
+            self.steps[-1].is_final = True
+
+        return Plan(steps=self.steps, **self._parse_plan_fields())
+
+    def _open(self, char: str, index: int) -> None:
+        if not self._stack and not self._steps_closed:
+            self._root_start = index
+            self._root_end = None
+
+        # 识别步骤数组："steps"键对应的数组，或直接输出的顶层数组
+        if char == "[" and self._steps_depth is None:
+            if not self._stack or self._current_key == "steps":
+                self._steps_depth = len(self._stack) + 1
+                self._steps_in_array = 0
+
+        self._stack.append(char)
+        self._current_key = None
+
+        if char == "{" and self._is_inside_steps() and len(self._stack) == self._steps_depth + 1:
+            self._step_start = index
+
+    def _close(self, char: str, index: int) -> Optional[Step]:
+        if not self._stack:
+            return None
+
+        step = None
+        depth = len(self._stack)
+        if char == "}" and self._step_start is not None and self._is_inside_steps() and depth == self._steps_depth + 1:
+            step = self._parse_step(self._buffer[self._step_start:index + 1])
+            self._step_start = None
+            self._steps_in_array += 1
+        elif char == "]" and self._is_inside_steps() and depth == self._steps_depth:
+            if self._steps_in_array:
+                self._steps_closed = True
+            else:
+                # 空数组或非步骤数组（如说明文字中的方括号），继续寻找真正的步骤数组
+                self._steps_depth = None
+
+        self._stack.pop()
+        self._current_key = None
+        if not self._stack and self._root_end is None and self._root_start is not None:
+            self._root_end = index
+        return step
+
+    def _is_inside_steps(self) -> bool:
+        return self._steps_depth is not None and not self._steps_closed
+
+    def _parse_step(self, text: str) -> Optional[Step]:
+        """解析单个步骤对象，失败时记录错误并跳过"""
+        try:
+            step = Step(**json.loads(text))
+        except (json.JSONDecodeError, TypeError, ValidationError) as e:
+            logger.warning(f"解析计划步骤失败，已跳过: {e}")
+            self.errors.append(str(e))
+            return None
+        self.steps.append(step)
+        return step
+
+    def _parse_plan_fields(self) -> Dict[str, Any]:
+        """从完整的顶层对象中提取步骤以外的计划字段（输出被截断时忽略）"""
+        if self._root_start is None or self._root_end is None:
+            return {}
+        try:
+            plan_data = json.loads(self._buffer[self._root_start:self._root_end + 1])
+        except json.JSONDecodeError:
+            return {}
+        if not isinstance(plan_data, dict):
+            return {}
+        estimated_duration = plan_data.get("estimated_duration")
+        return {"estimated_duration": estimated_duration} if isinstance(estimated_duration, int) else {}
@@ -0,0 +1,139 @@
+"""
+规划提示词编译
+按工具清单版本一次性渲染规划类系统提示词（工具列表、输出格式均为紧凑JSON），
+并保证不变的系统前缀始终位于消息首位，便于上游服务的前缀/KV缓存命中。
+工具较多时前缀只包含核心工具，与本次需求相关的工具以补充系统消息的形式附在前缀之后
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from utils.tokens import estimate_tokens
+from .models import Plan
+
+logger = logging.getLogger(__name__)
+
+# 计划输出格式只依赖数据模型，进程内计算一次即可
+_PLAN_SCHEMA = Plan.model_json_schema()
+
+RETRIEVED_TOOLS_PROMPT = """# 补充工具：
+除上述工具外，以下工具与本次任务相关，同样可以使用：
+```
+{tools}
+```
+补充工具名称：{tool_names}
+"""
+
+
+def compact_json(data: Any) -> str:
+    """紧凑JSON序列化（无缩进、无多余空白）"""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+class PromptCompiler:
+    """规划提示词编译器 - 每个工具清单版本只渲染一次系统提示词"""
+
+    def __init__(self, tool_manager, templates: Dict[str, str]):
+        """
+        初始化提示词编译器
+
+        Args:
+            tool_manager: 工具管理器，提供工具信息与工具清单版本
+            templates: 提示词模板，键为提示词名称（如plan/improvement），
+                模板中可使用 {tools} 与 {output_format} 占位符
+        """
+        self.tool_manager = tool_manager
+        self.templates = templates
+        self._catalog_version = None
+        self._compiled: Dict[str, str] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self.compilations = 0
+        self.retrieval_requests = 0
+        self.retrieval_tokens_total = 0
+
+    def get_system_prompt(self, name: str) -> str:
+        """获取编译后的系统提示词，工具清单变化时自动重新编译"""
+        catalog_version = self.tool_manager.get_catalog_version()
+        if catalog_version != self._catalog_version:
+            self._compile_all(catalog_version)
+        return self._compiled[name]
+
+    def build_messages(self, name: str, user_content: str, query: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        构建规划消息
+
+        不变的系统提示词始终作为第一条消息，所有随请求变化的内容（检索出的补充工具、用户输入）只放在其后
+
+        Args:
+            name: 提示词名称
+            user_content: 用户消息内容
+            query: 工具检索查询，为空或未启用工具检索时不附加补充工具
+        """
+        messages = [{"role": "system", "content": self.get_system_prompt(name)}]
+
+        if query is not None and self.tool_manager.is_tool_retrieval_active():
+            retrieved_tools = self.tool_manager.get_retrieved_tools_for_planning(query)
+            if retrieved_tools:
+                messages.append({"role": "system", "content": RETRIEVED_TOOLS_PROMPT.format(
+                    tools=compact_json(retrieved_tools),
+                    tool_names=", ".join(info["name"] for info in retrieved_tools)
+                )})
+            self.retrieval_requests += 1
+            self.retrieval_tokens_total += sum(estimate_tokens(message["content"]) for message in messages)
+
+        messages.append({"role": "user", "content": user_content})
+        return messages
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各提示词编译前后的token估算对比，以及启用工具检索时实际发送的平均系统提示词token数"""
+        return {
+            "catalog_version": self._catalog_version,
+            "compilations": self.compilations,
+            "prompts": self._stats,
+            "retrieval_requests": self.retrieval_requests,
+            "retrieval_avg_tokens": (
+                round(self.retrieval_tokens_total / self.retrieval_requests) if self.retrieval_requests else None
+            )
+        }
+
+    def _compile_all(self, catalog_version: str) -> None:
+        """按当前工具清单渲染全部模板"""
+        all_tools_info = self.tool_manager.get_tools_for_planning()
+        all_tools_constraint = self.tool_manager.generate_tool_constraint_prompt()
+        if self.tool_manager.is_tool_retrieval_active():
+            # 工具较多时前缀只包含核心工具，其余工具按请求检索后补充
+            tools_info = self.tool_manager.get_core_tools_for_planning()
+            tool_constraint = self.tool_manager.generate_tool_constraint_prompt([info["name"] for info in tools_info])
+            tool_constraint += "随后补充工具中列出的工具同样属于可用工具。\n"
+        else:
+            tools_info = all_tools_info
+            tool_constraint = all_tools_constraint
+
+        compiled = {}
+        stats = {}
+        for name, template in self.templates.items():
+            prompt = template.format(
+                tools=compact_json(tools_info),
+                output_format=compact_json(_PLAN_SCHEMA)
+            ) + tool_constraint
+            # 编译前的渲染方式（全部工具、缩进JSON），仅用于对比token数
+            legacy_prompt = template.format(
+                tools=json.dumps(all_tools_info, ensure_ascii=False, indent=2),
+                output_format=json.dumps(_PLAN_SCHEMA, ensure_ascii=False, indent=2)
+            ) + all_tools_constraint
+
+            compiled[name] = prompt
+            legacy_tokens = estimate_tokens(legacy_prompt)
+            compiled_tokens = estimate_tokens(prompt)
+            stats[name] = {
+                "legacy_tokens": legacy_tokens,
+                "compiled_tokens": compiled_tokens,
+                "saved_tokens": legacy_tokens - compiled_tokens
+            }
+            logger.info(f"📝 编译提示词 {name}: 约{legacy_tokens} -> {compiled_tokens} tokens")
+
+        self._compiled = compiled
+        self._stats = stats
+        self._catalog_version = catalog_version
+        self.compilations += 1
@@ -11,6 +11,7 @@ from datetime import datetime
 from typing import Dict, Any, List, Optional
 from pathlib import Path
 
+from utils.tracing import traced
 from .models import TaskPlan, ExecutionResult
 
 # 配置日志
@@ -72,6 +73,7 @@ class ResultCollector:
         
         logger.info(f"ResultCollector初始化完成，存储目录: {self.storage_dir}")
     
+    @traced("collect_result", "report")
     async def collect_and_format_result(self, execution_result: ExecutionResult, task_plan: TaskPlan) -> ResultReport:
         """
         收集并格式化执行结果
@@ -184,6 +186,7 @@ class ResultCollector:
         else:
             return "unknown"
     
+    @traced("save_report", "report")
     async def save_report(self, report: ResultReport, formats: List[str] = ['json', 'text'], file_manager=None) -> Dict[str, str]:
         """
         保存结果报告并自动注册到FileManager
@@ -263,6 +266,7 @@ class ResultCollector:
             logger.error(f"保存报告失败: {e}")
             raise
     
+    @traced("save_raw_data", "report")
     async def save_raw_data(self, execution_result: ExecutionResult, task_plan: TaskPlan) -> str:
         """
         保存原始执行数据
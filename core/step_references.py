@@ -0,0 +1,121 @@
+"""
+步骤结果引用
+步骤参数中可以用 ${stepN.路径} 引用前序步骤的执行结果，执行时才解析：
+    ${step1}                  步骤1的完整结果
+    ${step1.file_path}        步骤1结果中的file_path字段
+    ${step2.results[0].url}   步骤2结果中results列表第一项的url字段
+参数值恰好是一个引用时替换为原始值（保留类型，不复制），引用嵌在文本中时替换为其文本形式
+"""
+
+import json
+import logging
+import re
+from typing import Any, Dict, List, Set, Union
+
+from .models import Step, StepStatus
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_PATTERN = re.compile(r"\$\{step(\d+)((?:\.[A-Za-z_][\w-]*|\[\d+\])*)\}")
+_PATH_TOKEN_PATTERN = re.compile(r"\.([A-Za-z_][\w-]*)|\[(\d+)\]")
+
+
+class StepReferenceError(Exception):
+    """步骤引用无法解析（步骤不存在、未成功执行或路径不存在）"""
+
+
+def find_step_references(value: Any) -> Set[int]:
+    """
+    查找参数中引用的步骤序号
+
+    Args:
+        value: 步骤参数（可嵌套dict/list）
+
+    Returns:
+        Set[int]: 被引用的步骤序号（从1开始）
+    """
+    if isinstance(value, str):
+        return {int(match.group(1)) for match in REFERENCE_PATTERN.finditer(value)}
+    if isinstance(value, dict):
+        return set().union(*(find_step_references(item) for item in value.values())) if value else set()
+    if isinstance(value, list):
+        return set().union(*(find_step_references(item) for item in value)) if value else set()
+    return set()
+
+
+class StepReferenceResolver:
+    """步骤引用解析器 - 按需从前序步骤结果中取值"""
+
+    def __init__(self, steps: List[Step]):
+        """
+        初始化解析器
+
+        Args:
+            steps: 按计划顺序排列的步骤（流水线执行时列表会随规划继续增长）
+        """
+        self.steps = steps
+        # 文本形式的JSON结果只在路径需要深入时才解析，同一结果只解析一次
+        self._parsed_results: Dict[int, Any] = {}
+
+    def resolve(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        解析参数中的全部引用
+
+        Args:
+            args: 步骤参数
+
+        Returns:
+            Dict[str, Any]: 解析后的参数；没有引用时原样返回
+
+        Raises:
+            StepReferenceError: 任一引用无法解析
+        """
+        if not find_step_references(args):
+            return args
+        return self._resolve_value(args)
+
+    def _resolve_value(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            return {key: self._resolve_value(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._resolve_value(item) for item in value]
+        if not isinstance(value, str) or "${step" not in value:
+            return value
+
+        match = REFERENCE_PATTERN.fullmatch(value)
+        if match:
+            return self._lookup(int(match.group(1)), match.group(2), match.group(0))
+        return REFERENCE_PATTERN.sub(
+            lambda m: self._to_text(self._lookup(int(m.group(1)), m.group(2), m.group(0))), value
+        )
+
+    def _lookup(self, step_number: int, path: str, reference: str) -> Any:
+        if not 1 <= step_number <= len(self.steps):
+            raise StepReferenceError(f"{reference}: 步骤{step_number}不存在")
+        step = self.steps[step_number - 1]
+        if step.status != StepStatus.COMPLETED:
+            raise StepReferenceError(f"{reference}: 步骤{step_number}未成功执行（状态: {step.status.value}）")
+
+        value = step.result
+        for key, index in _PATH_TOKEN_PATTERN.findall(path):
+            if isinstance(value, str):
+                value = self._parse_text_result(step_number, value) if value is step.result else value
+            try:
+                value = value[key] if key else value[int(index)]
+            except (KeyError, IndexError, TypeError):
+                raise StepReferenceError(f"{reference}: 步骤{step_number}的结果中不存在 {key or f'[{index}]'}")
+        return value
+
+    def _parse_text_result(self, step_number: int, text: str) -> Union[str, Any]:
+        if step_number not in self._parsed_results:
+            try:
+                self._parsed_results[step_number] = json.loads(text)
+            except (json.JSONDecodeError, ValueError):
+                self._parsed_results[step_number] = text
+        return self._parsed_results[step_number]
+
+    @staticmethod
+    def _to_text(value: Any) -> str:
+        if isinstance(value, str):
+            return value
+        return json.dumps(value, ensure_ascii=False, default=str)
@@ -1,20 +1,29 @@
 """
 TaskExecutor - 任务执行器
-负责按计划执行各个步骤，处理异常和重试逻辑，实时状态反馈
+负责按计划执行各个步骤（按步骤依赖关系并行调度），处理异常和重试逻辑，实时状态反馈
 """
 
 import asyncio
 import logging
 import time
 import traceback
+import uuid
 from datetime import datetime
-from typing import Dict, Any
+from contextvars import Token
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable
 import os
 from pathlib import Path
 
-from .models import TaskPlan, Step, StepStatus, TaskStatus, ExecutionResult
+from config import settings
+from utils.tracing import span, traced
+from .models import TaskPlan, Plan, Step, StepStatus, TaskStatus, ExecutionResult
 from .event_emitter import ExecutionEventEmitter
 from .file_manager import FileManager
+from .step_references import StepReferenceResolver, find_step_references
+from .call_policy import DeadlineExceededError, call_timeout
+from .execution_journal import ExecutionJournal, JournalState
+from .execution_context import ExecutionContext, get_execution_context
+from .model_router import get_model_router
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -22,7 +31,8 @@ logger = logging.getLogger(__name__)
 class TaskExecutor:
     """任务执行器 - 负责执行TaskPlanner生成的任务计划"""
     
-    def __init__(self, tool_manager, file_manager: FileManager = None, event_emitter: ExecutionEventEmitter = None):
+    def __init__(self, tool_manager, file_manager: FileManager = None, event_emitter: ExecutionEventEmitter = None,
+                 journal: ExecutionJournal = None):
         """
         初始化任务执行器
         
@@ -30,22 +40,45 @@ class TaskExecutor:
             tool_manager: 工具管理器
             file_manager: 文件管理器，可选
             event_emitter: 事件发射器，用于格式化输出
+            journal: 执行日志，为空时按settings创建（EXECUTION_JOURNAL_ENABLED为false时不记录）
         """
         self.tool_manager = tool_manager
+        if hasattr(tool_manager, "usage_recorder") and tool_manager.usage_recorder is None:
+            # MCP工具中的LLM调用用量随结果返回，记入本进程的模型路由器（/api/metrics可见）
+            tool_manager.usage_recorder = get_model_router().record_usage
         self.file_manager = file_manager or FileManager()
         self.event_emitter = event_emitter or ExecutionEventEmitter()
         self.execution_queue = []
-        self.current_task = None
+        # 执行中的任务：task_id到执行上下文，同一个执行器可以同时执行多个任务
+        self._executions: Dict[str, ExecutionContext] = {}
+        # 步骤并发上限：全局上限由所有任务共享，单个工具另有各自的上限
+        self.max_parallel_steps = settings.MAX_PARALLEL_STEPS
+        self.tool_concurrency_limits = dict(settings.TOOL_CONCURRENCY_LIMITS)
+        self.tool_timeouts = dict(settings.TOOL_TIMEOUTS)
+        self._step_semaphore = asyncio.Semaphore(self.max_parallel_steps)
+        self._tool_semaphores: Dict[str, asyncio.Semaphore] = {}
+        if journal is None and settings.EXECUTION_JOURNAL_ENABLED:
+            journal = ExecutionJournal(
+                settings.EXECUTION_JOURNAL_DIR,
+                fsync=settings.EXECUTION_JOURNAL_FSYNC,
+                max_resumes=settings.EXECUTION_JOURNAL_MAX_RESUMES,
+                archive_ttl=settings.EXECUTION_JOURNAL_ARCHIVE_TTL,
+                archive_max_entries=settings.EXECUTION_JOURNAL_ARCHIVE_MAX_ENTRIES
+            )
+        self.journal = journal
         
-        logger.info("TaskExecutor初始化完成")
+        logger.info(f"TaskExecutor初始化完成，步骤并发上限: {self.max_parallel_steps}，工具并发上限: {self.tool_concurrency_limits}")
     
-    async def execute_plan(self, task_plan: TaskPlan, user_id: str = "default") -> ExecutionResult:
+    @traced("execute_plan", "executor")
+    async def execute_plan(self, task_plan: TaskPlan, user_id: str = "default",
+                           restored: Optional[Dict[str, Dict[str, Any]]] = None) -> ExecutionResult:
         """
         执行完整的任务计划（流式输出版本）
         
         Args:
             task_plan: 要执行的任务计划
             user_id: 用户ID，用于文件管理
+            restored: 从执行日志恢复的步骤完成记录（步骤ID到记录），这些步骤不再执行
             
         Returns:
             ExecutionResult: 执行结果
@@ -57,7 +90,7 @@ class TaskExecutor:
             logger.info("💬 检测到对话类型，简化执行流程")
             return await self._execute_conversation_plan(task_plan, user_id)
         
-        self.current_task = task_plan
+        context, token = self._register_execution(task_plan, user_id)
         start_time = time.time()
         results = []
         files_generated = []
@@ -71,103 +104,575 @@ class TaskExecutor:
             
             # 更新任务状态为执行中
             task_plan.status = TaskStatus.EXECUTING
+            if self.journal and restored is None:
+                self.journal.begin(task_plan, user_id)
             
-            # 逐步执行计划中的每个步骤
-            for i, step in enumerate(task_plan.plan.steps):
-                logger.info(f"执行步骤 {i+1}/{len(task_plan.plan.steps)}: {step.step_description}")
-                
-                # 发射步骤开始事件
-                await self.event_emitter.emit_step_start(step)
-                
-                # 为文件生成类工具添加任务目录参数
-                if step.function_name == 'file_generation_tool':
-                    step.args['output_dir'] = str(task_dir)
-                
-                # 执行步骤
-                step_result = await self.execute_step_with_events(step)
-                results.append({
-                    "step_id": step.step_id,
-                    "step_description": step.step_description,
-                    "function_name": step.function_name,
-                    "result": step_result,
-                    "status": step.status.value
-                })
-                
-                # 发射步骤完成事件
-                await self.event_emitter.emit_step_complete(step, step_result)
-                
-                # 从步骤结果中提取和注册文件（现在文件应该已经在正确位置）
-                step_files = self._extract_and_register_files(
-                    task_plan.task_id, step_result, step.function_name, step.step_id, step.step_description
-                )
-                files_generated.extend(step_files)
-
-                # 如果步骤失败且不是最后一步，考虑是否继续
-                if step.status == StepStatus.FAILED and not step.is_final:
-                    logger.warning(f"步骤失败，但继续执行后续步骤: {step.error_message}")
-                elif step.status == StepStatus.FAILED and step.is_final:
-                    logger.error(f"关键步骤失败，终止执行: {step.error_message}")
-                    break
-            
-            # 判断整体执行是否成功
-            failed_steps = [r for r in results if r["status"] == StepStatus.FAILED.value]
-            success = len(failed_steps) == 0
-            
-            execution_time = time.time() - start_time
+            # 按步骤依赖关系调度执行，互不依赖的步骤并行
+            step_queue: asyncio.Queue = asyncio.Queue()
+            for step in task_plan.plan.steps:
+                step_queue.put_nowait(step)
+            step_queue.put_nowait(None)
             
-            # 更新任务状态
-            task_plan.status = TaskStatus.COMPLETED if success else TaskStatus.FAILED
+            async def get_task_dir() -> Path:
+                return task_dir
             
-            # 创建执行结果
-            execution_result = ExecutionResult(
-                task_id=task_plan.task_id,
-                success=success,
-                results=results,
-                execution_time=execution_time,
-                files_generated=files_generated
+            first_result_time = await self._schedule_steps(
+                task_plan.task_id, step_queue, get_task_dir, start_time, results, files_generated, restored
             )
             
-            # 发射任务完成事件
-            await self.event_emitter.emit_task_complete(task_plan, execution_result)
-            
-            # 为任务创建下载包 (只有当有文件被注册时才创建)
-            if files_generated:
-                download_package = self.file_manager.create_download_package(task_plan.task_id, user_id)
-                if download_package:
-                    logger.info(f"任务 {task_plan.task_id} 的下载包已创建: {download_package}")
-            
-            logger.info(f"任务计划执行完成，用时: {execution_time:.2f}秒，生成文件: {len(files_generated)}个")
-            
-            return execution_result
+            return await self._finish_execution(
+                task_plan, user_id, results, files_generated, start_time, first_result_time
+            )
             
+        except asyncio.CancelledError:
+            task_plan.status = TaskStatus.CANCELLED
+            self._finish_journal(task_plan)
+            logger.info(f"🛑 任务已取消: {task_plan.task_id}")
+            raise
         except Exception as e:
-            execution_time = time.time() - start_time
             error_msg = f"任务执行过程中发生异常: {str(e)}"
             logger.error(error_msg)
             logger.error(traceback.format_exc())
+            return await self._fail_execution(task_plan, results, files_generated, start_time, error_msg)
+        finally:
+            self._unregister_execution(task_plan.task_id, context, token)
+    
+    async def resume_plan(self, journal_state: JournalState) -> ExecutionResult:
+        """
+        恢复进程重启前未完成的任务：日志中已完成的步骤直接复用结果，其余步骤（含中断时正在执行的步骤）重新执行
+        
+        Args:
+            journal_state: 由执行日志重建的任务状态
             
-            task_plan.status = TaskStatus.FAILED
+        Returns:
+            ExecutionResult: 执行结果
+        """
+        task_plan = journal_state.task_plan
+        for step in task_plan.plan.steps:
+            if step.step_id not in journal_state.completed_steps:
+                step.status = StepStatus.PENDING
+                step.result = None
+                step.error_message = None
+        
+        if self.journal:
+            self.journal.resumed(task_plan.task_id)
+        logger.info(
+            f"♻️ 恢复任务 {task_plan.task_id}：已完成 {len(journal_state.completed_steps)}/{len(task_plan.plan.steps)} 个步骤"
+        )
+        return await self.execute_plan(task_plan, journal_state.user_id, restored=journal_state.completed_steps)
+    
+    @traced("execute_streaming_plan", "executor")
+    async def execute_streaming_plan(self, user_input: str, planner, user_id: str = "default",
+                                     on_conversation_delta: Optional[Callable[[str], Awaitable[None]]] = None
+                                     ) -> Tuple[TaskPlan, Optional[ExecutionResult]]:
+        """
+        流水线执行：边规划边执行
+        
+        规划器流式解析出一个步骤就立即开始执行，LLM仍在输出后续步骤时前面的步骤已在运行。
+        规划结束后若最终计划与已执行的步骤不一致（计划无效），取消正在执行的步骤；
+        已有步骤开始执行后规划失败时任务直接失败，不会再执行后备计划。
+        
+        Args:
+            user_input: 用户输入的任务描述
+            planner: 任务规划器
+            user_id: 用户ID，用于文件管理
+            on_conversation_delta: 对话回复回调，输入为对话时逐段接收回复
             
-            execution_result = ExecutionResult(
-                task_id=task_plan.task_id,
-                success=False,
-                results=results,
-                error_message=error_msg,
-                execution_time=execution_time,
-                files_generated=files_generated
-            )
+        Returns:
+            Tuple[TaskPlan, Optional[ExecutionResult]]: 任务计划与执行结果；需要澄清时执行结果为None
+        """
+        start_time = time.time()
+        task_id = str(uuid.uuid4())
+        step_queue: asyncio.Queue = asyncio.Queue()
+        results = []
+        files_generated = []
+        
+        # 规划期间使用的临时任务计划，随步骤解析逐步填充
+        streaming_plan = TaskPlan(
+            task_id=task_id,
+            user_input=user_input,
+            task_type="规划中",
+            complexity_level="unknown",
+            plan=Plan(steps=[]),
+            status=TaskStatus.PLANNING
+        )
+        
+        context, token = self._register_execution(streaming_plan, user_id)
+        try:
+            async def on_plan_step(step: Step):
+                streaming_plan.plan.steps.append(step)
+                await step_queue.put(step)
             
-            # 发射任务完成事件（失败）
-            await self.event_emitter.emit_task_complete(task_plan, execution_result)
+            execution_task = asyncio.create_task(self._execute_streamed_steps(
+                streaming_plan, step_queue, user_id, start_time, results, files_generated
+            ))
             
-            return execution_result
+            try:
+                task_plan = await planner.analyze_task(
+                    user_input, on_plan_step=on_plan_step, task_id=task_id, user_id=user_id,
+                    on_conversation_delta=on_conversation_delta
+                )
+            except asyncio.CancelledError:
+                await self._cancel_execution(execution_task, streaming_plan, results, "任务已取消", StepStatus.CANCELLED)
+                streaming_plan.status = TaskStatus.CANCELLED
+                self._finish_journal(streaming_plan)
+                raise
+            except Exception:
+                await self._cancel_execution(execution_task, streaming_plan, results)
+                streaming_plan.status = TaskStatus.FAILED
+                self._finish_journal(streaming_plan)
+                raise
+            
+            # 对话与澄清不会产生流式步骤，按原流程处理
+            if task_plan.requires_clarification or getattr(task_plan, 'is_conversation', False):
+                await self._cancel_execution(execution_task, streaming_plan, results)
+                if task_plan.requires_clarification:
+                    return task_plan, None
+                return task_plan, await self.execute_plan(task_plan, user_id)
+            
+            # 没有步骤经过流水线（如规划失败后的后备计划），按顺序模式执行完整计划
+            if not streaming_plan.plan.steps:
+                await self._cancel_execution(execution_task, streaming_plan, results)
+                return task_plan, await self.execute_plan(task_plan, user_id)
+            
+            streamed_ids = [step.step_id for step in streaming_plan.plan.steps]
+            final_ids = [step.step_id for step in task_plan.plan.steps]
+            if streamed_ids != final_ids:
+                logger.error(f"最终计划与流式执行的步骤不一致，取消执行: 已流式 {len(streamed_ids)} 步，最终 {len(final_ids)} 步")
+                await self._cancel_execution(execution_task, streaming_plan, results)
+                return task_plan, await self._fail_execution(
+                    task_plan, results, files_generated, start_time, "最终计划与已开始执行的步骤不一致，执行已取消"
+                )
+            
+            # 计划确定，通知执行协程不会再有新步骤
+            await step_queue.put(None)
+            context.task_plan = task_plan
+            task_plan.status = TaskStatus.EXECUTING
+            if self.journal:
+                # 步骤记录可能先于计划写入，回放时按步骤ID对应
+                self.journal.begin(task_plan, user_id)
+            
+            try:
+                first_result_time = await execution_task
+            except asyncio.CancelledError:
+                task_plan.status = TaskStatus.CANCELLED
+                self._finish_journal(task_plan)
+                logger.info(f"🛑 任务已取消: {task_plan.task_id}")
+                raise
+            except Exception as e:
+                error_msg = f"任务执行过程中发生异常: {str(e)}"
+                logger.error(error_msg)
+                logger.error(traceback.format_exc())
+                return task_plan, await self._fail_execution(task_plan, results, files_generated, start_time, error_msg)
+            
+            return task_plan, await self._finish_execution(
+                task_plan, user_id, results, files_generated, start_time, first_result_time
+            )
+        finally:
+            self._unregister_execution(task_id, context, token)
     
-    async def execute_step_with_events(self, step: Step) -> Any:
+    async def _execute_streamed_steps(self, streaming_plan: TaskPlan, step_queue: asyncio.Queue, user_id: str,
+                                      start_time: float, results: List[Dict[str, Any]],
+                                      files_generated: List[str]) -> Optional[float]:
+        """
+        调度执行流式到达的步骤，直到收到结束标记None
+        
+        Returns:
+            Optional[float]: 首个步骤结果耗时(秒)
+        """
+        task_dir = None
+        
+        async def get_task_dir() -> Path:
+            nonlocal task_dir
+            if task_dir is None:
+                # 首个步骤开始执行时才进入执行阶段
+                await self.event_emitter.emit_task_start(streaming_plan)
+                task_dir = self.file_manager.create_task_directory(streaming_plan.task_id, user_id)
+            return task_dir
+        
+        return await self._schedule_steps(
+            streaming_plan.task_id, step_queue, get_task_dir, start_time, results, files_generated
+        )
+    
+    async def _schedule_steps(self, task_id: str, step_queue: asyncio.Queue,
+                              get_task_dir: Callable[[], Awaitable[Path]], start_time: float,
+                              results: List[Dict[str, Any]], files_generated: List[str],
+                              restored: Optional[Dict[str, Dict[str, Any]]] = None) -> Optional[float]:
+        """
+        按依赖关系调度执行步骤
+        
+        步骤从队列中按计划顺序到达（结束标记为None），依赖（含参数中引用的步骤）均已完成的步骤立即启动，
+        同时执行的步骤数受全局与单个工具的并发上限约束。依赖步骤失败不阻塞后续步骤，
+        最终步骤失败时不再启动新的步骤。
+        
+        Args:
+            task_id: 任务ID
+            step_queue: 步骤队列
+            get_task_dir: 获取任务目录（首个步骤启动前调用）
+            start_time: 任务开始时间，用于计算首个结果耗时
+            results: 步骤结果列表，执行完成后按计划顺序排列
+            files_generated: 生成的文件列表
+            restored: 从执行日志恢复的步骤完成记录，对应步骤视为已完成，不再执行
+            
+        Returns:
+            Optional[float]: 首个步骤结果耗时(秒)
+        """
+        steps: List[Step] = []
+        dependencies: List[List[int]] = []
+        resolver = StepReferenceResolver(steps)
+        finished = set()
+        started = set()
+        running: Dict[asyncio.Task, int] = {}
+        next_step_task: Optional[asyncio.Task] = None
+        queue_open = True
+        stopped = False
+        first_result_time = None
+        context = get_execution_context()
+        
+        try:
+            while True:
+                # 取消令牌：上下文已取消时不再启动新的步骤
+                if context is not None and context.cancelled:
+                    raise asyncio.CancelledError(context.cancel_reason)
+                if not stopped:
+                    for index, step in enumerate(steps):
+                        if index not in started and all(dep in finished for dep in dependencies[index]):
+                            started.add(index)
+                            task_dir = await get_task_dir()
+                            logger.info(f"执行步骤 {index + 1}（依赖: {[dep + 1 for dep in dependencies[index]]}）: {step.step_description}")
+                            running[asyncio.create_task(
+                                self._execute_scheduled_step(task_id, step, task_dir, results, files_generated, resolver)
+                            )] = index
+                
+                if queue_open and next_step_task is None:
+                    next_step_task = asyncio.create_task(step_queue.get())
+                waiters = set(running)
+                if next_step_task is not None:
+                    waiters.add(next_step_task)
+                if not waiters:
+                    break
+                
+                done, _ = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task is next_step_task:
+                        next_step_task = None
+                        step = task.result()
+                        if step is None:
+                            queue_open = False
+                        else:
+                            dependencies.append(self._resolve_dependencies(step, len(steps)))
+                            steps.append(step)
+                            if restored and step.step_id in restored:
+                                started.add(len(steps) - 1)
+                                finished.add(len(steps) - 1)
+                                if self._restore_step(task_id, step, restored[step.step_id], results, files_generated):
+                                    stopped = True
+                        continue
+                    
+                    index = running.pop(task)
+                    finished.add(index)
+                    if task.result():
+                        stopped = True
+                    if first_result_time is None:
+                        first_result_time = time.time() - start_time
+                        logger.info(f"⚡ 首个步骤结果用时: {first_result_time:.2f}秒")
+        finally:
+            # 被取消时一并取消仍在执行的步骤
+            pending = list(running)
+            if next_step_task is not None:
+                pending.append(next_step_task)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        # 并行执行时结果按完成顺序写入，统一按计划顺序排列
+        order = {step.step_id: index for index, step in enumerate(steps)}
+        results.sort(key=lambda item: order.get(item["step_id"], len(order)))
+        return first_result_time
+    
+    def _restore_step(self, task_id: str, step: Step, record: Dict[str, Any], results: List[Dict[str, Any]],
+                      files_generated: List[str]) -> bool:
+        """
+        将执行日志中的步骤完成记录写回步骤与结果列表
+        
+        Returns:
+            bool: 是否应终止后续步骤（最终步骤失败）
+        """
+        ExecutionJournal.restore_step(step, record)
+        results.append({
+            "step_id": step.step_id,
+            "step_description": step.step_description,
+            "function_name": step.function_name,
+            "result": step.result,
+            "status": step.status.value
+        })
+        files_generated.extend(record.get("files", []))
+        # 重启后FileManager中的登记已丢失，按结果中的产出物清单重新登记
+        if isinstance(step.result, dict) and isinstance(step.result.get("artifacts"), list):
+            self.file_manager.ingest_artifacts(
+                task_id, step.result["artifacts"], step.step_id, step.step_description
+            )
+        logger.info(f"♻️ 步骤已在日志中完成，复用结果: {step.step_description}")
+        return step.status == StepStatus.FAILED and step.is_final
+    
+    def _register_execution(self, task_plan: TaskPlan, user_id: str) -> Tuple[ExecutionContext, Optional[Token]]:
+        """
+        登记执行中的任务，供按task_id查询状态与取消
+        
+        调用方未设置执行上下文时（如终端模式）为本次执行创建一个
+        
+        Returns:
+            Tuple[ExecutionContext, Optional[Token]]: 执行上下文与新建上下文的令牌（沿用调用方上下文时为None）
+        """
+        context = get_execution_context()
+        token = None
+        if context is None:
+            context = ExecutionContext(user_id)
+            token = context.attach()
+        context.task_plan = task_plan
+        self._executions[task_plan.task_id] = context
+        return context, token
+    
+    def _unregister_execution(self, task_id: str, context: ExecutionContext, token: Optional[Token]) -> None:
+        if self._executions.get(task_id) is context:
+            del self._executions[task_id]
+        if token is not None:
+            context.detach(token)
+    
+    def cancel_task(self, task_id: str, reason: str = "任务已取消") -> bool:
+        """
+        取消执行中的任务
+        
+        Returns:
+            bool: 任务是否在执行中并已取消
+        """
+        context = self._executions.get(task_id)
+        return context.cancel(reason) if context else False
+    
+    def _finish_journal(self, task_plan: TaskPlan) -> None:
+        """记录任务结束（按任务当前状态）"""
+        if self.journal:
+            self.journal.finish(task_plan.task_id, task_plan.status)
+    
+    def _resolve_dependencies(self, step: Step, index: int) -> List[int]:
+        """
+        解析步骤依赖为前序步骤下标（从0开始）
+        
+        depends_on为空时依赖上一步（与顺序执行一致），参数中引用的步骤自动加入依赖；
+        只接受指向前序步骤的依赖，指向自身或后续步骤的依赖会被忽略，保证不会出现环
+        """
+        if step.depends_on is None:
+            step_numbers = [index] if index > 0 else []
+        else:
+            step_numbers = list(step.depends_on)
+        step_numbers.extend(find_step_references(step.args))
+        
+        dependencies = []
+        for step_number in step_numbers:
+            if 1 <= step_number <= index:
+                dependencies.append(step_number - 1)
+            else:
+                logger.warning(f"忽略无效的步骤依赖: 步骤 {index + 1} 依赖 {step_number}")
+        return sorted(set(dependencies))
+    
+    async def _execute_scheduled_step(self, task_id: str, step: Step, task_dir: Path,
+                                      results: List[Dict[str, Any]], files_generated: List[str],
+                                      resolver: Optional[StepReferenceResolver] = None) -> bool:
+        """
+        在全局与工具并发上限内执行单个步骤
+
+        先取工具名额再取全局名额：等待工具名额的步骤不占用全局名额，不会阻塞其他工具（及其他任务）的就绪步骤
+        """
+        async with self._get_tool_semaphore(step.function_name):
+            async with self._step_semaphore:
+                return await self._execute_plan_step(task_id, step, task_dir, results, files_generated, resolver)
+    
+    async def _call_tool_with_timeout(self, tool_name: str, args: Dict[str, Any]) -> Any:
+        """
+        调用工具，等待时间不超过该工具的超时与任务剩余时间
+        
+        超时后放弃等待并取消调用（关闭该次调用的MCP会话），步骤按失败处理，并发名额随即释放
+        """
+        tool_timeout = self.tool_timeouts.get(tool_name, settings.TOOL_DEFAULT_TIMEOUT)
+        timeout = call_timeout(tool_timeout if tool_timeout > 0 else None)
+        try:
+            return await asyncio.wait_for(self.tool_manager.call_tool(tool_name, args), timeout)
+        except asyncio.TimeoutError:
+            if timeout is not None and (tool_timeout <= 0 or timeout < tool_timeout):
+                raise DeadlineExceededError(f"工具 {tool_name} 调用超过任务截止时间")
+            raise TimeoutError(f"工具 {tool_name} 执行超时（{tool_timeout:g}秒）")
+    
+    def _get_tool_semaphore(self, tool_name: str) -> asyncio.Semaphore:
+        """获取工具并发信号量，未配置上限的工具使用全局上限"""
+        if tool_name not in self._tool_semaphores:
+            limit = self.tool_concurrency_limits.get(tool_name, self.max_parallel_steps)
+            self._tool_semaphores[tool_name] = asyncio.Semaphore(limit)
+        return self._tool_semaphores[tool_name]
+    
+    async def _cancel_execution(self, execution_task: asyncio.Task, streaming_plan: TaskPlan,
+                                results: List[Dict[str, Any]], reason: str = "执行已取消：最终计划无效",
+                                status: StepStatus = StepStatus.FAILED):
+        """取消流水线中的执行协程，被中断的步骤按status标记并记入步骤结果"""
+        execution_task.cancel()
+        try:
+            await execution_task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"取消执行时发生错误: {e}")
+        
+        for step in streaming_plan.plan.steps:
+            if step.status in (StepStatus.RUNNING, StepStatus.CANCELLED):
+                step.status = status
+                step.error_message = reason
+                step.end_time = datetime.now()
+                results.append({
+                    "step_id": step.step_id,
+                    "step_description": step.step_description,
+                    "function_name": step.function_name,
+                    "result": {"error": step.error_message},
+                    "status": step.status.value
+                })
+    
+    async def _execute_plan_step(self, task_id: str, step: Step, task_dir: Path,
+                                 results: List[Dict[str, Any]], files_generated: List[str],
+                                 resolver: Optional[StepReferenceResolver] = None) -> bool:
+        """
+        执行计划中的单个步骤：发射事件、解析步骤引用、调用工具、记录结果并注册生成的文件
+        
+        Returns:
+            bool: 是否应终止后续步骤（最终步骤失败）
+        """
+        # 发射步骤开始事件
+        await self.event_emitter.emit_step_start(step)
+        if self.journal:
+            self.journal.step_started(task_id, step)
+        
+        # 为文件生成类工具添加任务目录参数
+        if step.function_name == 'file_generation_tool':
+            step.args['output_dir'] = str(task_dir)
+        
+        # 执行步骤
+        with span(f"step:{step.function_name}", "step", step_id=step.step_id, description=step.step_description) as step_span:
+            step_result = await self.execute_step_with_events(step, resolver)
+            step_span.set(status=step.status.value)
+        results.append({
+            "step_id": step.step_id,
+            "step_description": step.step_description,
+            "function_name": step.function_name,
+            "result": step_result,
+            "status": step.status.value
+        })
+        
+        # 发射步骤完成事件
+        await self.event_emitter.emit_step_complete(step, step_result)
+        
+        # 从步骤结果中提取和注册文件（现在文件应该已经在正确位置）
+        with span("register_files", "files", step_id=step.step_id) as files_span:
+            step_files = self._extract_and_register_files(
+                task_id, step_result, step.function_name, step.step_id, step.step_description
+            )
+            files_span.set(files=len(step_files))
+        files_generated.extend(step_files)
+        if self.journal:
+            self.journal.step_finished(task_id, step, step_result, step_files)
+        
+        # 如果步骤失败且不是最后一步，考虑是否继续
+        if step.status == StepStatus.FAILED and not step.is_final:
+            logger.warning(f"步骤失败，但继续执行后续步骤: {step.error_message}")
+        elif step.status == StepStatus.FAILED and step.is_final:
+            logger.error(f"关键步骤失败，终止执行: {step.error_message}")
+            return True
+        return False
+    
+    async def _finish_execution(self, task_plan: TaskPlan, user_id: str, results: List[Dict[str, Any]],
+                                files_generated: List[str], start_time: float,
+                                first_result_time: Optional[float]) -> ExecutionResult:
+        """汇总执行结果、更新任务状态、发射完成事件并创建下载包"""
+        # 判断整体执行是否成功
+        failed_steps = [r for r in results if r["status"] == StepStatus.FAILED.value]
+        success = len(failed_steps) == 0
+        
+        execution_time = time.time() - start_time
+        wall_clock_time, sequential_time = self._measure_step_times(task_plan.plan.steps)
+        
+        # 更新任务状态
+        task_plan.status = TaskStatus.COMPLETED if success else TaskStatus.FAILED
+        self._finish_journal(task_plan)
+        
+        # 创建执行结果
+        execution_result = ExecutionResult(
+            task_id=task_plan.task_id,
+            success=success,
+            results=results,
+            execution_time=execution_time,
+            files_generated=files_generated,
+            time_to_first_result=first_result_time,
+            wall_clock_time=wall_clock_time,
+            sequential_time=sequential_time
+        )
+        
+        # 发射任务完成事件
+        await self.event_emitter.emit_task_complete(task_plan, execution_result)
+        
+        # 为任务创建下载包 (只有当有文件被注册时才创建)
+        if files_generated:
+            download_package = self.file_manager.create_download_package(task_plan.task_id, user_id)
+            if download_package:
+                logger.info(f"任务 {task_plan.task_id} 的下载包已创建: {download_package}")
+        
+        logger.info(
+            f"任务计划执行完成，用时: {execution_time:.2f}秒，步骤实际耗时: {wall_clock_time or 0:.2f}秒，"
+            f"顺序执行需: {sequential_time or 0:.2f}秒，生成文件: {len(files_generated)}个"
+        )
+        
+        return execution_result
+    
+    @staticmethod
+    def _measure_step_times(steps: List[Step]) -> Tuple[Optional[float], Optional[float]]:
+        """
+        统计步骤执行耗时
+        
+        Returns:
+            Tuple[Optional[float], Optional[float]]: (实际耗时, 各步骤耗时之和)，没有已执行的步骤时为None
+        """
+        executed = [step for step in steps if step.start_time and step.end_time]
+        if not executed:
+            return None, None
+        wall_clock_time = (max(step.end_time for step in executed) - min(step.start_time for step in executed)).total_seconds()
+        sequential_time = sum((step.end_time - step.start_time).total_seconds() for step in executed)
+        return round(wall_clock_time, 3), round(sequential_time, 3)
+    
+    async def _fail_execution(self, task_plan: TaskPlan, results: List[Dict[str, Any]],
+                              files_generated: List[str], start_time: float, error_msg: str) -> ExecutionResult:
+        """生成失败的执行结果并发射任务完成事件"""
+        execution_time = time.time() - start_time
+        
+        task_plan.status = TaskStatus.FAILED
+        self._finish_journal(task_plan)
+        
+        execution_result = ExecutionResult(
+            task_id=task_plan.task_id,
+            success=False,
+            results=results,
+            error_message=error_msg,
+            execution_time=execution_time,
+            files_generated=files_generated
+        )
+        
+        # 发射任务完成事件（失败）
+        await self.event_emitter.emit_task_complete(task_plan, execution_result)
+        
+        return execution_result
+    
+    async def execute_step_with_events(self, step: Step, resolver: Optional[StepReferenceResolver] = None) -> Any:
         """
         执行单个步骤并发射事件
         
         Args:
             step: 要执行的步骤
+            resolver: 步骤引用解析器，参数中的 ${stepN.路径} 在调用工具前解析；引用无法解析时步骤直接失败
             
         Returns:
             Any: 步骤执行结果
@@ -178,6 +683,9 @@ class TaskExecutor:
         step.start_time = datetime.now()
         
         try:
+            # 解析参数中的步骤引用，引用无法解析时不调用工具直接失败
+            call_args = resolver.resolve(step.args) if resolver else step.args
+            
             # 发射工具调用开始事件
             await self.event_emitter.emit_tool_call_start(step.function_name, step.args)
             
@@ -192,8 +700,8 @@ class TaskExecutor:
                     "success": True
                 }
             else:
-                # 使用ToolManager统一调用工具
-                result = await self.tool_manager.call_tool(step.function_name, step.args)
+                # 使用ToolManager统一调用工具，等待时间不超过工具超时与任务剩余时间
+                result = await self._call_tool_with_timeout(step.function_name, call_args)
             
             # 计算耗时
             call_duration = time.time() - call_start_time
@@ -213,6 +721,13 @@ class TaskExecutor:
             logger.info(f"步骤执行成功: {step.step_description}")
             return result
             
+        except asyncio.CancelledError:
+            # 任务被取消：步骤标记为已取消，取消继续向上传播
+            step.error_message = "步骤已取消"
+            step.status = StepStatus.CANCELLED
+            step.end_time = datetime.now()
+            logger.info(f"🛑 步骤已取消: {step.step_description}")
+            raise
         except Exception as e:
             call_duration = time.time() - call_start_time if 'call_start_time' in locals() else 0
             error_msg = f"步骤执行失败: {str(e)}"
@@ -258,11 +773,18 @@ class TaskExecutor:
             description: 步骤描述
             
         Returns:
-            list: 提取到的文件路径列表
+            list: 提取到的文件路径列表（远程产出物为URL）
         """
         extracted_files = []
         
         try:
+            # 工具返回了产出物清单：直接按清单登记（本地文件与远程资源），不再猜测路径
+            if isinstance(result, dict) and isinstance(result.get("artifacts"), list):
+                for file_info in self.file_manager.ingest_artifacts(task_id, result["artifacts"], step_id, description):
+                    extracted_files.append(file_info["file_path"] or file_info["url"])
+                return extracted_files
+            
+            # 以下为没有清单的旧格式结果
             # 处理字典格式的结果
             if isinstance(result, dict):
                 if "file_path" in result and result.get("success", True):
@@ -287,12 +809,6 @@ class TaskExecutor:
                             extracted_files.append(registered_path)
                             logger.info(f"图表文件已注册: {registered_path}")
                 
-                # 处理图片生成结果 (阿里云万相大模型返回格式)
-                elif isinstance(result, list) and function_name == "image_generation":
-                    for img_result in result:
-                        if isinstance(img_result, dict) and "url" in img_result:
-                            # 这里可以扩展处理图片URL，下载并保存本地
-                            logger.info(f"图片生成结果: {img_result['url']}")
             
             # 处理列表格式的结果
             elif isinstance(result, list):
@@ -383,21 +899,40 @@ class TaskExecutor:
             logger.error(f"文件注册失败: {e}")
             return ""
     
-    def get_execution_status(self) -> Dict[str, Any]:
-        """获取当前执行状态"""
-        if not self.current_task:
-            return {"status": "idle", "message": "没有正在执行的任务"}
+    def get_execution_status(self, task_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        获取执行状态
         
-        completed_steps = sum(1 for step in self.current_task.plan.steps 
-                            if step.status in [StepStatus.COMPLETED, StepStatus.FAILED])
-        total_steps = len(self.current_task.plan.steps)
+        Args:
+            task_id: 任务ID，为空时返回所有执行中任务的状态
+        """
+        if task_id is None:
+            if not self._executions:
+                return {"status": "idle", "message": "没有正在执行的任务"}
+            return {
+                "status": "running",
+                "executions": [self._describe_execution(context) for context in self._executions.values()]
+            }
+        
+        context = self._executions.get(task_id)
+        if context is None:
+            return {"task_id": task_id, "status": "idle", "message": "该任务不在执行中"}
+        return self._describe_execution(context)
+    
+    @staticmethod
+    def _describe_execution(context: ExecutionContext) -> Dict[str, Any]:
+        task_plan = context.task_plan
+        completed_steps = sum(1 for step in task_plan.plan.steps 
+                            if step.status in [StepStatus.COMPLETED, StepStatus.FAILED, StepStatus.CANCELLED])
+        total_steps = len(task_plan.plan.steps)
         
         return {
-            "task_id": self.current_task.task_id,
-            "status": self.current_task.status.value,
+            "task_id": task_plan.task_id,
+            "user_id": context.user_id,
+            "status": task_plan.status.value,
             "progress": f"{completed_steps}/{total_steps}",
             "progress_percentage": (completed_steps / total_steps * 100) if total_steps > 0 else 0,
-            "current_step": next((step.step_description for step in self.current_task.plan.steps 
+            "current_step": next((step.step_description for step in task_plan.plan.steps 
                                 if step.status == StepStatus.RUNNING), None)
         }
     
@@ -6,23 +6,58 @@
 import asyncio
 import json
 import logging
-from typing import Dict, Any
+import time
+import uuid
+from typing import Dict, Any, Union, Callable, Awaitable, Optional, AsyncIterator
 
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+from config import settings
+from utils.tracing import traced
 from .models import (
     TaskPlan, Plan, Step, TaskStatus, TaskType, 
-    TaskNeedClarification, TaskClarityScore,IsTaskOrConversation
+    TaskNeedClarification, TaskClarityScore,IsTaskOrConversation, TriageResult,
+    CombinedTriage
 )
 from .event_emitter import ExecutionEventEmitter
+from .execution_context import get_execution_context
+from .llm_client import LLMCaller
+from .plan_cache import PlanCache
+from .prompt_compiler import PromptCompiler
+from .plan_stream_parser import IncrementalPlanParser
+from .conversation_classifier import ConversationClassifier
+from .context_store import UserContextStore
+from .model_router import ROUTE_CLASSIFY, ROUTE_CHAT, ROUTE_PLAN
 
 logger = logging.getLogger(__name__)
 
+# 各类调用的延迟预算(秒)
+CLASSIFY_LATENCY_BUDGET = 3.0
+CHAT_LATENCY_BUDGET = 10.0
+PLAN_LATENCY_BUDGET = 60.0
+
+
+class PlanAbandonedError(Exception):
+    """流水线执行中已有步骤交给执行器后规划失败，不能再改用后备计划（否则执行器会收到两个计划的步骤）"""
+
+
+class _StepForwarder:
+    """包装步骤回调，记录已交给执行器的步骤数"""
+
+    def __init__(self, callback: Callable[[Step], Awaitable[None]]):
+        self.callback = callback
+        self.forwarded = 0
+
+    async def __call__(self, step: Step):
+        self.forwarded += 1
+        await self.callback(step)
+
 
 class TaskClarityAnalyzer:
     """任务明确度分析器"""
     
-    def __init__(self, llm_client: OpenAI, model_name: str = "Qwen-72B"):
-        self.llm_client = llm_client
+    def __init__(self, llm_client: Union[OpenAI, AsyncOpenAI], model_name: str = "Qwen-72B"):
+        self.llm = LLMCaller(llm_client, model_name)
+        self.llm_client = self.llm.client
         self.model_name = model_name
         self.stream_callback = None  # 流式输出回调函数
     
@@ -64,12 +99,13 @@ class TaskClarityAnalyzer:
             ]
             
             await self._stream_print("🔍 分析任务明确度...")
-            # 添加流式输出
-            response = self.llm_client.beta.chat.completions.parse(
-                model=self.model_name,
-                messages=messages,
-                temperature=0.1,
-                response_format=TaskClarityScore
+            response = await self.llm.parse(
+                messages,
+                TaskClarityScore,
+                route=ROUTE_CLASSIFY,
+                latency_budget=CLASSIFY_LATENCY_BUDGET,
+                call_site="clarity",
+                temperature=0.1
             )
             return response.choices[0].message.parsed
         
@@ -86,9 +122,12 @@ class TaskClarityAnalyzer:
 
     async def _stream_print(self, message: str = "", end: str = "\n"):
         """流式输出函数，支持终端和Web前端"""
-        if self.stream_callback:
+        # 执行上下文中的回调优先，并发任务的输出各自发送给发起任务的用户
+        context = get_execution_context()
+        stream_callback = context.stream_callback if context and context.stream_callback else self.stream_callback
+        if stream_callback:
             # Web前端模式：通过回调发送到前端
-            await self.stream_callback(message + end)
+            await stream_callback(message + end)
         else:
             # 终端模式：直接打印
             print(message, end=end, flush=True)
@@ -129,6 +168,45 @@ IMPROVED_REASON_SYSTEM_PROMPT = """
 - 对于明确的动作+简单描述，不要追问
 """
 
+COMBINED_TRIAGE_SYSTEM_PROMPT = """
+# 角色：
+你是一个任务分诊专家，需要一次性完成以下四项判断，并按指定结构输出。
+
+# 1. conversation: 对话交流还是具体任务请求
+- conversation: 纯粹的问候、感谢、闲聊、询问系统能力、情感表达
+- task: 任何带有"做事"意图的输入（生成、创建、搜索、分析、转换、制定、学习、写、做等），即使描述不够详细
+- 宁可误判为任务，也不要把任务误判为对话
+
+# 2. clarity: 任务明确度
+- clarity_score (0-10分): 9-10非常明确；7-8可以直接执行；5-6可能需要少量澄清；3-4需要澄清关键信息；0-2必须澄清
+- has_clear_action: 是否包含明确的动作词
+- has_sufficient_params: 是否包含足够的参数信息
+- is_simple_task: 是否为简单的单步骤任务
+- needs_clarification: 综合判断是否需要澄清，倾向于不追问
+- 示例："生成一个Python hello world程序" -> 9分；"生成一个程序" -> 4分；"帮我处理文件" -> 2分
+
+# 3. task_type: 任务类型
+可选值：通用任务、文档处理、信息检索、图像生成、数据分析
+
+# 4. is_improvement: 是否为对上一个任务的改进请求
+- 改进请求：使用"增加"、"添加"、"修改"、"改进"、"优化"、"调整"等词汇，或指代现有内容进行修改
+- 非改进请求：明确要求创建全新的东西，或与上一个任务无关的独立需求
+- 如果没有上一个任务，is_improvement必须为false
+
+# 上一个任务：
+{last_task}
+"""
+
+CONVERSATION_SYSTEM_PROMPT = """
+你是一个友好的AI助手。用户正在与你进行日常对话，请自然地回应。
+保持简洁、友好和有帮助的语调。
+如果用户问候，请礼貌回应。
+如果用户感谢，请客气回复。
+如果用户询问你的能力，请简要介绍你可以帮助完成的任务类型。
+"""
+
+DEFAULT_CONVERSATION_RESPONSE = "您好！我是您的AI助手，有什么可以帮您的吗？"
+
 PLAN_SYSTEM_PROMPT = """
 # 角色：
 你是一个任务解决专家，你很擅长根据用户的问题结合可用的工具，按步骤制定一个解决方案。
@@ -170,9 +248,43 @@ PLAN_SYSTEM_PROMPT = """
 2. args参数要与工具定义完全匹配
 3. step_description要清晰描述这一步要做什么
 4. 最后一步设置is_final为true
-5. 考虑步骤间的数据依赖关系
+5. 考虑步骤间的数据依赖关系：depends_on填写该步骤依赖的前序步骤序号（从1开始），互不依赖的步骤（如多个独立的搜索）depends_on填[]以便并行执行
 6. 不要进行任何工具名称映射或修改，严格使用工具列表中的名称
 7. 当用户明确要求生成文件时，直接使用file_generation_tool，不要用generate_answer_tool
+8. 需要使用前序步骤的结果时，在args中用 ${{stepN.字段路径}} 引用（如 ${{step1.file_path}}、${{step2.results[0].url}}，${{step1}} 表示完整结果），执行时自动替换，不要再调用generate_answer_tool复述前序结果
+"""
+
+IMPROVEMENT_SYSTEM_PROMPT = """
+# 角色：
+你是一个任务改进专家，专门负责在现有成果基础上进行优化和改进。
+
+# 任务：
+根据用户的改进要求，制定具体的改进计划。重点是在现有文件和成果的基础上进行修改，而不是重新创建。
+
+# 改进原则：
+1. 优先使用read_file_tool读取现有文件
+2. 使用file_generation_tool修改现有文件或创建增强版本
+3. 保持原有功能的同时添加新功能
+4. 如果需要图片素材，使用image_generation_tool
+5. 合理使用其他工具来完善改进
+
+# 工具列表：
+```
+{tools}
+```
+
+# 输出格式：
+```json
+{output_format}
+```
+
+# 注意事项：
+1. 第一步通常是读取现有文件内容
+2. 基于现有内容进行改进，不要重新开始
+3. function_name必须从工具列表中选择
+4. 最后一步设置is_final为true
+5. depends_on填写该步骤依赖的前序步骤序号（从1开始），互不依赖的步骤depends_on填[]以便并行执行
+6. 需要使用前序步骤的结果时，在args中用 ${{stepN.字段路径}} 引用（如 ${{step1.content}}），执行时自动替换
 """
 
 
@@ -180,43 +292,80 @@ class TaskPlanner:
     """任务规划器 - 负责分析用户需求并生成执行计划"""
     
     def __init__(self, 
-                 llm_client: OpenAI,
+                 llm_client: Union[OpenAI, AsyncOpenAI],
                  tool_manager,
                  model_name: str = "Qwen-72B",
-                 event_emitter: ExecutionEventEmitter = None):
+                 event_emitter: ExecutionEventEmitter = None,
+                 triage_mode: str = None,
+                 plan_cache: PlanCache = None,
+                 context_store: UserContextStore = None):
         """
         初始化任务规划器
         
         Args:
-            llm_client: OpenAI客户端
+            llm_client: OpenAI客户端，同步客户端会被转换为AsyncOpenAI
             tool_manager: 工具管理器
             model_name: 使用的LLM模型名称
             event_emitter: 事件发射器
+            triage_mode: 分诊模式 parallel/combined，默认读取settings.TRIAGE_MODE
+            plan_cache: 计划缓存，默认按settings.PLAN_CACHE_*创建，禁用时为None
+            context_store: 用户上下文存储，默认按settings.USER_CONTEXT_*创建
         """
-        self.llm_client = llm_client
+        self.llm = LLMCaller(llm_client, model_name)
+        self.llm_client = self.llm.client
         self.tool_manager = tool_manager
         self.model_name = model_name
         self.event_emitter = event_emitter or ExecutionEventEmitter()
-        self.clarity_analyzer = TaskClarityAnalyzer(llm_client, model_name)
+        self.clarity_analyzer = TaskClarityAnalyzer(self.llm_client, model_name)
         self.stream_callback = None  # 流式输出回调函数
-        self.last_completed_task = None  # 最后完成的任务
+        # 按用户保存最后完成的任务，改进检测只与同一用户的上一个任务比较
+        self.context_store = context_store or UserContextStore(
+            max_users=settings.USER_CONTEXT_MAX_USERS,
+            max_bytes=settings.USER_CONTEXT_MAX_BYTES,
+            spill_dir=settings.USER_CONTEXT_SPILL_DIR or None
+        )
+        self.triage_mode = triage_mode or settings.TRIAGE_MODE
+        if plan_cache is None and settings.PLAN_CACHE_ENABLED:
+            plan_cache = PlanCache(
+                max_entries=settings.PLAN_CACHE_MAX_ENTRIES,
+                ttl=settings.PLAN_CACHE_TTL,
+                cache_dir=settings.PLAN_CACHE_DIR or None
+            )
+        self.plan_cache = plan_cache
+        self.conversation_classifier = None
+        if settings.CONVERSATION_CLASSIFIER_ENABLED:
+            self.conversation_classifier = ConversationClassifier.from_reports(
+                settings.CONVERSATION_CLASSIFIER_REPORTS_DIR,
+                threshold=settings.CONVERSATION_CLASSIFIER_THRESHOLD
+            )
+        self.prompt_compiler = PromptCompiler(tool_manager, {
+            "plan": PLAN_SYSTEM_PROMPT,
+            "improvement": IMPROVEMENT_SYSTEM_PROMPT
+        })
         
-        logger.info("TaskPlanner初始化完成")
+        logger.info(f"TaskPlanner初始化完成，分诊模式: {self.triage_mode}")
     
     def set_stream_callback(self, callback):
-        """设置流式输出回调函数"""
+        """设置默认的流式输出回调（所有任务共享，单个任务的回调放在执行上下文中）"""
         self.stream_callback = callback
         self.clarity_analyzer.stream_callback = callback
     
-    def set_last_completed_task(self, task_plan: 'TaskPlan'):
-        """设置最后完成的任务，用于检测改进请求"""
-        self.last_completed_task = task_plan
+    def set_last_completed_task(self, task_plan: 'TaskPlan', user_id: str = "default"):
+        """设置用户最后完成的任务，用于检测该用户的改进请求"""
+        self.context_store.set_last_task(user_id, task_plan)
+    
+    def get_last_completed_task(self, user_id: str = "default") -> Optional['TaskPlan']:
+        """获取用户最后完成的任务"""
+        return self.context_store.get_last_task(user_id)
     
     async def _stream_print(self, message: str = "", end: str = "\n"):
         """流式输出函数，支持终端和Web前端"""
-        if self.stream_callback:
+        # 执行上下文中的回调优先，并发任务的输出各自发送给发起任务的用户
+        context = get_execution_context()
+        stream_callback = context.stream_callback if context and context.stream_callback else self.stream_callback
+        if stream_callback:
             # Web前端模式：通过回调发送到前端
-            await self.stream_callback(message + end)
+            await stream_callback(message + end)
         else:
             # 终端模式：直接打印
             print(message, end=end, flush=True)
@@ -225,32 +374,47 @@ class TaskPlanner:
         """加载所有可用工具"""
         await self.tool_manager.load_all_tools()
     
-    async def analyze_task(self, user_input: str) -> TaskPlan:
+    @traced("analyze_task", "planner")
+    async def analyze_task(self, user_input: str,
+                           on_plan_step: Optional[Callable[[Step], Awaitable[None]]] = None,
+                           task_id: Optional[str] = None,
+                           user_id: str = "default",
+                           on_conversation_delta: Optional[Callable[[str], Awaitable[None]]] = None) -> TaskPlan:
         """
         分析用户任务，生成执行计划
         
         Args:
             user_input: 用户输入的任务描述
+            on_plan_step: 步骤回调，计划中的每个步骤解析完成时立即调用（流水线执行用）
+            task_id: 预先分配的任务ID，为空时自动生成
+            user_id: 用户/会话ID，用于查找该用户最后完成的任务
+            on_conversation_delta: 对话回复回调，输入为对话时回复的每个片段生成后立即调用，
+                完整回复仍记录在chat_response步骤中
             
         Returns:
             TaskPlan: 完整的任务计划
         """
         logger.info(f"📋 开始分析任务: {user_input[:100]}...")
+        task_id = task_id or str(uuid.uuid4())
+        if on_plan_step is not None and not isinstance(on_plan_step, _StepForwarder):
+            on_plan_step = _StepForwarder(on_plan_step)
         
         try:
+            # 并行分诊：改进检测、对话检测、明确度分析、任务类型分析
+            last_task = self.context_store.get_last_task(user_id)
+            triage = await self._run_triage(user_input, last_task)
+            
             # 首先检查是否为任务改进请求
-            if self.last_completed_task:
-                is_improvement = await self._detect_task_improvement(user_input)
-                if is_improvement:
-                    logger.info("🔄 检测到任务改进请求")
-                    return await self._handle_task_improvement(user_input, self.last_completed_task)
+            if triage.is_improvement:
+                logger.info("🔄 检测到任务改进请求")
+                return await self._handle_task_improvement(user_input, last_task, on_plan_step, task_id, user_id)
             
             # 其次检测是否为对话而非任务
-            is_conversation = await self._detect_conversation(user_input)
-            if is_conversation:
+            if triage.is_conversation:
                 logger.info("💬 检测到对话内容，直接回复")
                 # 创建对话类型的TaskPlan，包含直接回复
                 conversation_plan = TaskPlan(
+                    task_id=task_id,
                     user_input=user_input,
                     task_type="对话",
                     complexity_level="simple",
@@ -258,7 +422,9 @@ class TaskPlanner:
                         Step(
                             step_description="直接对话回复",
                             function_name="chat_response",
-                            args={"response": await self._generate_conversation_response(user_input)},
+                            args={"response": await self._generate_conversation_response(
+                                user_input, on_conversation_delta
+                            )},
                             is_final=True
                         )
                     ]),
@@ -270,8 +436,6 @@ class TaskPlanner:
             # 发射任务分析开始事件
             if self.event_emitter:
                 await self.event_emitter.emit_task_analysis_start(user_input)
-                # 小延迟让前端看到事件
-                await asyncio.sleep(0.5)
             
             # 确保工具已加载
             await self._load_tools()
@@ -279,10 +443,8 @@ class TaskPlanner:
             # 第一步：使用改进的明确度分析
             if self.event_emitter:
                 await self.event_emitter.emit_clarity_check_start()
-                # 小延迟让前端看到事件
-                await asyncio.sleep(0.3)
             
-            clarity_result = await self.clarity_analyzer.analyze_clarity(user_input)
+            clarity_result = triage.clarity
             logger.info(f"📊 任务明确度评分: {clarity_result.clarity_score}/10")
             
             # 发射明确度评分事件
@@ -292,8 +454,6 @@ class TaskPlanner:
                     clarity_result.needs_clarification,
                     getattr(clarity_result, 'questions', [])
                 )
-                # 小延迟让前端处理
-                await asyncio.sleep(0.5)
             
             # 第二步：基于明确度决定是否需要澄清
             if clarity_result.needs_clarification and clarity_result.clarity_score < 6:
@@ -309,6 +469,7 @@ class TaskPlanner:
                         )
                     
                     return TaskPlan(
+                        task_id=task_id,
                         user_input=user_input,
                         task_type="需要澄清",
                         complexity_level="unknown",
@@ -320,27 +481,17 @@ class TaskPlanner:
             # 第三步：生成执行计划
             logger.info("🔧 生成执行计划...")
             
-            # 先分析任务类型和复杂度
-            task_type = await self._analyze_task_type(user_input)
+            # 任务类型已在分诊阶段得出
+            task_type = triage.task_type
             if self.event_emitter:
                 await self.event_emitter.emit_task_type_detected(task_type, 0.8)  # 假设80%置信度
-                await asyncio.sleep(0.3)
             
             # 发射计划生成开始事件
             if self.event_emitter:
                 await self.event_emitter.emit_plan_generation_start("unknown")  # 复杂度稍后确定
-                await asyncio.sleep(0.5)
             
-            plan = await self._generate_plan(user_input)
-            
-            # 发射每个步骤生成事件（增加延迟）
-            if self.event_emitter:
-                for i, step in enumerate(plan.steps):
-                    await self.event_emitter.emit_plan_step_generated(
-                        i, len(plan.steps), step.step_description, step.function_name
-                    )
-                    # 每个步骤之间稍微延迟，让前端能看到逐个生成
-                    await asyncio.sleep(0.2)
+            # 步骤生成事件在流式解析过程中逐个发射
+            plan = await self._generate_plan(user_input, on_plan_step)
             
             # 第四步：验证计划中的工具（不修改，只验证）
             if self.event_emitter:
@@ -348,14 +499,14 @@ class TaskPlanner:
                     "plan_validation",
                     "验证计划中的工具可用性..."
                 )
-                await asyncio.sleep(0.3)
             
             validated_plan = await self._validate_plan(plan)
             
             # 第五步：分析任务复杂度和类型
-            task_analysis = await self._analyze_task_complexity(user_input, validated_plan)
+            task_analysis = await self._analyze_task_complexity(user_input, validated_plan, task_type)
             
             task_plan = TaskPlan(
+                task_id=task_id,
                 user_input=user_input,
                 task_type=task_analysis.get("task_type", task_type),
                 complexity_level=task_analysis.get("complexity_level", "medium"),
@@ -370,7 +521,6 @@ class TaskPlanner:
                     len(validated_plan.steps),
                     task_plan.task_type
                 )
-                await asyncio.sleep(0.5)
             
             logger.info(f"✅ 任务分析完成，生成{len(validated_plan.steps)}个执行步骤")
             await self._format_plan_output(task_plan)
@@ -385,6 +535,159 @@ class TaskPlanner:
                 )
             raise
     
+    @traced("triage", "planner")
+    async def _run_triage(self, user_input: str, last_task: Optional['TaskPlan'] = None) -> TriageResult:
+        """
+        执行任务分诊，按triage_mode选择并行多次调用或单次合并调用
+        
+        Args:
+            user_input: 用户输入
+            last_task: 该用户最后完成的任务，为空时不做改进检测
+            
+        Returns:
+            TriageResult: 分诊结果（含各分类器耗时）
+        """
+        local_start = time.perf_counter()
+        if not last_task and self._classify_conversation_locally(user_input):
+            # 本地分类器高置信度判定为对话且不可能是改进请求，无需任何LLM分类调用
+            elapsed = round(time.perf_counter() - local_start, 6)
+            triage = TriageResult(is_conversation=True, timings={"local": elapsed}, elapsed=elapsed)
+        elif self.triage_mode == "combined":
+            triage = await self._run_combined_triage(user_input, last_task)
+        else:
+            triage = await self._run_parallel_triage(user_input, last_task)
+        
+        if triage.is_improvement:
+            decision = "improvement"
+        elif triage.is_conversation:
+            decision = "conversation"
+        else:
+            decision = "task"
+        logger.info(f"🧭 分诊完成: {decision}，耗时{triage.elapsed:.2f}s，各分类器: {triage.timings}，取消: {triage.cancelled}")
+        
+        if self.event_emitter:
+            await self.event_emitter.emit_triage_complete(decision, triage.timings, triage.cancelled, triage.elapsed)
+        
+        return triage
+    
+    async def _run_combined_triage(self, user_input: str, last_task: Optional['TaskPlan'] = None) -> TriageResult:
+        """
+        单次结构化输出完成全部分诊判断，失败时回退到并行分诊
+        
+        Args:
+            user_input: 用户输入
+            last_task: 该用户最后完成的任务
+            
+        Returns:
+            TriageResult: 分诊结果
+        """
+        last_task_info = "无"
+        if last_task:
+            last_task_info = last_task.user_input
+        
+        messages = [
+            {"role": "system", "content": COMBINED_TRIAGE_SYSTEM_PROMPT.format(last_task=last_task_info)},
+            {"role": "user", "content": user_input}
+        ]
+        
+        start_time = time.perf_counter()
+        try:
+            response = await self.llm.parse(
+                messages,
+                CombinedTriage,
+                route=ROUTE_CLASSIFY,
+                latency_budget=CLASSIFY_LATENCY_BUDGET,
+                call_site="triage",
+                temperature=0.1
+            )
+            combined = response.choices[0].message.parsed
+        except Exception as e:
+            logger.error(f"合并分诊失败，回退到并行分诊: {e}")
+            return await self._run_parallel_triage(user_input, last_task)
+        
+        elapsed = round(time.perf_counter() - start_time, 3)
+        return TriageResult(
+            is_improvement=bool(last_task) and combined.is_improvement,
+            is_conversation=combined.conversation.type == "conversation",
+            clarity=combined.clarity,
+            task_type=combined.task_type.type,
+            timings={"combined": elapsed},
+            elapsed=elapsed
+        )
+    
+    async def _run_parallel_triage(self, user_input: str, last_task: Optional['TaskPlan'] = None) -> TriageResult:
+        """
+        并行执行任务分诊
+        
+        改进检测、对话检测、明确度分析、任务类型分析同时发起，
+        一旦得到决定性结果（改进请求或对话）即取消其余分类器。
+        
+        Args:
+            user_input: 用户输入
+            last_task: 该用户最后完成的任务，为空时不做改进检测
+            
+        Returns:
+            TriageResult: 分诊结果
+        """
+        classifiers = {}
+        if last_task:
+            classifiers["improvement"] = self._detect_task_improvement(user_input)
+        classifiers["conversation"] = self._detect_conversation(user_input)
+        classifiers["clarity"] = self.clarity_analyzer.analyze_clarity(user_input)
+        classifiers["task_type"] = self._analyze_task_type(user_input, stream_output=False)
+        
+        timings: Dict[str, float] = {}
+        results: Dict[str, Any] = {}
+        cancelled = []
+        start_time = time.perf_counter()
+        tasks = {
+            asyncio.create_task(self._timed_classifier(name, coro, timings)): name
+            for name, coro in classifiers.items()
+        }
+        pending = set(tasks)
+        
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results[tasks[task]] = task.result()
+                if self._is_triage_decided(results, classifiers):
+                    break
+        finally:
+            # 取消已无意义的分类器调用
+            for task in pending:
+                task.cancel()
+                cancelled.append(tasks[task])
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        return TriageResult(
+            is_improvement=results.get("improvement", False),
+            is_conversation=results.get("conversation", False),
+            clarity=results.get("clarity"),
+            task_type=results.get("task_type"),
+            timings=timings,
+            cancelled=cancelled,
+            elapsed=round(time.perf_counter() - start_time, 3)
+        )
+    
+    async def _timed_classifier(self, name: str, coro, timings: Dict[str, float]) -> Any:
+        """执行单个分类器并记录耗时"""
+        start_time = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            timings[name] = round(time.perf_counter() - start_time, 3)
+    
+    def _is_triage_decided(self, results: Dict[str, Any], classifiers: Dict[str, Any]) -> bool:
+        """判断分诊是否已得到决定性结果"""
+        if results.get("improvement"):
+            return True
+        # 改进检测优先级更高，需等待其返回否定结果后对话结果才具有决定性
+        improvement_settled = "improvement" not in classifiers or "improvement" in results
+        return bool(results.get("conversation")) and improvement_settled
+    
+    @traced("analyze_requirements", "planner")
     async def _analyze_requirements(self, user_input: str) -> Dict[str, Any]:
         """分析用户需求，判断是否需要追问"""
         try:
@@ -395,12 +698,14 @@ class TaskPlanner:
             
             await self._stream_print("🤔 分析是否需要澄清...")
 
-            response = self.llm_client.beta.chat.completions.parse(
-                    model=self.model_name,
-                    messages=messages,
-                    temperature=0.3,
-                    response_format=TaskNeedClarification
-                )
+            response = await self.llm.parse(
+                messages,
+                TaskNeedClarification,
+                route=ROUTE_CLASSIFY,
+                latency_budget=CLASSIFY_LATENCY_BUDGET,
+                call_site="requirements",
+                temperature=0.3
+            )
             response_text = json.loads(response.choices[0].message.content.strip())
             
             if response_text.get("need_clarification", False):
@@ -424,72 +729,110 @@ class TaskPlanner:
             logger.error(f"需求分析失败: {e}")
             return {"needs_clarification": False}
     
-    async def _generate_plan(self, user_input: str) -> Plan:
-        """生成具体的执行计划"""
+    @traced("generate_plan", "planner")
+    async def _generate_plan(self, user_input: str,
+                             on_plan_step: Optional[Callable[[Step], Awaitable[None]]] = None) -> Plan:
+        """生成具体的执行计划（优先复用计划缓存），每个步骤确定后调用on_plan_step"""
+        cache_key = None
+        if self.plan_cache:
+            cache_key = PlanCache.make_key(user_input, self.tool_manager.get_catalog_version())
+            cached_plan = self.plan_cache.get(cache_key)
+            if cached_plan:
+                logger.info(f"♻️ 命中计划缓存，复用{len(cached_plan.steps)}个步骤，缓存统计: {self.plan_cache.get_stats()}")
+                await self._stream_print("♻️ 复用已缓存的执行计划")
+                await self._emit_plan_steps(cached_plan, on_plan_step)
+                return cached_plan
+        
         try:
-            # 获取工具信息
-            tools_info = self.tool_manager.get_tools_for_planning()
-            
-            # 生成工具约束提示
-            tool_constraint = self.tool_manager.generate_tool_constraint_prompt()
-            
-            # 格式化提示词
-            formatted_prompt = PLAN_SYSTEM_PROMPT.format(
-                tools=json.dumps(tools_info, ensure_ascii=False, indent=2),
-                output_format=json.dumps(Plan.model_json_schema(), ensure_ascii=False, indent=2)
-            ) + tool_constraint
-            
-            messages = [
-                {"role": "system", "content": formatted_prompt},
-                {"role": "user", "content": user_input}
-            ]
+            start_time = time.perf_counter()
+            # 系统提示词按工具清单版本预编译，检索出的补充工具与用户输入只出现在其后
+            messages = self.prompt_compiler.build_messages("plan", user_input, query=user_input)
             
             await self._stream_print("⚙️ 生成执行计划...")
-            # 添加流式输出
-            response = self.llm_client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                temperature=0.1,
-                stream=True
-            )
-            
-            # 处理流式响应
-            full_response = ""
-            for chunk in response:
-                if chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
-                    await self._stream_print(content, end="")
-                    full_response += content
-            await self._stream_print()  # 换行
-            
-            response_text = full_response.strip()
-            
-            # 尝试解析JSON响应
-            try:
-                # 提取JSON部分
-                if "```json" in response_text:
-                    json_start = response_text.find("```json") + 7
-                    json_end = response_text.find("```", json_start)
-                    json_text = response_text[json_start:json_end].strip()
-                elif "{" in response_text:
-                    json_start = response_text.find("{")
-                    json_end = response_text.rfind("}") + 1
-                    json_text = response_text[json_start:json_end]
-                else:
-                    raise ValueError("未找到JSON格式的计划")
-                
-                plan_data = json.loads(json_text)
-                return Plan(**plan_data)
-                
-            except (json.JSONDecodeError, ValueError) as e:
-                logger.warning(f"解析计划JSON失败: {e}")
-                # 如果解析失败，创建一个默认计划
-                return self._create_fallback_plan(user_input)
-                
+            parser = await self._stream_plan(messages, on_plan_step)
+            plan = parser.finish()
+        except ValueError as e:
+            logger.warning(f"解析计划JSON失败: {e}")
+            self._ensure_no_steps_forwarded(on_plan_step, e)
+            # 如果解析失败，创建一个默认计划（不交给流水线，由执行器按顺序执行）
+            plan = self._create_fallback_plan(user_input)
+            await self._emit_plan_steps(plan)
+            return plan
         except Exception as e:
             logger.error(f"生成计划失败: {e}")
-            return self._create_fallback_plan(user_input)
+            self._ensure_no_steps_forwarded(on_plan_step, e)
+            plan = self._create_fallback_plan(user_input)
+            await self._emit_plan_steps(plan)
+            return plan
+        
+        # 只缓存LLM完整生成的计划，后备计划和截断的计划不缓存
+        if cache_key and not parser.truncated:
+            self.plan_cache.put(cache_key, plan, time.perf_counter() - start_time)
+        return plan
+    
+    async def _stream_plan(self, messages,
+                           on_plan_step: Optional[Callable[[Step], Awaitable[None]]] = None,
+                           call_site: str = "plan") -> IncrementalPlanParser:
+        """
+        流式生成计划，每个步骤对象闭合时立即解析、发射步骤生成事件并调用on_plan_step
+        
+        流式输出中途出错时，若已解析出步骤则保留这些步骤，否则抛出异常
+        
+        Args:
+            messages: 规划消息
+            on_plan_step: 步骤回调
+            call_site: 调用点名称（执行计划/改进计划分别统计延迟）
+        
+        Returns:
+            IncrementalPlanParser: 解析器，调用finish()得到计划
+        """
+        parser = IncrementalPlanParser()
+        try:
+            async for content in self.llm.stream(messages, route=ROUTE_PLAN, latency_budget=PLAN_LATENCY_BUDGET,
+                                                 call_site=call_site, temperature=0.1):
+                await self._stream_print(content, end="")
+                new_steps = parser.feed(content)
+                first_index = len(parser.steps) - len(new_steps)
+                for offset, step in enumerate(new_steps):
+                    await self._emit_step_generated(first_index + offset, step, on_plan_step=on_plan_step)
+            await self._stream_print()  # 换行
+        except Exception as e:
+            if not parser.steps:
+                raise
+            logger.warning(f"计划流式输出中断，保留已解析的{len(parser.steps)}个步骤: {e}")
+        return parser
+    
+    async def _emit_step_generated(self, step_index: int, step: Step, total_steps: int = None,
+                                   on_plan_step: Optional[Callable[[Step], Awaitable[None]]] = None):
+        """发射单个步骤生成事件（流式解析时总步骤数未知），并通知步骤回调"""
+        if self.event_emitter:
+            await self.event_emitter.emit_plan_step_generated(
+                step_index, total_steps, step.step_description, step.function_name
+            )
+        if on_plan_step:
+            await on_plan_step(step)
     
+    async def _emit_plan_steps(self, plan: Plan,
+                               on_plan_step: Optional[Callable[[Step], Awaitable[None]]] = None):
+        """为非流式得到的计划（缓存命中、后备计划）补发步骤生成事件"""
+        for i, step in enumerate(plan.steps):
+            await self._emit_step_generated(i, step, len(plan.steps), on_plan_step)
+    
+    def _ensure_no_steps_forwarded(self, on_plan_step: Optional[Callable[[Step], Awaitable[None]]],
+                                   error: Exception):
+        """
+        规划失败后改用后备计划前的检查
+        
+        已有步骤交给执行器时，这些步骤可能已经产生副作用，后备计划不能再接着执行，任务直接失败
+        
+        Raises:
+            PlanAbandonedError: 已有步骤交给执行器
+        """
+        forwarded = getattr(on_plan_step, "forwarded", 0)
+        if forwarded:
+            raise PlanAbandonedError(f"已有{forwarded}个步骤开始执行后规划失败: {error}") from error
+    
+    @traced("validate_plan", "planner")
     async def _validate_plan(self, plan: Plan) -> Plan:
         """验证计划中的工具调用（不修改工具名称）"""
         available_tools = self.tool_manager.get_available_tool_names()
@@ -513,38 +856,39 @@ class TaskPlanner:
             )
         ])
     
-    async def _analyze_task_type(self, user_input: str) -> str:
-        """分析任务类型"""
+    async def _analyze_task_type(self, user_input: str, stream_output: bool = True) -> str:
+        """
+        分析任务类型
+        
+        Args:
+            user_input: 用户输入
+            stream_output: 是否先流式输出分析过程（并行分诊时关闭，避免输出交错）
+        """
         try:
             messages = [
                 {"role": "system", "content": "请分析用户输入的任务类型"},
                 {"role": "user", "content": user_input}
             ]
             
-            await self._stream_print("🔍 分析任务类型...")
-            # 对于简单的分析任务，先尝试流式输出
-            response = self.llm_client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                temperature=0.1,
-                stream=True
-            )
-            
-            # 处理流式响应
-            full_response = ""
-            for chunk in response:
-                if chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
+            if stream_output:
+                await self._stream_print("🔍 分析任务类型...")
+                # 对于简单的分析任务，先尝试流式输出
+                full_response = ""
+                async for content in self.llm.stream(messages, route=ROUTE_CLASSIFY,
+                                                     latency_budget=CLASSIFY_LATENCY_BUDGET, call_site="task_type",
+                                                     temperature=0.1):
                     await self._stream_print(content, end="")
                     full_response += content
-            await self._stream_print()  # 换行
+                await self._stream_print()  # 换行
             
             # 如果需要结构化输出，使用非流式方式
-            response = self.llm_client.beta.chat.completions.parse(
-                model=self.model_name,
-                messages=messages,
-                temperature=0.1,
-                response_format=TaskType
+            response = await self.llm.parse(
+                messages,
+                TaskType,
+                route=ROUTE_CLASSIFY,
+                latency_budget=CLASSIFY_LATENCY_BUDGET,
+                call_site="task_type",
+                temperature=0.1
             )
             response_text = response.choices[0].message.parsed
             return response_text.type
@@ -552,8 +896,9 @@ class TaskPlanner:
             logger.error(f"任务类型分析失败: {e}")
             return "通用任务"
     
-    async def _analyze_task_complexity(self, user_input: str, plan: Plan) -> Dict[str, str]:
-        """分析任务复杂度和类型"""
+    @traced("analyze_complexity", "planner")
+    async def _analyze_task_complexity(self, user_input: str, plan: Plan, task_type: str = None) -> Dict[str, str]:
+        """分析任务复杂度和类型（已知任务类型时不再重复调用大模型）"""
         step_count = len(plan.steps)
         
         # 基于步骤数量判断复杂度
@@ -565,7 +910,8 @@ class TaskPlanner:
             complexity = "complex"
         
         # 基于大模型判断任务类型
-        task_type = await self._analyze_task_type(user_input)
+        if not task_type:
+            task_type = await self._analyze_task_type(user_input)
         
         return {
             "complexity_level": complexity,
@@ -632,12 +978,14 @@ class TaskPlanner:
                 {"role": "system", "content": conversation_prompt.format(user_input=user_input)}
             ]
             
-            response = self.llm_client.beta.chat.completions.parse(
-                model=self.model_name,
-                messages=messages,
+            response = await self.llm.parse(
+                messages,
+                IsTaskOrConversation,
+                route=ROUTE_CLASSIFY,
+                latency_budget=CLASSIFY_LATENCY_BUDGET,
+                call_site="conversation_check",
                 temperature=0.1,
-                max_tokens=10,
-                response_format=IsTaskOrConversation
+                max_tokens=10
             )
 
             result = response.choices[0].message.parsed
@@ -648,42 +996,72 @@ class TaskPlanner:
             # 默认认为是任务，避免误判
             return False
     
-    async def _generate_conversation_response(self, user_input: str) -> str:
+    def _classify_conversation_locally(self, user_input: str) -> Optional[bool]:
+        """本地分类器判断是否为对话，未启用或置信度不足时返回None"""
+        if not self.conversation_classifier:
+            return None
+        result = self.conversation_classifier.classify(user_input)
+        if result is not None:
+            logger.info(f"⚡ 本地对话分类器判定: {'conversation' if result else 'task'}")
+        return result
+    
+    async def stream_conversation_response(self, user_input: str) -> AsyncIterator[str]:
         """
-        为对话类型的输入生成回复
+        流式生成对话回复，逐段产出文本
+        
+        未产出任何内容就失败时产出默认回复；已产出部分内容后失败则就此结束
         
         Args:
             user_input: 用户输入
             
-        Returns:
-            str: 对话回复
+        Yields:
+            str: 回复片段
         """
-        conversation_system = """
-你是一个友好的AI助手。用户正在与你进行日常对话，请自然地回应。
-保持简洁、友好和有帮助的语调。
-如果用户问候，请礼貌回应。
-如果用户感谢，请客气回复。
-如果用户询问你的能力，请简要介绍你可以帮助完成的任务类型。
-"""
+        messages = [
+            {"role": "system", "content": CONVERSATION_SYSTEM_PROMPT},
+            {"role": "user", "content": user_input}
+        ]
         
+        start_time = time.perf_counter()
+        streamed = False
         try:
-            messages = [
-                {"role": "system", "content": conversation_system},
-                {"role": "user", "content": user_input}
-            ]
-            
-            response = self.llm_client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
+            async for delta in self.llm.stream(
+                messages,
+                route=ROUTE_CHAT,
+                latency_budget=CHAT_LATENCY_BUDGET,
+                call_site="conversation_reply",
                 temperature=0.7,
                 max_tokens=150
-            )
-            
-            return response.choices[0].message.content.strip()
-            
+            ):
+                if not streamed:
+                    streamed = True
+                    logger.info(f"💬 对话回复首个片段耗时: {time.perf_counter() - start_time:.2f}s")
+                yield delta
         except Exception as e:
             logger.error(f"生成对话回复失败: {e}")
-            return "您好！我是您的AI助手，有什么可以帮您的吗？"
+            if not streamed:
+                yield DEFAULT_CONVERSATION_RESPONSE
+    
+    @traced("conversation_response", "planner")
+    async def _generate_conversation_response(self, user_input: str,
+                                              on_delta: Optional[Callable[[str], Awaitable[None]]] = None) -> str:
+        """
+        为对话类型的输入生成回复
+        
+        Args:
+            user_input: 用户输入
+            on_delta: 片段回调，每个回复片段生成后立即调用
+            
+        Returns:
+            str: 完整的对话回复
+        """
+        chunks = []
+        async for delta in self.stream_conversation_response(user_input):
+            chunks.append(delta)
+            if on_delta:
+                await on_delta(delta)
+        
+        return "".join(chunks).strip() or DEFAULT_CONVERSATION_RESPONSE
     
     async def refine_plan_with_feedback(self, task_plan: TaskPlan, user_feedback: str) -> TaskPlan:
         """根据用户反馈优化计划"""
@@ -750,9 +1128,11 @@ class TaskPlanner:
                 {"role": "system", "content": improvement_prompt.format(user_input=user_input)}
             ]
             
-            response = self.llm_client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
+            response = await self.llm.create(
+                messages,
+                route=ROUTE_CLASSIFY,
+                latency_budget=CLASSIFY_LATENCY_BUDGET,
+                call_site="improvement_check",
                 temperature=0.1,
                 max_tokens=10
             )
@@ -765,13 +1145,20 @@ class TaskPlanner:
             # 默认认为不是改进请求
             return False
     
-    async def _handle_task_improvement(self, user_input: str, last_task: 'TaskPlan') -> 'TaskPlan':
+    @traced("task_improvement", "planner")
+    async def _handle_task_improvement(self, user_input: str, last_task: 'TaskPlan',
+                                       on_plan_step: Optional[Callable[[Step], Awaitable[None]]] = None,
+                                       task_id: Optional[str] = None,
+                                       user_id: str = "default") -> 'TaskPlan':
         """
         处理任务改进请求
         
         Args:
             user_input: 用户的改进要求
             last_task: 上一个完成的任务
+            on_plan_step: 步骤回调，每个步骤解析完成时立即调用
+            task_id: 预先分配的任务ID，为空时自动生成
+            user_id: 用户/会话ID
             
         Returns:
             TaskPlan: 改进任务的计划
@@ -782,7 +1169,6 @@ class TaskPlanner:
             # 发射任务分析开始事件
             if self.event_emitter:
                 await self.event_emitter.emit_task_analysis_start(f"改进: {user_input}")
-                await asyncio.sleep(0.5)
             
             # 确保工具已加载
             await self._load_tools()
@@ -807,24 +1193,16 @@ class TaskPlanner:
             # 发射计划生成开始事件
             if self.event_emitter:
                 await self.event_emitter.emit_plan_generation_start("improvement")
-                await asyncio.sleep(0.5)
-            
-            # 生成改进计划
-            plan = await self._generate_improvement_plan(improvement_request, last_task)
             
-            # 发射每个步骤生成事件
-            if self.event_emitter:
-                for i, step in enumerate(plan.steps):
-                    await self.event_emitter.emit_plan_step_generated(
-                        i, len(plan.steps), step.step_description, step.function_name
-                    )
-                    await asyncio.sleep(0.2)
+            # 生成改进计划（步骤生成事件在流式解析过程中逐个发射）
+            plan = await self._generate_improvement_plan(improvement_request, last_task, on_plan_step)
             
             # 验证计划
             validated_plan = await self._validate_plan(plan)
             
             # 创建改进任务计划
             improvement_task = TaskPlan(
+                task_id=task_id or str(uuid.uuid4()),
                 user_input=f"改进: {user_input}",
                 task_type="任务改进",
                 complexity_level="medium",
@@ -840,7 +1218,6 @@ class TaskPlanner:
                     len(validated_plan.steps),
                     improvement_task.task_type
                 )
-                await asyncio.sleep(0.5)
             
             logger.info(f"✅ 任务改进计划生成完成，包含{len(validated_plan.steps)}个步骤")
             await self._format_plan_output(improvement_task)
@@ -849,109 +1226,43 @@ class TaskPlanner:
             
         except Exception as e:
             logger.error(f"❌ 任务改进处理失败: {e}")
-            # 如果改进处理失败，降级为普通任务处理
-            return await self._handle_as_normal_task(user_input)
+            self._ensure_no_steps_forwarded(on_plan_step, e)
+            # 如果改进处理失败，降级为普通任务处理（新计划不交给流水线，由执行器按顺序执行）
+            return await self._handle_as_normal_task(user_input, task_id, user_id)
     
-    async def _generate_improvement_plan(self, improvement_request: str, last_task: 'TaskPlan') -> Plan:
+    async def _generate_improvement_plan(self, improvement_request: str, last_task: 'TaskPlan',
+                                         on_plan_step: Optional[Callable[[Step], Awaitable[None]]] = None) -> Plan:
         """
         生成改进计划
         
         Args:
             improvement_request: 改进请求描述
             last_task: 上一个任务
+            on_plan_step: 步骤回调，每个步骤解析完成时立即调用
             
         Returns:
             Plan: 改进计划
         """
-        improvement_prompt = """
-# 角色：
-你是一个任务改进专家，专门负责在现有成果基础上进行优化和改进。
-
-# 任务：
-根据用户的改进要求，制定具体的改进计划。重点是在现有文件和成果的基础上进行修改，而不是重新创建。
-
-# 改进原则：
-1. 优先使用read_file_tool读取现有文件
-2. 使用file_generation_tool修改现有文件或创建增强版本
-3. 保持原有功能的同时添加新功能
-4. 如果需要图片素材，使用image_generation_tool
-5. 合理使用其他工具来完善改进
-
-# 工具列表：
-```
-{tools}
-```
-
-# 输出格式：
-```json
-{output_format}
-```
-
-# 注意事项：
-1. 第一步通常是读取现有文件内容
-2. 基于现有内容进行改进，不要重新开始
-3. function_name必须从工具列表中选择
-4. 最后一步设置is_final为true
-"""
-        
         try:
-            # 获取工具信息
-            tools_info = self.tool_manager.get_tools_for_planning()
-            tool_constraint = self.tool_manager.generate_tool_constraint_prompt()
-            
-            # 格式化提示词
-            formatted_prompt = improvement_prompt.format(
-                tools=json.dumps(tools_info, ensure_ascii=False, indent=2),
-                output_format=json.dumps(Plan.model_json_schema(), ensure_ascii=False, indent=2)
-            ) + tool_constraint
-            
-            messages = [
-                {"role": "system", "content": formatted_prompt},
-                {"role": "user", "content": improvement_request}
-            ]
+            # 系统提示词按工具清单版本预编译，补充工具、改进要求与上一个任务信息只出现在其后
+            messages = self.prompt_compiler.build_messages("improvement", improvement_request, query=improvement_request)
             
             await self._stream_print("⚙️ 生成改进计划...")
-            response = self.llm_client.chat.completions.create(
-                model=self.model_name,
-                messages=messages,
-                temperature=0.1,
-                stream=True
-            )
-            
-            # 处理流式响应
-            full_response = ""
-            for chunk in response:
-                if chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
-                    await self._stream_print(content, end="")
-                    full_response += content
-            await self._stream_print()  # 换行
+            parser = await self._stream_plan(messages, on_plan_step, call_site="improvement_plan")
+            return parser.finish()
             
-            response_text = full_response.strip()
-            
-            # 解析JSON响应
-            try:
-                if "```json" in response_text:
-                    json_start = response_text.find("```json") + 7
-                    json_end = response_text.find("```", json_start)
-                    json_text = response_text[json_start:json_end].strip()
-                elif "{" in response_text:
-                    json_start = response_text.find("{")
-                    json_end = response_text.rfind("}") + 1
-                    json_text = response_text[json_start:json_end]
-                else:
-                    raise ValueError("未找到JSON格式的计划")
-                
-                plan_data = json.loads(json_text)
-                return Plan(**plan_data)
-                
-            except (json.JSONDecodeError, ValueError) as e:
-                logger.warning(f"解析改进计划JSON失败: {e}")
-                return self._create_fallback_improvement_plan(improvement_request)
-                
+        except ValueError as e:
+            logger.warning(f"解析改进计划JSON失败: {e}")
+            self._ensure_no_steps_forwarded(on_plan_step, e)
+            plan = self._create_fallback_improvement_plan(improvement_request)
         except Exception as e:
             logger.error(f"生成改进计划失败: {e}")
-            return self._create_fallback_improvement_plan(improvement_request)
+            self._ensure_no_steps_forwarded(on_plan_step, e)
+            plan = self._create_fallback_improvement_plan(improvement_request)
+        
+        # 后备计划不交给流水线，由执行器按顺序执行
+        await self._emit_plan_steps(plan)
+        return plan
     
     def _create_fallback_improvement_plan(self, improvement_request: str) -> Plan:
         """创建后备改进计划"""
@@ -968,9 +1279,11 @@ class TaskPlanner:
             )
         ])
     
-    async def _handle_as_normal_task(self, user_input: str) -> 'TaskPlan':
-        """将输入作为普通任务处理（改进失败时的降级方案）"""
+    async def _handle_as_normal_task(self, user_input: str,
+                                     task_id: Optional[str] = None,
+                                     user_id: str = "default") -> 'TaskPlan':
+        """将输入作为普通任务处理（改进失败时的降级方案，不经过流水线）"""
         logger.info("🔄 改进处理失败，降级为普通任务处理")
-        # 清除last_completed_task避免递归
-        self.last_completed_task = None
-        return await self.analyze_task(user_input) 
\ No newline at end of file
+        # 清除该用户最后完成的任务避免递归
+        self.context_store.clear(user_id)
+        return await self.analyze_task(user_input, task_id=task_id, user_id=user_id) 
\ No newline at end of file
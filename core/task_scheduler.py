@@ -0,0 +1,292 @@
+"""
+任务调度器
+Web层与规划/执行之间的有界任务队列：固定数量的工作协程执行任务，
+排队任务按用户轮转出队（每个用户同时只执行一个任务），队列已满时拒绝提交
+"""
+
+import asyncio
+import logging
+import statistics
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 等待时间统计保留的最近样本数
+_WAIT_WINDOW = 1000
+
+
+class QueueFullError(Exception):
+    """任务队列已满（总量或单用户排队数超过上限）"""
+
+
+class QueuedTask:
+    """排队中的任务"""
+
+    def __init__(self, user_id: str, user_input: str,
+                 runner: Optional[Callable[[str, str], Awaitable[Any]]] = None):
+        self.task_id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.user_input = user_input
+        # 该任务专用的执行函数，为空时使用调度器的runner
+        self.runner = runner
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        # 执行中的asyncio任务，用于取消
+        self.runner_task: Optional[asyncio.Task] = None
+
+    @property
+    def wait_time(self) -> float:
+        """排队等待时间(秒)，尚未开始时为截至当前的等待时间"""
+        return (self.started_at or time.monotonic()) - self.enqueued_at
+
+
+class TaskScheduler:
+    """任务调度器 - 有界队列 + 工作协程池，按用户轮转保证公平"""
+
+    def __init__(self, runner: Callable[[str, str], Awaitable[Any]], workers: int = 4,
+                 max_queue: int = 100, max_queue_per_user: int = 5,
+                 on_queue_update: Optional[Callable[[QueuedTask, int], Awaitable[None]]] = None):
+        """
+        初始化任务调度器
+
+        Args:
+            runner: 任务执行函数，参数为 (user_id, user_input)
+            workers: 同时执行的任务数
+            max_queue: 排队任务总数上限（不含执行中的任务）
+            max_queue_per_user: 单个用户排队任务数上限
+            on_queue_update: 排队位置变化回调，参数为 (排队任务, 新位置)
+        """
+        self.runner = runner
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.on_queue_update = on_queue_update
+
+        # 每个用户一个FIFO队列；_rotation为轮转顺序，队首用户优先出队
+        self._queues: Dict[str, Deque[QueuedTask]] = {}
+        self._rotation: "OrderedDict[str, None]" = OrderedDict()
+        self._running: Dict[str, QueuedTask] = {}
+        self._condition: Optional[asyncio.Condition] = None
+        self._worker_tasks: List[asyncio.Task] = []
+
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self._wait_times: Deque[float] = deque(maxlen=_WAIT_WINDOW)
+
+        logger.info(f"TaskScheduler初始化完成，工作协程: {self.workers}，队列上限: {max_queue}，单用户排队上限: {max_queue_per_user}")
+
+    async def start(self) -> None:
+        """启动工作协程"""
+        if self._worker_tasks:
+            return
+        self._condition = asyncio.Condition()
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(index), name=f"task-worker-{index}") for index in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """停止工作协程（执行中的任务随之取消）"""
+        for worker in self._worker_tasks:
+            worker.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def submit(self, user_id: str, user_input: str,
+                     runner: Optional[Callable[[str, str], Awaitable[Any]]] = None) -> QueuedTask:
+        """
+        提交任务
+
+        Args:
+            user_id: 用户ID
+            user_input: 用户输入
+            runner: 该任务专用的执行函数（如恢复中断的任务），为空时使用调度器的runner
+
+        Returns:
+            QueuedTask: 排队任务，通过get_position查询排队位置（0表示已开始执行）
+
+        Raises:
+            QueueFullError: 队列已满或该用户排队任务过多
+        """
+        if not self._worker_tasks:
+            await self.start()
+
+        user_queue = self._queues.get(user_id)
+        if self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"任务队列已满（{self.max_queue}），请稍后再试")
+        if user_queue and len(user_queue) >= self.max_queue_per_user:
+            self.rejected += 1
+            raise QueueFullError(f"您已有{len(user_queue)}个任务在排队，请等待完成后再提交")
+
+        queued_task = QueuedTask(user_id, user_input, runner)
+        self._queues.setdefault(user_id, deque()).append(queued_task)
+        self._rotation.setdefault(user_id)
+        self.submitted += 1
+
+        async with self._condition:
+            self._condition.notify()
+        return queued_task
+
+    def get_position(self, queued_task: QueuedTask) -> int:
+        """排队位置（从1开始），已开始执行或不在队列中时返回0"""
+        for position, candidate in enumerate(self._iter_queue_order(), 1):
+            if candidate is queued_task:
+                return position
+        return 0
+
+    async def cancel(self, user_id: str, include_queued: bool = True) -> Dict[str, Any]:
+        """
+        取消用户的任务
+
+        执行中的任务通过取消其asyncio任务中止，取消会传播到规划中的LLM调用、正在执行的步骤及其MCP调用
+
+        Args:
+            user_id: 用户ID
+            include_queued: 是否同时移除该用户排队中的任务
+
+        Returns:
+            Dict[str, Any]: 被取消的执行中任务ID与移除的排队任务ID
+        """
+        removed = []
+        if include_queued and user_id in self._queues:
+            removed = [task.task_id for task in self._queues.pop(user_id)]
+            self._rotation.pop(user_id, None)
+            self.cancelled += len(removed)
+
+        running = self._running.get(user_id)
+        cancelled_task_id = None
+        if running and running.runner_task and not running.runner_task.done():
+            running.runner_task.cancel()
+            cancelled_task_id = running.task_id
+            logger.info(f"🛑 取消用户 {user_id} 的任务 {running.task_id}")
+
+        if removed:
+            await self._notify_positions()
+        return {"cancelled_task_id": cancelled_task_id, "removed_queued": removed}
+
+    def is_waiting(self, queued_task: QueuedTask) -> bool:
+        """任务是否需要等待（没有空闲的工作协程，或该用户已有任务在执行）"""
+        position = self.get_position(queued_task)
+        if position == 0:
+            return False
+        return queued_task.user_id in self._running or position > self.workers - len(self._running)
+
+    def get_user_status(self, user_id: str) -> Dict[str, Any]:
+        """获取用户的执行中任务与排队任务"""
+        running = self._running.get(user_id)
+        queued = list(self._queues.get(user_id, ()))
+        return {
+            "running_task_id": running.task_id if running else None,
+            "queued": [{"task_id": task.task_id, "position": self.get_position(task)} for task in queued]
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取队列深度、执行中任务数与排队等待时间统计"""
+        wait_times = list(self._wait_times)
+        waiting = [task.wait_time for queue in self._queues.values() for task in queue]
+        return {
+            "workers": self.workers,
+            "running": len(self._running),
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "queued_users": len(self._rotation),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "longest_waiting": round(max(waiting), 3) if waiting else None,
+            "mean_wait": round(statistics.mean(wait_times), 3) if wait_times else None,
+            "p95_wait": round(sorted(wait_times)[int(0.95 * (len(wait_times) - 1))], 3) if wait_times else None
+        }
+
+    def _iter_queue_order(self):
+        """按出队顺序遍历排队任务：每轮从每个可执行用户各取一个"""
+        queues = {user_id: list(self._queues[user_id]) for user_id in self._rotation}
+        # 已有任务在执行的用户要等当前任务结束，排在本轮其他用户之后
+        order = [user_id for user_id in queues if user_id not in self._running]
+        order += [user_id for user_id in queues if user_id in self._running]
+        depth = 0
+        while True:
+            emitted = False
+            for user_id in order:
+                if depth < len(queues[user_id]):
+                    emitted = True
+                    yield queues[user_id][depth]
+            if not emitted:
+                return
+            depth += 1
+
+    def _pop_next(self) -> Optional[QueuedTask]:
+        """按轮转顺序取出下一个可执行的任务（跳过已有任务在执行的用户）"""
+        for user_id in self._rotation:
+            if user_id in self._running:
+                continue
+            user_queue = self._queues[user_id]
+            queued_task = user_queue.popleft()
+            # 取出后该用户移到轮转末尾，队列为空时移出轮转
+            del self._rotation[user_id]
+            if user_queue:
+                self._rotation[user_id] = None
+            else:
+                del self._queues[user_id]
+            return queued_task
+        return None
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            async with self._condition:
+                queued_task = self._pop_next()
+                while queued_task is None:
+                    await self._condition.wait()
+                    queued_task = self._pop_next()
+                queued_task.started_at = time.monotonic()
+                self._running[queued_task.user_id] = queued_task
+
+            self._wait_times.append(queued_task.wait_time)
+            logger.info(
+                f"🚦 工作协程{index}开始执行任务 {queued_task.task_id}（用户 {queued_task.user_id}，"
+                f"排队 {queued_task.wait_time:.2f}s，剩余排队 {self.queue_depth}）"
+            )
+            await self._notify_positions()
+
+            # 任务在独立的asyncio任务中执行，取消任务时工作协程不受影响
+            runner = queued_task.runner or self.runner
+            queued_task.runner_task = asyncio.create_task(runner(queued_task.user_id, queued_task.user_input))
+            try:
+                await asyncio.wait({queued_task.runner_task})
+                if queued_task.runner_task.cancelled():
+                    self.cancelled += 1
+                elif queued_task.runner_task.exception():
+                    self.failed += 1
+                    logger.error(f"任务 {queued_task.task_id} 执行异常: {queued_task.runner_task.exception()}")
+                else:
+                    self.completed += 1
+            except asyncio.CancelledError:
+                queued_task.runner_task.cancel()
+                raise
+            finally:
+                self._running.pop(queued_task.user_id, None)
+                async with self._condition:
+                    # 该用户的下一个任务现在可以执行
+                    self._condition.notify_all()
+
+    async def _notify_positions(self) -> None:
+        """通知排队中的任务新的排队位置"""
+        if not self.on_queue_update:
+            return
+        for position, queued_task in enumerate(list(self._iter_queue_order()), 1):
+            try:
+                await self.on_queue_update(queued_task, position)
+            except Exception as e:
+                logger.warning(f"发送排队位置失败: {e}")
@@ -26,6 +26,7 @@ from core import (
     TaskExecutor, FileManager
 )
 from core.result_collector import ResultCollector
+from core.call_policy import task_deadline
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -194,8 +195,9 @@ class TerminalChatBot:
                     "type": "user"
                 })
                 
-                # 处理用户请求
-                await self._process_user_request(user_input)
+                # 处理用户请求，规划与执行共享同一个截止时间与重试预算
+                with task_deadline():
+                    await self._process_user_request(user_input)
                 
             except KeyboardInterrupt:
                 print("\n\n🛑 收到中断信号，正在退出...")
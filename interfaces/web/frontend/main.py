@@ -4,6 +4,7 @@ FastAPI Web应用 - 支持多用户的Manus AI系统前端
 """
 
 import asyncio
+import functools
 import json
 import logging
 import uuid
@@ -12,7 +13,7 @@ from typing import Dict, List, Optional, Any
 from pathlib import Path
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, HTTPException, Depends
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
@@ -28,12 +29,17 @@ project_root = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(project_root))
 
 # 正确导入项目模块
-from core import TaskPlanner, TaskExecutor, FileManager
+from core import TaskPlanner, TaskExecutor, FileManager, PacedEventListener, TaskScheduler, QueueFullError
+from core.execution_journal import JournalState
+from core.execution_context import ExecutionContext
 from core.models import TaskPlan, TaskStatus
+from core.call_policy import task_deadline
+from utils.tracing import task_trace, get_current_trace
 from core.result_collector import ResultCollector
+from config import settings
 from tools.tool_manager import ToolManager
 from communication.mcp_client import MultiMCPClient
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -109,7 +115,11 @@ async def lifespan(app: FastAPI):
     # 启动时初始化
     await initialize_components()
     yield
-    # 关闭时清理（如果需要）
+    # 关闭时停止任务调度；先关闭执行日志，被中断的任务保留为未完成，下次启动时恢复
+    if task_executor and task_executor.journal:
+        await task_executor.journal.close()
+    if task_scheduler:
+        await task_scheduler.stop()
 
 app = FastAPI(
     title="Manus AI System", 
@@ -129,6 +139,7 @@ task_planner = None
 task_executor = None
 result_collector = None
 file_manager = None
+task_scheduler = None
 
 # 用户会话管理
 user_sessions: Dict[str, UserSession] = {}
@@ -138,11 +149,11 @@ active_connections: Dict[str, WebSocket] = {}
 
 async def initialize_components():
     """初始化系统组件"""
-    global llm_client, tool_manager, task_planner, task_executor, result_collector, file_manager
+    global llm_client, tool_manager, task_planner, task_executor, result_collector, file_manager, task_scheduler
     
     try:
-        # 初始化LLM客户端
-        llm_client = OpenAI(
+        # 初始化LLM客户端（异步客户端，避免规划阶段阻塞事件循环）
+        llm_client = AsyncOpenAI(
             api_key="sk-proj-1234567890", 
             base_url="http://180.153.21.76:17009/v1"
         )
@@ -166,6 +177,19 @@ async def initialize_components():
         # 初始化结果收集器，传入file_manager
         result_collector = ResultCollector(file_manager=file_manager)
         
+        # 初始化任务调度器：有界队列 + 固定数量的工作协程，按用户轮转执行
+        task_scheduler = TaskScheduler(
+            execute_task_for_user,
+            workers=settings.TASK_WORKERS,
+            max_queue=settings.TASK_QUEUE_MAX,
+            max_queue_per_user=settings.TASK_QUEUE_MAX_PER_USER,
+            on_queue_update=notify_queue_position
+        )
+        await task_scheduler.start()
+        
+        # 恢复进程重启前未完成的任务
+        await resume_unfinished_tasks()
+        
         logger.info("所有组件初始化完成")
         
     except Exception as e:
@@ -398,6 +422,10 @@ async def download_file_by_task(task_id: str, file_name: str):
             logger.error(f"任务 {task_id} 中未找到文件: {file_name}")
             raise HTTPException(status_code=404, detail="文件不存在")
         
+        # 远程产出物（如生成的图片）跳转到资源地址
+        if found_file.get("remote"):
+            return RedirectResponse(found_file["url"])
+        
         file_path = found_file["file_path"]
         
         # 检查文件是否存在
@@ -437,6 +465,7 @@ async def get_user_files(user_id: str):
                     "path": file_info["file_path"],
                     "size": file_info["file_size"],
                     "type": file_info["file_type"],
+                    "url": file_info.get("url"),
                     "task_id": session.current_task.task_id,
                     "step_id": file_info.get("step_id"),
                     "description": file_info.get("description", ""),
@@ -450,12 +479,13 @@ async def get_user_files(user_id: str):
                 task_files = file_manager.get_task_files(message.task_id)
                 for file_info in task_files:
                     # 避免重复添加当前任务的文件
-                    if not any(f["path"] == file_info["file_path"] for f in files):
+                    if not any(f["path"] == file_info["file_path"] and f["url"] == file_info.get("url") for f in files):
                         files.append({
                             "name": file_info["file_name"],
                             "path": file_info["file_path"],
                             "size": file_info["file_size"],
                             "type": file_info["file_type"],
+                            "url": file_info.get("url"),
                             "task_id": message.task_id,
                             "step_id": file_info.get("step_id"),
                             "description": file_info.get("description", ""),
@@ -541,7 +571,12 @@ async def get_chat_history(user_id: str, limit: int = 50, offset: int = 0):
 
 @app.post("/api/task/submit")
 async def submit_task(task_request: TaskRequest):
-    """提交任务请求"""
+    """提交任务请求，队列已满时返回429"""
+    try:
+        queued_task = await task_scheduler.submit(task_request.user_id, task_request.user_input)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "10"})
+    
     try:
         session = get_or_create_user_session(task_request.user_id)
         
@@ -553,38 +588,67 @@ async def submit_task(task_request: TaskRequest):
         )
         session.add_message(user_message)
         
+        position = task_scheduler.get_position(queued_task)
+        if task_scheduler.is_waiting(queued_task):
+            await notify_queue_position(queued_task, position)
+            return {"status": "queued", "task_id": queued_task.task_id, "position": position,
+                    "message": f"任务已排队，当前第{position}位"}
+        
         # 向用户发送任务开始通知
         await manager.send_personal_message({
             "type": "task_start",
             "message": "正在分析您的任务..."
         }, task_request.user_id)
         
-        # 异步执行任务
-        asyncio.create_task(execute_task_for_user(task_request.user_id, task_request.user_input))
-        
-        return {"status": "success", "message": "任务已提交，正在处理..."}
+        return {"status": "success", "task_id": queued_task.task_id, "message": "任务已提交，正在处理..."}
         
     except Exception as e:
         logger.error(f"提交任务失败: {e}")
         return {"status": "error", "message": str(e)}
 
+@app.post("/api/task/cancel/{user_id}")
+async def cancel_task(user_id: str):
+    """取消用户执行中的任务，并移除其排队中的任务"""
+    result = await task_scheduler.cancel(user_id)
+    if not result["cancelled_task_id"] and not result["removed_queued"]:
+        return {"status": "no_task", "message": "当前没有可取消的任务"}
+    return {"status": "cancelled", "message": "任务已取消", **result}
+
 @app.get("/api/task/status/{user_id}")
 async def get_task_status(user_id: str):
     """获取用户当前任务状态"""
     session = get_or_create_user_session(user_id)
     
+    queue_status = task_scheduler.get_user_status(user_id) if task_scheduler else None
+    
     if not session.current_task:
+        if queue_status and queue_status["queued"]:
+            return {"status": "queued", "message": "任务排队中", "queue": queue_status}
         return {"status": "no_task", "message": "当前没有执行中的任务"}
     
     # 获取任务执行状态
-    execution_status = task_executor.get_execution_status()
+    execution_status = task_executor.get_execution_status(session.current_task.task_id)
     
     return {
         "status": "running" if session.current_task.status == TaskStatus.EXECUTING else session.current_task.status.value,
         "task_id": session.current_task.task_id,
         "task_type": session.current_task.task_type,
         "complexity_level": session.current_task.complexity_level,
-        "execution_status": execution_status
+        "execution_status": execution_status,
+        "queue": queue_status
+    }
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """获取系统运行指标（计划缓存与工具结果缓存命中率、节省的LLM时间、规划提示词token数、用户上下文占用、各类LLM调用延迟等）"""
+    return {
+        "plan_cache": task_planner.plan_cache.get_stats() if task_planner and task_planner.plan_cache else None,
+        "tool_cache": tool_manager.tool_cache.get_stats() if tool_manager and tool_manager.tool_cache else None,
+        "planning_prompts": task_planner.prompt_compiler.get_stats() if task_planner else None,
+        "user_context": task_planner.context_store.get_stats() if task_planner else None,
+        "model_routes": task_planner.llm.router.get_stats() if task_planner else None,
+        "llm_call_sites": task_planner.llm.policy.get_stats() if task_planner else None,
+        "task_queue": task_scheduler.get_stats() if task_scheduler else None
     }
 
 # ========== WebSocket端点 ==========
@@ -634,6 +698,20 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                 user_input = message_data.get("content", "")
                 if user_input.strip():
                     await submit_task_via_websocket(user_id, user_input)
+            elif message_data.get("type") == "task_cancel":
+                # 通过WebSocket取消任务
+                result = await task_scheduler.cancel(user_id)
+                if not result["cancelled_task_id"] and not result["removed_queued"]:
+                    await manager.send_personal_message({
+                        "type": "system",
+                        "message": "当前没有可取消的任务"
+                    }, user_id)
+                elif not result["cancelled_task_id"]:
+                    # 只移除了排队中的任务，执行中的任务不会再发送取消通知
+                    await manager.send_personal_message({
+                        "type": "task_cancelled",
+                        "message": f"🛑 已取消{len(result['removed_queued'])}个排队中的任务"
+                    }, user_id)
             
     except WebSocketDisconnect:
         manager.disconnect(user_id)
@@ -667,8 +745,18 @@ async def submit_task_via_websocket(user_id: str, user_input: str):
             }
         }, user_id)
         
-        # 执行任务
-        await execute_task_for_user(user_id, user_input)
+        # 提交到任务队列，不在WebSocket接收循环中等待执行
+        try:
+            queued_task = await task_scheduler.submit(user_id, user_input)
+        except QueueFullError as e:
+            await manager.send_personal_message({
+                "type": "task_rejected",
+                "message": f"⏳ 系统繁忙：{e}"
+            }, user_id)
+            return
+        
+        if task_scheduler.is_waiting(queued_task):
+            await notify_queue_position(queued_task, task_scheduler.get_position(queued_task))
         
     except Exception as e:
         logger.error(f"WebSocket任务提交失败: {e}")
@@ -677,8 +765,42 @@ async def submit_task_via_websocket(user_id: str, user_input: str):
             "message": f"任务提交失败: {str(e)}"
         }, user_id)
 
-async def execute_task_for_user(user_id: str, user_input: str):
-    """为用户执行任务"""
+async def notify_queue_position(queued_task, position: int):
+    """通知用户任务的排队位置"""
+    await manager.send_personal_message({
+        "type": "task_queued",
+        "task_id": queued_task.task_id,
+        "position": position,
+        "message": f"任务排队中，当前第{position}位"
+    }, queued_task.user_id)
+
+async def resume_unfinished_tasks():
+    """将进程重启前未完成的任务重新提交到任务队列，从执行日志中最后完成的步骤继续执行"""
+    if not task_executor or not task_executor.journal:
+        return
+    for journal_state in task_executor.journal.find_unfinished():
+        task_plan = journal_state.task_plan
+        try:
+            await task_scheduler.submit(
+                journal_state.user_id, task_plan.user_input,
+                runner=functools.partial(execute_task_for_user, resume_state=journal_state)
+            )
+            logger.info(f"♻️ 已提交恢复任务: {task_plan.task_id}（用户 {journal_state.user_id}）")
+        except QueueFullError as e:
+            logger.warning(f"恢复任务 {task_plan.task_id} 提交失败，下次启动时重试: {e}")
+
+async def execute_task_for_user(user_id: str, user_input: str, resume_state: Optional[JournalState] = None):
+    """
+    为用户执行任务，规划与执行中的LLM调用和工具调用共享同一个截止时间与重试预算；
+    启用追踪时任务结束后在settings.TRACE_DIR写出该任务的耗时区间
+    """
+    task_id = resume_state.task_plan.task_id if resume_state else None
+    with task_deadline(settings.TASK_DEADLINE, settings.TASK_RETRY_BUDGET), \
+            task_trace(settings.TRACE_DIR, settings.TRACE_ENABLED, task_id=task_id, user_id=user_id):
+        await _execute_task_for_user(user_id, user_input, resume_state)
+
+async def _execute_task_for_user(user_id: str, user_input: str, resume_state: Optional[JournalState] = None):
+    """为用户执行任务，resume_state不为空时跳过规划，从执行日志恢复中断的任务"""
     session = get_or_create_user_session(user_id)
     
     # 创建流式输出回调函数
@@ -693,6 +815,22 @@ async def execute_task_for_user(user_id: str, user_input: str):
         except Exception as e:
             logger.error(f"发送流式输出失败: {e}")
     
+    # 对话回复逐段发送，前端在同一个消息气泡中追加显示
+    conversation_streamed = False
+    
+    async def conversation_delta_callback(delta: str):
+        """将对话回复片段发送到前端"""
+        nonlocal conversation_streamed
+        conversation_streamed = True
+        try:
+            await manager.send_personal_message({
+                "type": "conversation_delta",
+                "delta": delta,
+                "timestamp": datetime.now().isoformat()
+            }, user_id)
+        except Exception as e:
+            logger.error(f"发送对话回复片段失败: {e}")
+    
     # 创建任务特定的事件监听器
     async def task_event_listener(event):
         """任务事件监听器，将事件转发给前端"""
@@ -776,11 +914,12 @@ async def execute_task_for_user(user_id: str, user_input: str):
             
             elif event_type == "plan_step_generated":
                 step_index = data.get('step_index', 0)
-                total_steps = data.get('total_steps', 0)
+                total_steps = data.get('total_steps')
                 step_desc = data.get('step_description', '')
+                progress = f"{step_index + 1}/{total_steps}" if total_steps else f"{step_index + 1}"
                 await manager.send_personal_message({
                     "type": "task_progress",
-                    "message": f"生成步骤 {step_index + 1}/{total_steps}: {step_desc}",
+                    "message": f"生成步骤 {progress}: {step_desc}",
                     "stage": "planning"
                 }, user_id)
             
@@ -843,34 +982,51 @@ async def execute_task_for_user(user_id: str, user_input: str):
         except Exception as e:
             logger.error(f"事件监听器错误: {e}")
     
+    # 展示节奏控制：事件按显示间隔推送到前端，规划和执行流程本身不等待；
+    # 流式文本经同一队列发送，与进度事件保持先后顺序
+    paced_listener = PacedEventListener(task_event_listener)
+    
+    # 本次任务的执行上下文：事件与流式输出只发送给该用户，多个用户的任务并发执行互不干扰
+    context = ExecutionContext(user_id, listeners=[paced_listener],
+                               stream_callback=paced_listener.wrap_stream(stream_output_callback))
+    context_token = context.attach()
+    
     try:
-        # 设置流式输出回调
-        if task_planner:
-            task_planner.set_stream_callback(stream_output_callback)
-        
-        # 清除之前的事件监听器（避免重复注册）
-        if task_planner and hasattr(task_planner, 'event_emitter') and task_planner.event_emitter:
-            # 清除之前的监听器
-            task_planner.event_emitter.listeners = []
-            task_planner.event_emitter.add_listener(task_event_listener)
-        
-        if task_executor and hasattr(task_executor, 'event_emitter') and task_executor.event_emitter:
-            # 清除之前的监听器 
-            task_executor.event_emitter.listeners = []
-            task_executor.event_emitter.add_listener(task_event_listener)
-        
-        # 任务分析阶段
-        await manager.send_personal_message({
-            "type": "task_progress",
-            "message": "正在分析任务需求...",
-            "stage": "analyzing"
-        }, user_id)
-        
-        task_plan = await task_planner.analyze_task(user_input)
+        if resume_state is not None:
+            # 进程重启前未完成的任务：计划与已完成步骤的结果来自执行日志，只执行剩余步骤
+            await manager.send_personal_message({
+                "type": "task_progress",
+                "message": "正在恢复中断的任务...",
+                "stage": "executing"
+            }, user_id)
+            task_plan = resume_state.task_plan
+            execution_result = await task_executor.resume_plan(resume_state)
+        else:
+            # 任务分析阶段
+            await manager.send_personal_message({
+                "type": "task_progress",
+                "message": "正在分析任务需求...",
+                "stage": "analyzing"
+            }, user_id)
+            
+            if settings.EXECUTION_MODE == "pipelined":
+                # 流水线模式：规划过程中每解析出一个步骤就立即执行
+                task_plan, execution_result = await task_executor.execute_streaming_plan(
+                    user_input, task_planner, user_id, on_conversation_delta=conversation_delta_callback
+                )
+            else:
+                task_plan = await task_planner.analyze_task(
+                    user_input, user_id=user_id, on_conversation_delta=conversation_delta_callback
+                )
+                execution_result = None
         session.current_task = task_plan
+        trace = get_current_trace()
+        if trace:
+            trace.task_id = task_plan.task_id
         
         # 检查是否需要澄清
         if task_plan.requires_clarification:
+            await paced_listener.finish()
             clarification_message = "需要您澄清以下问题：\n" + "\n".join([f"• {q}" for q in task_plan.clarification_questions])
             
             assistant_message = ChatMessage(
@@ -912,20 +1068,22 @@ async def execute_task_for_user(user_id: str, user_input: str):
             }
         }, user_id)
         
-        # 执行阶段
-        await manager.send_personal_message({
-            "type": "task_progress",
-            "message": "开始执行任务...",
-            "stage": "executing"
-        }, user_id)
-        
-        execution_result = await task_executor.execute_plan(task_plan, user_id)
+        # 执行阶段（流水线模式下已在规划过程中执行完毕）
+        if execution_result is None:
+            await manager.send_personal_message({
+                "type": "task_progress",
+                "message": "开始执行任务...",
+                "stage": "executing"
+            }, user_id)
+            
+            execution_result = await task_executor.execute_plan(task_plan, user_id)
         
         # 检查是否为对话类型，如果是则直接处理回复
         if getattr(task_plan, 'is_conversation', False):
             logger.info("💬 对话类型任务，直接发送回复")
             
             # 从执行结果中获取对话回复
+            await paced_listener.finish()
             if execution_result.success and execution_result.results:
                 for result in execution_result.results:
                     if result.get("function_name") == "chat_response":
@@ -947,7 +1105,9 @@ async def execute_task_for_user(user_id: str, user_input: str):
                                 "content": response_content,
                                 "timestamp": assistant_message.timestamp.isoformat(),
                                 "message_type": "conversation"
-                            }
+                            },
+                            # 已逐段发送过时前端只需结束流式气泡，不再重复添加消息
+                            "streamed": conversation_streamed
                         }, user_id)
                         
                         # 清除当前任务并返回，不生成报告
@@ -984,6 +1144,9 @@ async def execute_task_for_user(user_id: str, user_input: str):
         # 获取任务文件摘要
         task_files_summary = file_manager.get_task_summary(task_plan.task_id)
         
+        # 任务已结束：剩余进度事件立即投递（不再按显示间隔等待），保证其先于结果消息到达前端
+        await paced_listener.finish()
+        
         # 生成结果消息
         if execution_result.success:
             result_message = f"✅ 任务执行成功！\n"
@@ -993,7 +1156,10 @@ async def execute_task_for_user(user_id: str, user_input: str):
             if task_files_summary.get("file_count", 0) > 0:
                 result_message += f"生成文件：{task_files_summary['file_count']}个\n"
                 for file_info in task_files_summary.get("files", []):
-                    result_message += f"• {file_info['name']} ({file_info['type']}, {file_info['size']} bytes)\n"
+                    if file_info.get("url"):
+                        result_message += f"• {file_info['name']} ({file_info['type']}, {file_info['url']})\n"
+                    else:
+                        result_message += f"• {file_info['name']} ({file_info['type']}, {file_info['size']} bytes)\n"
                 result_message += f"\n📁 下载包：/api/files/download_package/{task_plan.task_id}?user_id={user_id}\n"
             elif execution_result.files_generated:
                 # 备用：显示执行结果中的文件
@@ -1036,6 +1202,8 @@ async def execute_task_for_user(user_id: str, user_input: str):
             "type": "task_complete",
             "success": execution_result.success,
             "execution_time": execution_result.execution_time,
+            "wall_clock_time": execution_result.wall_clock_time,
+            "sequential_time": execution_result.sequential_time,
             "files_generated": execution_result.files_generated,
             "task_id": task_plan.task_id,
             "files_summary": task_files_summary
@@ -1045,12 +1213,33 @@ async def execute_task_for_user(user_id: str, user_input: str):
         if execution_result.success and task_planner:
             # 将生成的文件信息添加到task_plan中
             task_plan.generated_files = execution_result.files_generated
-            task_planner.set_last_completed_task(task_plan)
+            task_planner.set_last_completed_task(task_plan, user_id)
             logger.info(f"✅ 已设置最后完成的任务: {task_plan.task_id}")
         
         # 清除当前任务
         session.current_task = None
         
+    except asyncio.CancelledError:
+        logger.info(f"🛑 用户 {user_id} 的任务已取消")
+        if session.current_task:
+            session.current_task.status = TaskStatus.CANCELLED
+        session.current_task = None
+        
+        cancel_message = "🛑 任务已取消"
+        assistant_message = ChatMessage(
+            sender="assistant",
+            content=cancel_message,
+            message_type="system"
+        )
+        session.add_message(assistant_message)
+        
+        await paced_listener.finish()
+        await manager.send_personal_message({
+            "type": "task_cancelled",
+            "message": cancel_message
+        }, user_id)
+        raise
+        
     except Exception as e:
         logger.error(f"执行任务失败: {e}")
         
@@ -1083,15 +1272,9 @@ async def execute_task_for_user(user_id: str, user_input: str):
         logger.error(traceback.format_exc())
     
     finally:
-        # 清理流式输出回调和事件监听器
-        if task_planner:
-            task_planner.set_stream_callback(None)
-            if hasattr(task_planner, 'event_emitter') and task_planner.event_emitter:
-                task_planner.event_emitter.listeners = []
-        
-        if task_executor:
-            if hasattr(task_executor, 'event_emitter') and task_executor.event_emitter:
-                task_executor.event_emitter.listeners = []
+        # 投递剩余的进度事件，再退出执行上下文
+        await paced_listener.close()
+        context.detach(context_token)
 
 # ========== 运行应用 ==========
 
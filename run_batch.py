@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量任务执行脚本
+无终端/Web界面，按JSONL文件批量执行任务（夜间批处理、容量评估）：
+固定数量的工作协程并发执行，整个批次共用一组LLM客户端、MCP客户端与工具管理器，
+每个任务完成后追加写入 results.jsonl，结束时写出吞吐量与延迟分位的 summary.json
+
+输入文件每行一个JSON对象：
+    {"id": "q1", "user_input": "帮我搜索今天的AI新闻并生成摘要", "user_id": "可选，默认每行一个独立用户"}
+
+用法：
+    python run_batch.py tasks.jsonl
+    python run_batch.py tasks.jsonl --concurrency 8 --output execution_results/batch/nightly
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from openai import AsyncOpenAI
+
+from config import settings
+from communication.mcp_client import MultiMCPClient
+from tools.tool_manager import ToolManager
+from core import (
+    TaskPlanner, TaskExecutor, FileManager, ExecutionEventEmitter, ExecutionJournal,
+    execution_context, task_deadline, task_trace, get_call_policy, get_model_router
+)
+from core.result_collector import ResultCollector
+
+logger = logging.getLogger(__name__)
+
+# 计入成功的任务状态（需要澄清的任务没有执行，单独统计）
+_SUCCESS_STATUSES = {"completed", "conversation"}
+
+
+async def _discard_stream(message: str) -> None:
+    """规划过程中的流式文本在批量执行时不输出"""
+
+
+def load_items(input_file: str) -> List[Dict[str, Any]]:
+    """
+    读取JSONL任务文件
+
+    Returns:
+        List[Dict]: 任务列表（含行号index），无法解析或缺少user_input的行跳过
+    """
+    items = []
+    with open(input_file, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"第{line_number}行不是有效的JSON，跳过: {e}")
+                continue
+            if not isinstance(item, dict) or not str(item.get("user_input", "")).strip():
+                logger.warning(f"第{line_number}行缺少user_input，跳过")
+                continue
+            item_id = str(item.get("id", line_number))
+            items.append({
+                "index": line_number,
+                "id": item_id,
+                "user_input": str(item["user_input"]),
+                "user_id": str(item.get("user_id") or f"batch-{item_id}")
+            })
+    return items
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """最近秩分位数，没有样本时返回None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def describe_latencies(values: List[float]) -> Dict[str, Any]:
+    """延迟分布(秒)"""
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(statistics.mean(values), 3),
+        "p50": round(percentile(values, 50), 3),
+        "p90": round(percentile(values, 90), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(max(values), 3)
+    }
+
+
+class BatchRunner:
+    """批量任务执行器 - 共用一组客户端与组件，固定数量的工作协程并发执行任务"""
+
+    def __init__(self, output_dir: str, concurrency: int = 4, save_reports: bool = True):
+        """
+        初始化批量执行器
+
+        Args:
+            output_dir: 输出目录，写入results.jsonl、summary.json以及任务生成的文件与报告
+            concurrency: 同时执行的任务数
+            save_reports: 是否为每个任务保存执行报告
+        """
+        self.output_dir = Path(output_dir)
+        self.concurrency = max(1, concurrency)
+        self.save_reports = save_reports
+        self.results_file = self.output_dir / "results.jsonl"
+        self.summary_file = self.output_dir / "summary.json"
+
+        self.tool_manager: Optional[ToolManager] = None
+        self.task_planner: Optional[TaskPlanner] = None
+        self.task_executor: Optional[TaskExecutor] = None
+        self.result_collector: Optional[ResultCollector] = None
+        self.file_manager: Optional[FileManager] = None
+
+        self._records: List[Dict[str, Any]] = []
+        # 同一用户的任务按输入顺序依次执行（改进请求依赖该用户上一个完成的任务）
+        self._user_locks: Dict[str, asyncio.Lock] = {}
+
+    async def initialize(self, api_key: str, base_url: str) -> None:
+        """创建整个批次共用的LLM客户端、MCP客户端与各组件"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        # 一个AsyncOpenAI客户端（内部连接池）供所有任务的LLM调用复用
+        llm_client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+        self.tool_manager = ToolManager(MultiMCPClient())
+        await self.tool_manager.load_all_tools()
+
+        self.file_manager = FileManager(str(self.output_dir / "task_files"))
+        event_emitter = ExecutionEventEmitter(print_events=False)
+        self.task_planner = TaskPlanner(llm_client, self.tool_manager, event_emitter=event_emitter)
+        # 执行日志写在批次目录中，不会被Web服务启动时当作未完成任务恢复
+        journal = None
+        if settings.EXECUTION_JOURNAL_ENABLED:
+            journal = ExecutionJournal(
+                str(self.output_dir / "journal"),
+                fsync=settings.EXECUTION_JOURNAL_FSYNC,
+                archive_ttl=settings.EXECUTION_JOURNAL_ARCHIVE_TTL,
+                archive_max_entries=settings.EXECUTION_JOURNAL_ARCHIVE_MAX_ENTRIES
+            )
+        self.task_executor = TaskExecutor(self.tool_manager, self.file_manager, event_emitter, journal=journal)
+        self.result_collector = ResultCollector(storage_dir=str(self.output_dir), file_manager=self.file_manager)
+
+    async def run(self, items: List[Dict[str, Any]], input_file: str = "") -> Dict[str, Any]:
+        """
+        执行全部任务
+
+        Returns:
+            Dict: 批次汇总（同时写入summary.json）
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+
+        started_at = datetime.now()
+        start_time = time.perf_counter()
+        workers = [asyncio.create_task(self._worker(queue, len(items))) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            if self.task_executor.journal:
+                # 执行日志在后台写入，退出前写完已提交的记录
+                await self.task_executor.journal.flush()
+            # 中断时同样写出已完成任务的汇总
+            summary = self._summarize(input_file, len(items), started_at, time.perf_counter() - start_time)
+            with open(self.summary_file, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+        return summary
+
+    async def _worker(self, queue: asyncio.Queue, total: int) -> None:
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            lock = self._user_locks.setdefault(item["user_id"], asyncio.Lock())
+            async with lock:
+                record = await self._run_item(item)
+            self._records.append(record)
+            self._write_record(record)
+            print(f"[{len(self._records)}/{total}] {record['id']} {record['status']} {record['total_time']:.2f}s",
+                  flush=True)
+
+    async def _run_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """执行单个任务：规划 → 执行 → 收集结果并保存报告"""
+        record = {
+            "index": item["index"],
+            "id": item["id"],
+            "user_id": item["user_id"],
+            "user_input": item["user_input"],
+            "task_id": None,
+            "status": "error",
+            "planning_time": None,
+            "execution_time": None,
+            "total_time": 0.0,
+            "steps": 0,
+            "files_generated": [],
+            "report": None,
+            "error": None
+        }
+        user_id = item["user_id"]
+        start_time = time.perf_counter()
+        try:
+            with task_deadline(settings.TASK_DEADLINE, settings.TASK_RETRY_BUDGET), \
+                    task_trace(settings.TRACE_DIR, settings.TRACE_ENABLED, user_id=user_id, batch_item=item["id"]) as trace, \
+                    execution_context(user_id, stream_callback=_discard_stream):
+                if settings.EXECUTION_MODE == "pipelined":
+                    # 流水线模式下规划与执行重叠，不单独统计规划耗时
+                    task_plan, execution_result = await self.task_executor.execute_streaming_plan(
+                        item["user_input"], self.task_planner, user_id
+                    )
+                else:
+                    task_plan = await self.task_planner.analyze_task(item["user_input"], user_id=user_id)
+                    record["planning_time"] = round(time.perf_counter() - start_time, 3)
+                    execution_result = None
+                record["task_id"] = task_plan.task_id
+                record["steps"] = len(task_plan.plan.steps)
+                if trace:
+                    trace.task_id = task_plan.task_id
+
+                if task_plan.requires_clarification:
+                    record["status"] = "clarification"
+                    record["clarification_questions"] = task_plan.clarification_questions
+                    return record
+
+                if execution_result is None:
+                    execution_started = time.perf_counter()
+                    execution_result = await self.task_executor.execute_plan(task_plan, user_id)
+                    record["execution_time"] = round(time.perf_counter() - execution_started, 3)
+                record["files_generated"] = execution_result.files_generated
+                record["error"] = execution_result.error_message
+
+                if task_plan.is_conversation:
+                    record["status"] = "conversation" if execution_result.success else "failed"
+                    return record
+
+                record["status"] = "completed" if execution_result.success else "failed"
+                if self.save_reports:
+                    report = await self.result_collector.collect_and_format_result(execution_result, task_plan)
+                    saved_files = await self.result_collector.save_report(report, ['json'], self.file_manager)
+                    record["report"] = saved_files.get("json")
+                if execution_result.success:
+                    task_plan.generated_files = execution_result.files_generated
+                    self.task_planner.set_last_completed_task(task_plan, user_id)
+                return record
+        except Exception as e:
+            logger.error(f"批量任务 {item['id']} 执行失败: {e}")
+            record["status"] = "error"
+            record["error"] = f"{type(e).__name__}: {e}"
+            return record
+        finally:
+            record["total_time"] = round(time.perf_counter() - start_time, 3)
+
+    def _write_record(self, record: Dict[str, Any]) -> None:
+        """追加写入单个任务的结果，批次中断时已完成的结果不丢失"""
+        with open(self.results_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    def _summarize(self, input_file: str, total: int, started_at: datetime, wall_time: float) -> Dict[str, Any]:
+        """汇总吞吐量、延迟分位与LLM/工具调用统计"""
+        records = list(self._records)
+        status_counts = Counter(record["status"] for record in records)
+        succeeded = sum(status_counts[status] for status in _SUCCESS_STATUSES)
+        return {
+            "input_file": input_file,
+            "started_at": started_at.isoformat(),
+            "finished_at": datetime.now().isoformat(),
+            "concurrency": self.concurrency,
+            "execution_mode": settings.EXECUTION_MODE,
+            "total": total,
+            "finished": len(records),
+            "succeeded": succeeded,
+            "status_counts": dict(status_counts),
+            "wall_time": round(wall_time, 3),
+            "throughput_per_minute": round(len(records) / wall_time * 60, 2) if wall_time > 0 else None,
+            "latency": {
+                "total": describe_latencies([record["total_time"] for record in records]),
+                "planning": describe_latencies([record["planning_time"] for record in records
+                                                if record["planning_time"] is not None]),
+                "execution": describe_latencies([record["execution_time"] for record in records
+                                                 if record["execution_time"] is not None])
+            },
+            "llm_routes": get_model_router().get_stats(),
+            "llm_call_sites": get_call_policy().get_stats(),
+            "tool_cache": self.tool_manager.tool_cache.get_stats() if self.tool_manager and self.tool_manager.tool_cache else None
+        }
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    total_latency = summary["latency"]["total"]
+    print("=" * 60)
+    print(f"完成任务: {summary['finished']}/{summary['total']}，成功: {summary['succeeded']}，状态: {summary['status_counts']}")
+    print(f"总耗时: {summary['wall_time']:.2f}s，吞吐量: {summary['throughput_per_minute']} 任务/分钟")
+    if total_latency.get("count"):
+        print(f"任务延迟: p50 {total_latency['p50']}s，p95 {total_latency['p95']}s，"
+              f"p99 {total_latency['p99']}s，最大 {total_latency['max']}s")
+    print("=" * 60)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="无界面批量执行JSONL任务文件")
+    parser.add_argument("input_file", help="JSONL任务文件，每行包含user_input，可选id与user_id")
+    parser.add_argument("--concurrency", type=int, default=settings.TASK_WORKERS, help="同时执行的任务数")
+    parser.add_argument("--output", default="",
+                        help="输出目录，默认 execution_results/batch/<时间戳>")
+    parser.add_argument("--no-reports", action="store_true", help="不为每个任务保存执行报告")
+    parser.add_argument("--api-key", default=os.getenv("DEFAULT_API_KEY", "sk-proj-1234567890"), help="LLM API Key")
+    parser.add_argument("--base-url", default=os.getenv("DEFAULT_BASE_URL", "http://180.153.21.76:17009/v1"),
+                        help="LLM服务地址")
+    parser.add_argument("--log-level", default="WARNING", help="日志级别")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s - %(levelname)s - %(message)s')
+
+    items = load_items(args.input_file)
+    if not items:
+        print("❌ 任务文件中没有可执行的任务")
+        return
+    output_dir = args.output or str(
+        project_root / "execution_results" / "batch" / datetime.now().strftime("%Y%m%d_%H%M%S")
+    )
+
+    runner = BatchRunner(output_dir, concurrency=args.concurrency, save_reports=not args.no_reports)
+    await runner.initialize(args.api_key, args.base_url)
+    print(f"🚀 开始批量执行 {len(items)} 个任务，并发: {runner.concurrency}，输出目录: {output_dir}")
+    summary = await runner.run(items, args.input_file)
+    print_summary(summary)
+    print(f"📋 结果: {runner.results_file}\n📊 汇总: {runner.summary_file}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地对话分类器基准测试
+基于 execution_results/reports 中的历史输入评估本地分类器的准确率、覆盖率与延迟，
+并检查"问候/感谢+任务"的混合输入没有被判为对话，可选与LLM对话检测对比
+
+用法：
+    python scripts/benchmark_conversation_classifier.py
+    python scripts/benchmark_conversation_classifier.py --with-llm --base-url http://host:port/v1 --api-key sk-xxx
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from core.conversation_classifier import (
+    CONVERSATION, SEED_EXAMPLES, ConversationClassifier, load_report_samples
+)
+
+REPORTS_DIR = str(project_root / "execution_results" / "reports")
+
+# 问候/感谢与任务混合的输入，全部应判为任务（或交由LLM判断），任何一条判为对话都不能默认启用本地分类器
+MIXED_INPUTS = [
+    "你能帮我写个爬虫吗", "早上好，请搜索最新新闻", "谢谢你的帮助，再生成一份周报", "thanks! now generate a report",
+    "你好，帮我分析一下这份数据", "晚上好，画一个柱状图", "hi, can you search for python tutorials",
+    "好的谢谢，再把它转换成PDF", "辛苦了，顺便总结一下这篇文章", "hello, please write a poem about spring",
+]
+
+
+def percentile(values: list, pct: float) -> float:
+    """计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def load_report_inputs() -> list:
+    """加载全部报告中的用户输入（不去重，按实际请求分布统计）"""
+    inputs = []
+    for report_file in sorted(glob.glob(str(Path(REPORTS_DIR) / "*.json"))):
+        try:
+            with open(report_file, "r", encoding="utf-8") as f:
+                inputs.append(json.load(f)["task_info"]["user_input"])
+        except (OSError, KeyError, json.JSONDecodeError):
+            continue
+    return inputs
+
+
+def evaluate_leave_one_out(samples: list, threshold: float) -> dict:
+    """留一法评估：每条输入用种子样本与其余报告样本训练的分类器判断"""
+    answered = correct = 0
+    for i, (text, label) in enumerate(samples):
+        classifier = ConversationClassifier(threshold=threshold).fit(SEED_EXAMPLES + samples[:i] + samples[i + 1:])
+        result = classifier.classify(text)
+        if result is None:
+            continue
+        answered += 1
+        correct += int(result == (label == CONVERSATION))
+    total = len(samples)
+    return {
+        "samples": total,
+        "coverage": answered / total if total else 0.0,
+        "accuracy": correct / answered if answered else 0.0
+    }
+
+
+def evaluate_mixed(classifier: ConversationClassifier) -> list:
+    """返回被误判为对话的混合输入"""
+    return [text for text in MIXED_INPUTS if classifier.classify(text) is True]
+
+
+def measure_latency(classifier: ConversationClassifier, inputs: list, repeat: int) -> dict:
+    """测量本地分类延迟（微秒）"""
+    latencies = []
+    for _ in range(repeat):
+        for text in inputs:
+            start_time = time.perf_counter()
+            classifier.classify(text)
+            latencies.append((time.perf_counter() - start_time) * 1e6)
+    return {
+        "mean_us": statistics.mean(latencies) if latencies else 0.0,
+        "p50_us": percentile(latencies, 50),
+        "p99_us": percentile(latencies, 99)
+    }
+
+
+async def evaluate_llm(samples: list, base_url: str, api_key: str, model_name: str) -> dict:
+    """评估LLM对话检测的准确率与延迟"""
+    from openai import AsyncOpenAI
+    from core.task_planner import TaskPlanner
+
+    planner = TaskPlanner(AsyncOpenAI(api_key=api_key, base_url=base_url), tool_manager=None, model_name=model_name)
+    planner.conversation_classifier = None
+
+    latencies = []
+    correct = 0
+    for text, label in samples:
+        start_time = time.perf_counter()
+        result = await planner._detect_conversation(text)
+        latencies.append(time.perf_counter() - start_time)
+        correct += int(result == (label == CONVERSATION))
+    return {
+        "accuracy": correct / len(samples) if samples else 0.0,
+        "mean_latency": statistics.mean(latencies) if latencies else 0.0,
+        "p50_latency": percentile(latencies, 50)
+    }
+
+
+async def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="本地对话分类器基准测试")
+    parser.add_argument("--threshold", type=float, default=0.99, help="置信度阈值")
+    parser.add_argument("--repeat", type=int, default=100, help="延迟测量重复次数")
+    parser.add_argument("--with-llm", action="store_true", help="同时评估LLM对话检测")
+    parser.add_argument("--base-url", default="http://180.153.21.76:17009/v1", help="LLM服务地址")
+    parser.add_argument("--api-key", default="sk-proj-1234567890", help="LLM服务API Key")
+    parser.add_argument("--model", default="Qwen-72B", help="模型名称")
+    args = parser.parse_args()
+
+    samples = load_report_samples(REPORTS_DIR)
+    inputs = load_report_inputs()
+    print(f"📊 对话分类基准测试：{len(inputs)} 份报告，{len(samples)} 条去重输入，阈值 {args.threshold}")
+
+    loo = evaluate_leave_one_out(samples, args.threshold)
+    print("\n本地分类器（留一法）")
+    print(f"  覆盖率: {loo['coverage']:.1%}（其余交由LLM判断）")
+    print(f"  本地判定准确率: {loo['accuracy']:.1%}")
+
+    classifier = ConversationClassifier.from_reports(REPORTS_DIR, threshold=args.threshold)
+    misjudged = evaluate_mixed(classifier)
+    print(f"  混合输入误判为对话: {len(misjudged)}/{len(MIXED_INPUTS)}" + (f" {misjudged}" if misjudged else ""))
+    latency = measure_latency(classifier, inputs, args.repeat)
+    print(f"  延迟: 平均 {latency['mean_us']:.1f}μs，P50 {latency['p50_us']:.1f}μs，P99 {latency['p99_us']:.1f}μs")
+
+    if args.with_llm:
+        llm = await evaluate_llm(samples, args.base_url, args.api_key, args.model)
+        print("\nLLM对话检测")
+        print(f"  准确率: {llm['accuracy']:.1%}")
+        print(f"  延迟: 平均 {llm['mean_latency']:.3f}s，P50 {llm['p50_latency']:.3f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
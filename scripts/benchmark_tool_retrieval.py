@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+工具检索基准测试
+在 10/50/200 个工具的模拟工具清单上对比全量工具与检索后（核心工具+Top-K）的规划提示词token数，
+并统计检索召回率与索引构建/检索延迟
+
+用法：
+    python scripts/benchmark_tool_retrieval.py
+    python scripts/benchmark_tool_retrieval.py --sizes 10 50 200 --top-k 5
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from core.prompt_compiler import PromptCompiler, estimate_tokens
+from core.task_planner import IMPROVEMENT_SYSTEM_PROMPT, PLAN_SYSTEM_PROMPT
+from tools.tool_manager import ToolManager
+
+# 与MCP服务器一致的真实工具
+REAL_TOOLS = [
+    ("web_search_tool", "使用searxng搜索网络信息，获取最新资讯和相关页面", ["query"]),
+    ("read_file_tool", "读取各种类型的文件内容，支持txt、pdf、docx、xlsx、图片等格式", ["file_path"]),
+    ("file_generation_tool", "根据提示词生成各种类型的文件，如txt、py、html、md、json等",
+     ["prompt", "file_type", "file_name", "output_dir"]),
+    ("image_generation_tool", "根据文本描述生成图片，支持各种尺寸和风格", ["prompt", "negative_prompt", "size", "n"]),
+    ("data_chart_tool", "根据数据描述生成图表", ["data_description", "chart_type"]),
+    ("generate_answer_tool", "使用AI大模型回答用户问题，进行文本分析、总结、翻译、解释等", ["query"]),
+    ("rhetorical_reason", "如果用户问题需要追问，才可以更好的解决用户问题，则调用该工具", ["user_query"]),
+]
+
+# 模拟工具：领域 x 操作
+DOMAINS = [
+    ("email", "邮件"), ("calendar", "日历日程"), ("weather", "天气预报"), ("stock", "股票行情"),
+    ("translate", "多语言翻译"), ("database", "数据库表"), ("map", "地图路线"), ("music", "音乐歌曲"),
+    ("video", "视频剪辑"), ("git", "代码仓库"), ("invoice", "发票报销"), ("contract", "合同文档"),
+    ("flight", "航班机票"), ("hotel", "酒店预订"), ("express", "快递物流"), ("recipe", "菜谱食谱"),
+    ("fitness", "健身运动"), ("news", "新闻资讯"), ("exchange", "汇率换算"), ("ocr", "图片文字识别"),
+    ("speech", "语音转写"), ("pdf", "PDF页面"), ("spreadsheet", "表格单元格"), ("slides", "幻灯片演示"),
+    ("crm", "客户关系"), ("hr", "员工考勤"), ("ticket", "工单故障"), ("monitor", "服务器监控"),
+    ("dns", "域名解析"), ("sms", "短信通知"), ("payment", "支付订单"), ("coupon", "优惠券营销"),
+    ("survey", "问卷调查"), ("wiki", "知识库词条"), ("course", "课程学习"), ("exam", "考试题库"),
+    ("patent", "专利检索"), ("law", "法律条文"), ("medical", "医疗健康"), ("car", "车辆违章"),
+]
+ACTIONS = [
+    ("query", "查询"), ("create", "创建"), ("update", "更新"), ("delete", "删除"), ("export", "导出"),
+]
+
+# 检索样例：(用户输入, 期望被检索到的非核心工具)
+SAMPLE_QUERIES = [
+    ("帮我查询明天上海的天气预报", "weather_query_tool"),
+    ("把这份合同文档导出一份", "contract_export_tool"),
+    ("给客户发一封邮件", "email_create_tool"),
+    ("查一下今天的股票行情", "stock_query_tool"),
+    ("预订下周去北京的航班机票", "flight_create_tool"),
+    ("删除日历里明天的日程", "calendar_delete_tool"),
+    ("根据销售数据画一个柱状图", "data_chart_tool"),
+    ("识别这张图片里的文字", "ocr_query_tool"),
+]
+
+
+def make_tool(name: str, description: str, arg_names: list) -> SimpleNamespace:
+    """构造与MCP工具结构一致的模拟工具（name/description/args）"""
+    args = {arg: {"title": arg.replace("_", " ").title(), "type": "string"} for arg in arg_names}
+    return SimpleNamespace(name=name, description=description, args=args)
+
+
+def build_catalog(size: int) -> list:
+    """构造指定数量的工具清单：真实工具在前，其余为模拟工具"""
+    tools = [make_tool(*tool) for tool in REAL_TOOLS]
+    for domain, domain_cn in DOMAINS:
+        for action, action_cn in ACTIONS:
+            if len(tools) >= size:
+                return tools
+            tools.append(make_tool(
+                f"{domain}_{action}_tool",
+                f"{action_cn}{domain_cn}相关信息，返回{domain_cn}{action_cn}结果",
+                [f"{domain}_id", "keyword", "options"]
+            ))
+    return tools[:size]
+
+
+def build_tool_manager(size: int, top_k: int, retrieval_enabled: bool) -> ToolManager:
+    """构造不连接MCP服务器的工具管理器"""
+    tool_manager = ToolManager(mcp_client=None)
+    tool_manager.available_tools = build_catalog(size)
+    tool_manager.retrieval_top_k = top_k
+    tool_manager.retrieval_enabled = retrieval_enabled
+    tool_manager._tools_loaded = True
+    tool_manager.tool_index.build(tool_manager.get_tools_for_planning())
+    return tool_manager
+
+
+def prompt_tokens(compiler: PromptCompiler, query: str) -> int:
+    """估算一次规划请求中系统提示词（含补充工具）的token数"""
+    messages = compiler.build_messages("plan", query, query=query)
+    return sum(estimate_tokens(message["content"]) for message in messages if message["role"] == "system")
+
+
+def benchmark_size(size: int, top_k: int) -> dict:
+    """测量单个工具清单规模下的token数、召回率与延迟"""
+    templates = {"plan": PLAN_SYSTEM_PROMPT, "improvement": IMPROVEMENT_SYSTEM_PROMPT}
+    full_compiler = PromptCompiler(build_tool_manager(size, top_k, retrieval_enabled=False), templates)
+    tool_manager = build_tool_manager(size, top_k, retrieval_enabled=True)
+    retrieval_compiler = PromptCompiler(tool_manager, templates)
+
+    full_tokens = statistics.mean(prompt_tokens(full_compiler, query) for query, _ in SAMPLE_QUERIES)
+    retrieval_tokens = statistics.mean(prompt_tokens(retrieval_compiler, query) for query, _ in SAMPLE_QUERIES)
+
+    # 召回率只统计清单中存在的期望工具
+    available = set(tool_manager.get_available_tool_names())
+    expected_queries = [(query, expected) for query, expected in SAMPLE_QUERIES if expected in available]
+    hits = sum(
+        1 for query, expected in expected_queries
+        if expected in {info["name"] for info in tool_manager.get_tools_for_planning(query)}
+    )
+
+    start_time = time.perf_counter()
+    tool_manager.tool_index.build(tool_manager.get_tools_for_planning())
+    build_ms = (time.perf_counter() - start_time) * 1000
+
+    search_latencies = []
+    for _ in range(50):
+        for query, _ in SAMPLE_QUERIES:
+            start_time = time.perf_counter()
+            tool_manager.tool_index.search(query, top_k)
+            search_latencies.append((time.perf_counter() - start_time) * 1e6)
+
+    return {
+        "size": size,
+        "retrieval_active": tool_manager.is_tool_retrieval_active(),
+        "full_tokens": full_tokens,
+        "retrieval_tokens": retrieval_tokens,
+        "recall": hits / len(expected_queries) if expected_queries else None,
+        "build_ms": build_ms,
+        "search_us": statistics.mean(search_latencies)
+    }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="工具检索基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200], help="工具清单规模")
+    parser.add_argument("--top-k", type=int, default=5, help="检索的相关工具数量")
+    args = parser.parse_args()
+
+    print(f"📊 工具检索基准测试：Top-K {args.top_k}，{len(SAMPLE_QUERIES)} 条样例输入")
+    for size in args.sizes:
+        result = benchmark_size(size, args.top_k)
+        saved = 1 - result["retrieval_tokens"] / result["full_tokens"]
+        recall = f"{result['recall']:.0%}" if result["recall"] is not None else "-"
+        print(f"\n{size} 个工具（检索{'启用' if result['retrieval_active'] else '未启用，工具较少时提供全部工具'}）")
+        print(f"  系统提示词: 全量 {result['full_tokens']:.0f} -> 检索 {result['retrieval_tokens']:.0f} tokens（节省 {saved:.1%}）")
+        print(f"  召回率: {recall}")
+        print(f"  索引构建 {result['build_ms']:.2f}ms，单次检索 {result['search_us']:.1f}μs")
+
+
+if __name__ == "__main__":
+    main()
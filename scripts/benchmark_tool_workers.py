@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+工具执行池基准测试
+模拟多个用户同时调用CPU密集的工具，对比在事件循环中直接执行（改造前的MCP服务器）
+与工具执行池在 1/2/4/8 个工作进程下的吞吐量（任务数/分钟）
+
+用法：
+    python scripts/benchmark_tool_workers.py
+    python scripts/benchmark_tool_workers.py --workers 1 2 4 8 --tasks 32 --size 300000
+    python scripts/benchmark_tool_workers.py --workload read_file --rows 200000
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from tools.worker_pool import ToolWorkerPool
+
+BENCHMARK_TOOL = "benchmark_tool"
+
+
+def cpu_workload(size: int) -> int:
+    """纯Python的CPU密集计算，代表图表代码执行、数据整理等步骤"""
+    total = 0
+    for i in range(size):
+        total = (total + i * i) % 1_000_003
+    return total
+
+
+def read_file_workload(file_path: str) -> int:
+    """通过read_file工具读取CSV（pandas解析），代表文件解析步骤"""
+    from tools.local_tools import read_file
+    return len(str(read_file(file_path)))
+
+
+def make_csv_files(count: int, rows: int, directory: str) -> list:
+    """生成用于read_file负载的CSV文件，每个任务读取不同的文件"""
+    files = []
+    for index in range(count):
+        file_path = os.path.join(directory, f"data_{index}.csv")
+        with open(file_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["id", "region", "amount", "quantity"])
+            for row in range(rows):
+                writer.writerow([row, f"region_{row % 17}", row * 1.5, row % 100])
+        files.append(file_path)
+    return files
+
+
+async def run_inline(func, args_list) -> float:
+    """改造前：同步工具直接在事件循环中执行，并发调用实际串行"""
+    async def call(args):
+        return func(*args)
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(call(args) for args in args_list))
+    return time.perf_counter() - start_time
+
+
+async def run_pool(workers: int, func, args_list) -> float:
+    pool = ToolWorkerPool(process_workers=workers, process_tools=[BENCHMARK_TOOL])
+    try:
+        # 预热：工作进程启动与模块导入不计入耗时
+        await asyncio.gather(*(pool.run(BENCHMARK_TOOL, func, *args_list[0]) for _ in range(workers)))
+        start_time = time.perf_counter()
+        await asyncio.gather(*(pool.run(BENCHMARK_TOOL, func, *args) for args in args_list))
+        return time.perf_counter() - start_time
+    finally:
+        pool.shutdown()
+
+
+def print_row(label: str, tasks: int, elapsed: float, baseline: float) -> None:
+    throughput = tasks / elapsed * 60
+    print(f"{label:<14}{elapsed:>10.2f}s{throughput:>16.1f}{baseline / elapsed:>10.2f}x")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="工具执行池吞吐量基准测试")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="工作进程数")
+    parser.add_argument("--tasks", type=int, default=32, help="并发调用数")
+    parser.add_argument("--workload", choices=["cpu", "read_file"], default="cpu", help="负载类型")
+    parser.add_argument("--size", type=int, default=300_000, help="cpu负载的循环次数")
+    parser.add_argument("--rows", type=int, default=100_000, help="read_file负载的CSV行数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if args.workload == "cpu":
+            func, args_list = cpu_workload, [(args.size,)] * args.tasks
+        else:
+            func = read_file_workload
+            args_list = [(file_path,) for file_path in make_csv_files(args.tasks, args.rows, temp_dir)]
+
+        print(f"负载: {args.workload}，并发调用: {args.tasks}，CPU核心: {os.cpu_count()}")
+        print(f"{'模式':<12}{'耗时':>11}{'任务数/分钟':>12}{'加速比':>8}")
+        baseline = await run_inline(func, args_list)
+        print_row("事件循环内", args.tasks, baseline, baseline)
+        for workers in args.workers:
+            elapsed = await run_pool(workers, func, args_list)
+            print_row(f"{workers}个工作进程", args.tasks, elapsed, baseline)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
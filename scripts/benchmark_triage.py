@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+任务分诊基准测试
+对比 parallel（多次分类调用）与 combined（单次合并结构化输出）两种分诊模式的
+端到端延迟与token消耗
+
+用法：
+    python scripts/benchmark_triage.py --base-url http://host:port/v1 --api-key sk-xxx --rounds 3
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from openai import AsyncOpenAI
+from core.llm_client import LLMCaller
+from core.task_planner import TaskPlanner
+
+DEFAULT_INPUTS = [
+    "你好",
+    "谢谢你的帮助",
+    "你能做什么",
+    "生成一个Python hello world程序",
+    "搜索最新AI技术趋势",
+    "生成一张科技背景图片",
+    "帮我处理文件",
+    "我想学习机器学习，每周40小时",
+]
+
+
+class UsageRecordingCaller(LLMCaller):
+    """记录调用次数与token消耗的LLM调用封装"""
+
+    def __init__(self, llm_client, model_name: str):
+        super().__init__(llm_client, model_name)
+        self.reset()
+
+    def reset(self):
+        """清空统计"""
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def _record(self, response):
+        self.calls += 1
+        usage = getattr(response, "usage", None)
+        if usage:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+
+    async def parse(self, messages, response_format, **kwargs):
+        response = await super().parse(messages, response_format, **kwargs)
+        self._record(response)
+        return response
+
+    async def create(self, messages, **kwargs):
+        response = await super().create(messages, **kwargs)
+        self._record(response)
+        return response
+
+
+def load_report_inputs(limit: int) -> list:
+    """从历史执行报告中加载去重后的用户输入"""
+    inputs = []
+    for report_file in sorted(glob.glob(str(project_root / "execution_results" / "reports" / "*.json"))):
+        try:
+            with open(report_file, "r", encoding="utf-8") as f:
+                user_input = json.load(f)["task_info"]["user_input"]
+        except (OSError, KeyError, json.JSONDecodeError):
+            continue
+        if user_input not in inputs:
+            inputs.append(user_input)
+    return inputs[:limit]
+
+
+def percentile(values: list, pct: float) -> float:
+    """计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_mode(mode: str, llm_client: AsyncOpenAI, model_name: str, inputs: list, rounds: int) -> dict:
+    """以指定分诊模式跑完全部输入，返回统计结果"""
+    planner = TaskPlanner(llm_client, tool_manager=None, model_name=model_name, triage_mode=mode)
+    planner.event_emitter = None
+
+    async def quiet(message: str):
+        pass
+
+    planner.set_stream_callback(quiet)
+    caller = UsageRecordingCaller(llm_client, model_name)
+    planner.llm = caller
+    planner.clarity_analyzer.llm = caller
+
+    latencies = []
+    for _ in range(rounds):
+        for user_input in inputs:
+            start_time = time.perf_counter()
+            await planner._run_triage(user_input)
+            latencies.append(time.perf_counter() - start_time)
+
+    samples = len(latencies)
+    return {
+        "mode": mode,
+        "samples": samples,
+        "mean_latency": statistics.mean(latencies) if latencies else 0.0,
+        "p50_latency": percentile(latencies, 50),
+        "p95_latency": percentile(latencies, 95),
+        "calls_per_triage": caller.calls / samples if samples else 0.0,
+        "prompt_tokens_per_triage": caller.prompt_tokens / samples if samples else 0.0,
+        "completion_tokens_per_triage": caller.completion_tokens / samples if samples else 0.0,
+    }
+
+
+async def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="任务分诊模式基准测试")
+    parser.add_argument("--base-url", default="http://180.153.21.76:17009/v1", help="LLM服务地址")
+    parser.add_argument("--api-key", default="sk-proj-1234567890", help="LLM服务API Key")
+    parser.add_argument("--model", default="Qwen-72B", help="模型名称")
+    parser.add_argument("--rounds", type=int, default=3, help="每个输入重复次数")
+    parser.add_argument("--limit", type=int, default=20, help="从历史报告中最多加载的输入数")
+    args = parser.parse_args()
+
+    inputs = DEFAULT_INPUTS + [i for i in load_report_inputs(args.limit) if i not in DEFAULT_INPUTS]
+    llm_client = AsyncOpenAI(api_key=args.api_key, base_url=args.base_url)
+
+    print(f"📊 分诊基准测试：{len(inputs)} 条输入 × {args.rounds} 轮")
+    results = []
+    for mode in ("parallel", "combined"):
+        print(f"  ▶ 运行 {mode} 模式...")
+        results.append(await run_mode(mode, llm_client, args.model, inputs, args.rounds))
+
+    print()
+    print(f"{'模式':<10}{'样本':>6}{'平均(s)':>10}{'P50(s)':>10}{'P95(s)':>10}{'调用/次':>10}{'输入tok':>10}{'输出tok':>10}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['samples']:>6}{r['mean_latency']:>10.3f}{r['p50_latency']:>10.3f}"
+              f"{r['p95_latency']:>10.3f}{r['calls_per_triage']:>10.2f}"
+              f"{r['prompt_tokens_per_triage']:>10.1f}{r['completion_tokens_per_triage']:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
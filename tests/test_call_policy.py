@@ -0,0 +1,197 @@
+"""
+LLM调用策略测试：任务截止时间、共享重试预算、对冲请求与流式调用的重试
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from core.call_policy import CallPolicy, DeadlineExceededError, LatencyHistogram, call_timeout, task_deadline
+from core.llm_client import LLMCaller
+from core.model_router import ModelRouter
+
+
+class _FakeCompletions:
+    """按调用顺序执行预设的行为：("sleep", 秒数, 返回值) 或 ("raise", 异常)"""
+
+    def __init__(self, behaviors):
+        self.behaviors = list(behaviors)
+        self.calls = 0
+        self.cancelled = []
+
+    async def create(self, **kwargs):
+        index = self.calls
+        self.calls += 1
+        behavior = self.behaviors[min(index, len(self.behaviors) - 1)]
+        if behavior[0] == "raise":
+            raise behavior[1]
+        if behavior[0] == "stream":
+            return _chunks(behavior[1], behavior[2])
+        try:
+            await asyncio.sleep(behavior[1])
+        except asyncio.CancelledError:
+            self.cancelled.append(index)
+            raise
+        return SimpleNamespace(content=behavior[2], usage=None)
+
+
+async def _chunks(texts, error):
+    for text in texts:
+        yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+    if error:
+        raise error
+
+
+def _caller(behaviors, **policy_options):
+    completions = _FakeCompletions(behaviors)
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    options = {"call_timeout": 5, "retry_backoff": 0.01, "hedging_enabled": False, **policy_options}
+    policy = CallPolicy(**options)
+    return LLMCaller(client, "test-model", router=ModelRouter(), policy=policy), completions, policy
+
+
+def _hedging_caller(behaviors):
+    caller, completions, policy = _caller(behaviors, hedging_enabled=True, hedge_percentile=50, hedge_min_samples=1)
+    # 历史延迟落在0.05秒的桶内，对冲阈值为0.05秒
+    policy.observe("site", 0.04)
+    return caller, completions, policy
+
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) is None
+    for latency in (0.01, 0.01, 0.01, 2.0):
+        histogram.observe(latency)
+
+    assert histogram.percentile(50) == 0.05
+    assert histogram.percentile(99) >= 2.0
+    assert histogram.to_dict()["count"] == 4
+
+
+def test_call_timeout_clamped_to_task_remaining_time():
+    assert call_timeout(10) == 10
+    with task_deadline(timeout=0.5, retry_budget=0):
+        assert 0 < call_timeout(10) <= 0.5
+        assert 0 < call_timeout(None) <= 0.5
+        assert call_timeout(0.1) == 0.1
+    with task_deadline(timeout=0.01, retry_budget=0):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceededError):
+            call_timeout(10)
+
+
+def test_hedge_fires_after_delay_and_first_success_wins():
+    caller, completions, policy = _hedging_caller([("sleep", 1.0, "slow"), ("sleep", 0, "fast")])
+
+    async def run():
+        with task_deadline(timeout=0, retry_budget=1) as deadline:
+            started = time.perf_counter()
+            response = await caller.create([], call_site="site")
+            return response, time.perf_counter() - started, deadline
+
+    response, elapsed, deadline = asyncio.run(run())
+
+    assert response.content == "fast"
+    assert 0.05 <= elapsed < 0.5
+    assert completions.cancelled == [0]
+    assert deadline.retries_used == 1
+    assert policy.get_stats()["site"]["hedges"] == 1
+    assert policy.get_stats()["site"]["hedge_wins"] == 1
+
+
+def test_hedge_needs_retry_budget():
+    caller, completions, policy = _hedging_caller([("sleep", 0.1, "slow"), ("sleep", 0, "fast")])
+
+    async def run():
+        with task_deadline(timeout=0, retry_budget=0):
+            return await caller.create([], call_site="site")
+
+    assert asyncio.run(run()).content == "slow"
+    assert completions.calls == 1
+    assert "hedges" not in policy.get_stats()["site"]
+
+
+def test_retry_refused_when_budget_spent():
+    caller, completions, policy = _caller([("raise", asyncio.TimeoutError())])
+
+    async def run():
+        with task_deadline(timeout=0, retry_budget=2) as deadline:
+            with pytest.raises(asyncio.TimeoutError):
+                await caller.create([], call_site="site")
+            return deadline
+
+    deadline = asyncio.run(run())
+
+    assert completions.calls == 3
+    assert deadline.retries_used == 2
+    assert policy.get_stats()["site"]["retries"] == 2
+
+
+def test_retry_refused_when_backoff_passes_deadline():
+    caller, completions, _ = _caller([("raise", asyncio.TimeoutError()), ("sleep", 0, "ok")], retry_backoff=1.0)
+
+    async def run():
+        with task_deadline(timeout=0.5, retry_budget=5) as deadline:
+            with pytest.raises(asyncio.TimeoutError):
+                await caller.create([], call_site="site")
+            return deadline
+
+    deadline = asyncio.run(run())
+
+    assert completions.calls == 1
+    assert deadline.retries_used == 0
+
+
+def test_retry_succeeds_within_budget():
+    caller, completions, _ = _caller([("raise", asyncio.TimeoutError()), ("sleep", 0, "ok")])
+
+    async def run():
+        with task_deadline(timeout=0, retry_budget=1):
+            return await caller.create([], call_site="site")
+
+    assert asyncio.run(run()).content == "ok"
+    assert completions.calls == 2
+
+
+def test_non_retryable_error_is_raised_immediately():
+    caller, completions, _ = _caller([("raise", ValueError("bad request"))])
+
+    async def run():
+        with task_deadline(timeout=0, retry_budget=3):
+            await caller.create([], call_site="site")
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
+    assert completions.calls == 1
+
+
+def _collect(caller):
+    received = []
+
+    async def run():
+        with task_deadline(timeout=0, retry_budget=3):
+            async for text in caller.stream([{"role": "user", "content": "hi"}], call_site="site"):
+                received.append(text)
+
+    return received, run
+
+
+def test_stream_does_not_retry_after_first_chunk():
+    caller, completions, _ = _caller([("stream", ["a"], asyncio.TimeoutError()), ("stream", ["a", "b"], None)])
+    received, run = _collect(caller)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
+    assert received == ["a"]
+    assert completions.calls == 1
+
+
+def test_stream_retries_before_first_chunk():
+    caller, completions, _ = _caller([("stream", [], asyncio.TimeoutError()), ("stream", ["a", "b"], None)])
+    received, run = _collect(caller)
+
+    asyncio.run(run())
+    assert received == ["a", "b"]
+    assert completions.calls == 2
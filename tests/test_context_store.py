@@ -0,0 +1,83 @@
+"""
+用户上下文存储测试：LRU淘汰、字节统计、溢出到磁盘与恢复
+"""
+
+from core.context_store import UserContextStore
+from core.models import Plan, Step, TaskPlan
+
+
+def _task_plan(user_input: str = "生成报告") -> TaskPlan:
+    step = Step(step_description="生成文件", function_name="file_generation_tool", args={"content": user_input})
+    return TaskPlan(user_input=user_input, task_type="file", complexity_level="simple", plan=Plan(steps=[step]))
+
+
+def _size(task_plan: TaskPlan) -> int:
+    return len(task_plan.model_dump_json().encode("utf-8"))
+
+
+def test_evicts_least_recently_used_by_max_users():
+    store = UserContextStore(max_users=2)
+    for user_id in ("a", "b"):
+        store.set_last_task(user_id, _task_plan(user_id))
+    store.get_last_task("a")
+    store.set_last_task("c", _task_plan("c"))
+
+    assert "b" not in store
+    assert store.get_last_task("a").user_input == "a"
+    assert store.get_stats()["evictions"] == 1
+
+
+def test_evicts_by_max_bytes_and_tracks_total():
+    plans = {user_id: _task_plan(user_id) for user_id in ("a", "b", "c")}
+    store = UserContextStore(max_bytes=_size(plans["a"]) * 2)
+    for user_id, task_plan in plans.items():
+        store.set_last_task(user_id, task_plan)
+
+    assert "a" not in store and "b" in store and "c" in store
+    assert store.total_bytes == _size(plans["b"]) + _size(plans["c"])
+
+    # 覆盖写入不重复计算字节数
+    store.set_last_task("b", plans["b"])
+    assert store.total_bytes == _size(plans["b"]) + _size(plans["c"])
+
+
+def test_total_bytes_returns_to_zero_after_clear():
+    store = UserContextStore()
+    store.set_last_task("a", _task_plan("a"))
+    store.set_last_task("b", _task_plan("b"))
+    store.clear("a")
+    store.clear("b")
+    store.clear("missing")
+
+    assert store.total_bytes == 0
+    assert store.get_stats()["users_in_memory"] == 0
+
+
+def test_spilled_entry_is_restored_and_file_deleted(tmp_path):
+    store = UserContextStore(max_users=1, spill_dir=str(tmp_path))
+    store.set_last_task("a", _task_plan("a"))
+    store.set_last_task("b", _task_plan("b"))
+
+    spill_file = store._spill_file("a")
+    assert spill_file.exists()
+    assert "a" in store
+
+    restored = store.get_last_task("a")
+
+    assert restored.user_input == "a"
+    assert not spill_file.exists()
+    # 恢复的条目重新放入内存，按LRU把b溢出到磁盘
+    assert store._spill_file("b").exists()
+    assert store.get_stats()["restores"] == 1
+    assert store.total_bytes == _size(_task_plan("a"))
+
+
+def test_corrupt_spill_file_returns_none(tmp_path):
+    store = UserContextStore(spill_dir=str(tmp_path))
+    spill_file = store._spill_file("a")
+    spill_file.write_text("{not json", encoding="utf-8")
+
+    assert store.get_last_task("a") is None
+    assert not spill_file.exists()
+    assert "a" not in store
+    assert store.total_bytes == 0
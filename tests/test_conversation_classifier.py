@@ -0,0 +1,35 @@
+"""
+本地对话分类器测试
+"""
+
+import pytest
+
+from core.conversation_classifier import SEED_EXAMPLES, ConversationClassifier
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return ConversationClassifier().fit(SEED_EXAMPLES)
+
+
+@pytest.mark.parametrize("text", ["你好", "谢谢你的帮助", "thank you", "晚安"])
+def test_plain_greetings_are_conversation(classifier, text):
+    assert classifier.classify(text) is True
+
+
+@pytest.mark.parametrize("text", [
+    "你能帮我写个爬虫吗",
+    "早上好，请搜索最新新闻",
+    "谢谢你的帮助，再生成一份周报",
+    "thanks! now generate a report",
+])
+def test_greeting_with_task_is_never_conversation(classifier, text):
+    assert classifier.classify(text) is not True
+
+
+def test_long_input_is_not_judged_conversation(classifier):
+    assert classifier.classify("你好你好你好你好你好你好你好你好你好") is not True
+
+
+def test_task_is_confirmed_locally(classifier):
+    assert classifier.classify("生成一个程序") is False
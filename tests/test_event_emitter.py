@@ -0,0 +1,49 @@
+"""
+展示节奏控制监听器测试
+"""
+
+import asyncio
+import time
+
+from core.event_emitter import PacedEventListener
+
+
+def test_stream_text_keeps_order_with_events():
+    delivered = []
+
+    async def listener(event):
+        delivered.append(event["type"])
+
+    async def stream(text):
+        delivered.append(text)
+
+    async def run():
+        paced = PacedEventListener(listener, intervals={})
+        paced_stream = paced.wrap_stream(stream)
+        paced({"type": "plan_generation_start"})
+        await paced_stream("step text")
+        paced({"type": "plan_generated"})
+        await paced.close()
+
+    asyncio.run(run())
+    assert delivered == ["plan_generation_start", "step text", "plan_generated"]
+
+
+def test_finish_skips_remaining_display_intervals():
+    delivered = []
+
+    async def run():
+        paced = PacedEventListener(lambda event: delivered.append(event["type"]),
+                                   intervals={"slow": 5.0})
+        for _ in range(3):
+            paced({"type": "slow"})
+        await asyncio.sleep(0)
+        started = time.monotonic()
+        await paced.finish()
+        elapsed = time.monotonic() - started
+        await paced.close()
+        return elapsed
+
+    elapsed = asyncio.run(run())
+    assert delivered == ["slow", "slow", "slow"]
+    assert elapsed < 1.0
@@ -0,0 +1,115 @@
+"""
+执行日志测试
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+from core.execution_journal import ExecutionJournal
+from core.models import Plan, Step, StepStatus, TaskPlan, TaskStatus
+
+
+def _task_plan() -> TaskPlan:
+    steps = [Step(step_description=f"步骤{i}", function_name="tool", args={}) for i in range(2)]
+    return TaskPlan(user_input="测试", task_type="测试", complexity_level="simple", plan=Plan(steps=steps))
+
+
+def _complete(journal, task_plan, index, result):
+    step = task_plan.plan.steps[index]
+    journal.step_started(task_plan.task_id, step)
+    step.status = StepStatus.COMPLETED
+    journal.step_finished(task_plan.task_id, step, result, [])
+
+
+def test_records_written_off_the_event_loop_and_replayed(tmp_path, monkeypatch):
+    journal = ExecutionJournal(str(tmp_path), fsync=True)
+    write_threads = []
+    original = journal._write_lines
+
+    def record_thread(journal_file, lines):
+        write_threads.append(threading.current_thread())
+        original(journal_file, lines)
+
+    monkeypatch.setattr(journal, "_write_lines", record_thread)
+    task_plan = _task_plan()
+
+    async def run():
+        journal.begin(task_plan, "user")
+        _complete(journal, task_plan, 0, {"content": "x" * 1000})
+        await journal.flush()
+
+    asyncio.run(run())
+    assert write_threads and threading.main_thread() not in write_threads
+
+    state = journal.load(task_plan.task_id)
+    assert state.user_id == "user"
+    assert list(state.completed_steps) == [task_plan.plan.steps[0].step_id]
+    assert state.completed_steps[task_plan.plan.steps[0].step_id]["result"] == {"content": "x" * 1000}
+    assert [s.task_plan.task_id for s in journal.find_unfinished()] == [task_plan.task_id]
+
+
+def test_finish_archives_after_pending_records(tmp_path):
+    journal = ExecutionJournal(str(tmp_path))
+    task_plan = _task_plan()
+
+    async def run():
+        journal.begin(task_plan, "user")
+        _complete(journal, task_plan, 0, "ok")
+        journal.finish(task_plan.task_id, TaskStatus.FAILED)
+        await journal.close()
+
+    asyncio.run(run())
+    archived = tmp_path / "finished" / f"{task_plan.task_id}.jsonl"
+    events = [line for line in archived.read_text(encoding="utf-8").splitlines()]
+    assert len(events) == 4 and '"task_end"' in events[-1]
+    assert not (tmp_path / f"{task_plan.task_id}.jsonl").exists()
+
+
+def test_close_drains_queue_and_leaves_task_resumable(tmp_path):
+    journal = ExecutionJournal(str(tmp_path))
+    task_plan = _task_plan()
+
+    async def run():
+        journal.begin(task_plan, "user")
+        _complete(journal, task_plan, 0, "ok")
+        await journal.close()
+        # 停机后被取消的任务不记为结束
+        journal.finish(task_plan.task_id, TaskStatus.CANCELLED)
+
+    asyncio.run(run())
+    state = journal.load(task_plan.task_id)
+    assert state is not None and len(state.completed_steps) == 1
+
+
+def test_completed_task_journal_is_deleted(tmp_path):
+    journal = ExecutionJournal(str(tmp_path))
+    task_plan = _task_plan()
+
+    async def run():
+        journal.begin(task_plan, "user")
+        await journal.flush()
+        _complete(journal, task_plan, 0, "ok")
+        journal.finish(task_plan.task_id, TaskStatus.COMPLETED)
+        await journal.close()
+
+    asyncio.run(run())
+    assert list(tmp_path.rglob("*.jsonl")) == []
+
+
+def test_archive_pruned_by_age_and_count_at_startup(tmp_path):
+    finished = tmp_path / "finished"
+    finished.mkdir()
+    now = time.time()
+    for index in range(4):
+        archived = finished / f"task{index}.jsonl"
+        archived.write_text("{}\n", encoding="utf-8")
+        os.utime(archived, (now - index * 100, now - index * 100))
+    expired = finished / "expired.jsonl"
+    expired.write_text("{}\n", encoding="utf-8")
+    os.utime(expired, (now - 10000, now - 10000))
+
+    ExecutionJournal(str(tmp_path), archive_ttl=3600, archive_max_entries=3)
+
+    assert sorted(path.stem for path in finished.glob("*.jsonl")) == ["task0", "task1", "task2"]
@@ -0,0 +1,40 @@
+"""
+文件管理器测试
+"""
+
+from core.file_manager import FileManager
+from core.models import ExecutionResult
+
+
+def _execution_result(step_result: dict) -> ExecutionResult:
+    return ExecutionResult(task_id="t1", success=True, results=[{
+        "step_id": "s1",
+        "step_description": "生成海边的图片",
+        "function_name": "image_generation_tool",
+        "result": step_result
+    }])
+
+
+def test_collects_image_urls_from_result_without_artifacts(tmp_path):
+    manager = FileManager(base_dir=str(tmp_path))
+    result = _execution_result({"success": True, "images": [
+        {"url": "https://img.example.com/a/sea.png"},
+        {"url": "https://img.example.com/a/sea.png"},
+        {"revised_prompt": "no url"}
+    ]})
+
+    collected = manager.collect_files_from_result("t1", result)
+
+    assert collected == ["https://img.example.com/a/sea.png"]
+    file_info = manager.task_files["t1"]["files"][0]
+    assert file_info["remote"] and file_info["file_name"] == "sea.png"
+    assert file_info["step_id"] == "s1" and file_info["description"] == "生成海边的图片"
+    # 再次收集不重复登记
+    assert manager.collect_files_from_result("t1", result) == []
+
+
+def test_image_result_with_artifacts_is_left_to_manifest(tmp_path):
+    manager = FileManager(base_dir=str(tmp_path))
+    result = _execution_result({"success": True, "images": [{"url": "https://img.example.com/b.png"}], "artifacts": []})
+
+    assert manager.collect_files_from_result("t1", result) == []
@@ -0,0 +1,80 @@
+"""
+模型路由测试：类别到模型的映射、延迟预算与分类别统计
+"""
+
+import pytest
+
+from config import settings
+from core.model_router import ROUTE_CHAT, ROUTE_CLASSIFY, ROUTE_PLAN, ModelRouter
+
+
+def test_resolve_falls_back_to_default_model(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_DEFAULT_MODEL", "settings-model")
+    router = ModelRouter({ROUTE_CLASSIFY: "small-model", ROUTE_PLAN: ""})
+
+    assert router.resolve(ROUTE_CLASSIFY, "caller-model") == "small-model"
+    # 未配置或配置为空的类别使用调用方的默认模型，调用方也没有时使用settings中的默认模型
+    assert router.resolve(ROUTE_PLAN, "caller-model") == "caller-model"
+    assert router.resolve(ROUTE_CHAT, "caller-model") == "caller-model"
+    assert router.resolve(ROUTE_CHAT) == "settings-model"
+
+
+def test_configured_budget_overrides_declared_budget():
+    router = ModelRouter(latency_budgets={ROUTE_CLASSIFY: 1.0})
+
+    assert router.get_latency_budget(ROUTE_CLASSIFY, 10.0) == 1.0
+    assert router.get_latency_budget(ROUTE_CHAT, 10.0) == 10.0
+    assert router.get_latency_budget(ROUTE_CHAT) is None
+
+    router.record(ROUTE_CLASSIFY, "m", 2.0, latency_budget=10.0)
+    router.record(ROUTE_CHAT, "m", 2.0, latency_budget=10.0)
+    stats = router.get_stats()
+    assert stats[ROUTE_CLASSIFY]["over_budget"] == 1
+    assert stats[ROUTE_CLASSIFY]["latency_budget"] == 1.0
+    assert stats[ROUTE_CHAT]["over_budget"] == 0
+
+
+def test_record_counts_and_percentiles():
+    router = ModelRouter()
+    for index in range(10):
+        router.record(ROUTE_PLAN, "big-model", (index + 1) / 10, prompt_tokens=100, completion_tokens=10,
+                      success=index != 0, latency_budget=0.75)
+
+    stats = router.get_stats()[ROUTE_PLAN]
+
+    assert stats["calls"] == 10
+    assert stats["errors"] == 1
+    assert stats["over_budget"] == 3
+    assert stats["prompt_tokens"] == 1000 and stats["completion_tokens"] == 100
+    assert stats["mean_latency"] == 0.55
+    assert stats["p50_latency"] == 0.5
+    assert stats["p95_latency"] == 1.0
+
+
+def test_record_usage_from_tool_process():
+    router = ModelRouter({ROUTE_CHAT: "chat-model"})
+    router.record_usage({"route": ROUTE_CHAT, "latency": 3.0, "prompt_tokens": 5, "completion_tokens": 7,
+                         "success": False, "latency_budget": 2.0})
+
+    stats = router.get_stats()[ROUTE_CHAT]
+    assert stats["model"] == "chat-model"
+    assert (stats["calls"], stats["errors"], stats["over_budget"]) == (1, 1, 1)
+    assert (stats["prompt_tokens"], stats["completion_tokens"]) == (5, 7)
+
+
+def test_track_records_success_and_error():
+    router = ModelRouter({ROUTE_CHAT: "chat-model"})
+
+    with router.track(ROUTE_CHAT, "caller-model", latency_budget=60) as call:
+        call.add_usage(type("Usage", (), {"prompt_tokens": 4, "completion_tokens": 6})())
+    assert call.model == "chat-model"
+
+    with pytest.raises(RuntimeError):
+        with router.track(ROUTE_CLASSIFY, "caller-model"):
+            raise RuntimeError("调用失败")
+
+    stats = router.get_stats()
+    assert (stats[ROUTE_CHAT]["calls"], stats[ROUTE_CHAT]["errors"]) == (1, 0)
+    assert (stats[ROUTE_CHAT]["prompt_tokens"], stats[ROUTE_CHAT]["completion_tokens"]) == (4, 6)
+    assert stats[ROUTE_CLASSIFY]["model"] == "caller-model"
+    assert (stats[ROUTE_CLASSIFY]["calls"], stats[ROUTE_CLASSIFY]["errors"]) == (1, 1)
@@ -0,0 +1,94 @@
+"""
+流水线规划测试：已交给执行器的步骤之后规划失败时，不能再改用后备计划
+"""
+
+import asyncio
+import json
+
+import pytest
+from openai import AsyncOpenAI
+
+from core.event_emitter import ExecutionEventEmitter
+from core.plan_cache import PlanCache
+from core.plan_stream_parser import IncrementalPlanParser
+from core.task_planner import PlanAbandonedError, TaskPlanner, _StepForwarder
+
+
+class _FakeToolManager:
+    def get_catalog_version(self):
+        return "test"
+
+
+def _make_planner(chunks, fail_after=False):
+    planner = TaskPlanner(
+        AsyncOpenAI(api_key="test", base_url="http://127.0.0.1:9/v1"),
+        _FakeToolManager(),
+        event_emitter=ExecutionEventEmitter(print_events=False),
+        plan_cache=PlanCache(max_entries=4, ttl=0)
+    )
+    planner.prompt_compiler.build_messages = lambda *args, **kwargs: []
+
+    async def stream(messages, **kwargs):
+        for chunk in chunks:
+            yield chunk
+        if fail_after:
+            raise RuntimeError("连接中断")
+
+    async def stream_print(message="", end="\n"):
+        pass
+
+    planner.llm.stream = stream
+    planner._stream_print = stream_print
+    return planner
+
+
+def _steps_json(count):
+    steps = [{"step_description": f"步骤{i}", "function_name": "web_search", "args": {"query": str(i)}}
+             for i in range(count)]
+    return json.dumps({"steps": steps}, ensure_ascii=False)
+
+
+def test_parser_error_after_two_streamed_steps_fails_instead_of_falling_back(monkeypatch):
+    forwarded = []
+
+    async def on_plan_step(step):
+        forwarded.append(step.step_description)
+
+    def broken_finish(self):
+        raise ValueError("计划JSON无效")
+
+    monkeypatch.setattr(IncrementalPlanParser, "finish", broken_finish)
+    text = _steps_json(2)
+    planner = _make_planner([text[:len(text) // 2], text[len(text) // 2:]])
+
+    with pytest.raises(PlanAbandonedError):
+        asyncio.run(planner._generate_plan("搜索两次", _StepForwarder(on_plan_step)))
+    assert forwarded == ["步骤0", "步骤1"]
+
+
+def test_stream_error_after_two_steps_keeps_only_streamed_steps():
+    forwarded = []
+
+    async def on_plan_step(step):
+        forwarded.append(step.step_description)
+
+    text = _steps_json(3)
+    cut = text.index("步骤2")
+    planner = _make_planner([text[:cut]], fail_after=True)
+
+    plan = asyncio.run(planner._generate_plan("搜索三次", _StepForwarder(on_plan_step)))
+    assert forwarded == ["步骤0", "步骤1"]
+    assert [step.step_description for step in plan.steps] == forwarded
+
+
+def test_fallback_plan_is_not_forwarded_when_nothing_streamed():
+    forwarded = []
+
+    async def on_plan_step(step):
+        forwarded.append(step)
+
+    planner = _make_planner(["抱歉，无法生成计划"])
+
+    plan = asyncio.run(planner._generate_plan("你好", _StepForwarder(on_plan_step)))
+    assert forwarded == []
+    assert [step.function_name for step in plan.steps] == ["generate_answer_tool"]
@@ -0,0 +1,50 @@
+"""
+执行计划缓存测试
+"""
+
+import os
+import time
+
+from core.models import Plan, Step
+from core.plan_cache import PlanCache, normalize_user_input
+
+
+def _plan() -> Plan:
+    return Plan(steps=[Step(step_description="生成文件", function_name="generate_file", args={"name": "a"})])
+
+
+def test_normalize_collapses_whitespace_but_keeps_case():
+    assert normalize_user_input("  读取 Report.PDF  并总结。") == "读取 Report.PDF 并总结"
+    assert PlanCache.make_key("读取 Report.PDF", "v1") != PlanCache.make_key("读取 report.pdf", "v1")
+
+
+def test_lru_eviction_removes_disk_file(tmp_path):
+    cache = PlanCache(max_entries=2, ttl=0, cache_dir=str(tmp_path))
+    for name in ("a", "b", "c"):
+        cache.put(name, _plan(), generation_time=1.0)
+
+    assert sorted(p.stem for p in tmp_path.glob("*.json")) == ["b", "c"]
+    assert cache.get("a") is None
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_startup_sweep_caps_disk_directory(tmp_path):
+    writer = PlanCache(max_entries=10, ttl=0, cache_dir=str(tmp_path))
+    now = time.time()
+    for index, name in enumerate(("old", "mid", "new")):
+        writer.put(name, _plan(), generation_time=1.0)
+        os.utime(tmp_path / f"{name}.json", (now + index, now + index))
+
+    PlanCache(max_entries=2, ttl=0, cache_dir=str(tmp_path))
+    assert sorted(p.stem for p in tmp_path.glob("*.json")) == ["mid", "new"]
+
+
+def test_hit_returns_fresh_step_ids():
+    cache = PlanCache(max_entries=4, ttl=0)
+    plan = _plan()
+    cache.put("k", plan, generation_time=2.0)
+
+    cached = cache.get("k")
+    assert cached.steps[0].function_name == "generate_file"
+    assert cached.steps[0].step_id != plan.steps[0].step_id
+    assert cache.get_stats()["saved_seconds"] == 2.0
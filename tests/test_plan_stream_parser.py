@@ -0,0 +1,78 @@
+"""
+流式计划解析测试
+"""
+
+import json
+
+import pytest
+
+from core.plan_stream_parser import IncrementalPlanParser
+
+PLAN = {
+    "steps": [
+        {"step_description": "搜索资料", "function_name": "web_search", "args": {"query": "a {b} \"c\" }"}},
+        {"step_description": "生成报告", "function_name": "generate_file", "args": {"content": "[x]"}, "is_final": True}
+    ],
+    "estimated_duration": 30
+}
+
+
+def _feed_in_chunks(parser, text, size):
+    steps = []
+    for start in range(0, len(text), size):
+        steps.extend(parser.feed(text[start:start + size]))
+    return steps
+
+
+@pytest.mark.parametrize("size", [1, 3, 17, 1000])
+def test_steps_emitted_regardless_of_chunk_boundaries(size):
+    text = "计划如下：\n```json\n" + json.dumps(PLAN, ensure_ascii=False) + "\n```"
+    parser = IncrementalPlanParser()
+
+    steps = _feed_in_chunks(parser, text, size)
+    plan = parser.finish()
+
+    assert [step.function_name for step in steps] == ["web_search", "generate_file"]
+    assert steps[0].args["query"] == "a {b} \"c\" }"
+    assert plan.steps == steps
+    assert plan.estimated_duration == 30
+    assert not parser.truncated
+
+
+def test_step_is_emitted_as_soon_as_it_closes():
+    text = json.dumps(PLAN, ensure_ascii=False)
+    first_end = text.index("}}") + 2
+    parser = IncrementalPlanParser()
+
+    assert [step.function_name for step in parser.feed(text[:first_end])] == ["web_search"]
+    assert parser.feed(text[first_end:first_end + 5]) == []
+
+
+def test_truncated_output_keeps_closed_steps_and_marks_final():
+    text = json.dumps(PLAN, ensure_ascii=False)
+    cut = text.index('"生成报告"')
+    parser = IncrementalPlanParser()
+    parser.feed(text[:cut])
+
+    plan = parser.finish()
+    assert parser.truncated
+    assert [step.function_name for step in plan.steps] == ["web_search"]
+    assert plan.steps[-1].is_final
+    assert plan.estimated_duration is None
+
+
+def test_top_level_array_and_invalid_step_skipped():
+    parser = IncrementalPlanParser()
+    parser.feed('[{"step_description": "缺少函数名"}, '
+                '{"step_description": "读取", "function_name": "read_file", "args": {}}]')
+
+    plan = parser.finish()
+    assert [step.function_name for step in plan.steps] == ["read_file"]
+    assert len(parser.errors) == 1
+
+
+def test_finish_without_steps_raises():
+    parser = IncrementalPlanParser()
+    parser.feed("抱歉，我无法生成计划 [] {}")
+    with pytest.raises(ValueError):
+        parser.finish()
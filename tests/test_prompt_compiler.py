@@ -0,0 +1,71 @@
+"""
+规划提示词编译测试：按工具清单版本复用编译结果，检索出的工具附在不变的前缀之后
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from core.prompt_compiler import PromptCompiler
+from tools.tool_manager import ToolManager
+
+TOOLS = [
+    ("generate_answer_tool", "回答用户的问题"),
+    ("web_search_tool", "联网搜索最新资料"),
+    ("image_generation_tool", "根据文本描述生成图片"),
+    ("data_chart_tool", "将数据绘制为图表"),
+]
+TEMPLATES = {"plan": "可用工具：{tools}\n输出格式：{output_format}\n"}
+
+
+class _FakeMCPClient:
+    def __init__(self, tools):
+        self.tools = tools
+
+    async def get_all_mcp_tools(self):
+        return [SimpleNamespace(name=name, description=description, args={}) for name, description in self.tools]
+
+
+def _compiler(retrieval_enabled):
+    mcp_client = _FakeMCPClient(TOOLS)
+    tool_manager = ToolManager(mcp_client, tool_cache=None)
+    tool_manager.core_tool_names = ["generate_answer_tool"]
+    tool_manager.retrieval_top_k = 1
+    tool_manager.retrieval_enabled = retrieval_enabled
+    asyncio.run(tool_manager.load_all_tools())
+    return PromptCompiler(tool_manager, TEMPLATES), tool_manager, mcp_client
+
+
+def test_prefix_reused_until_catalog_changes():
+    compiler, tool_manager, mcp_client = _compiler(retrieval_enabled=False)
+
+    first = compiler.build_messages("plan", "任务一")
+    second = compiler.build_messages("plan", "任务二")
+
+    assert compiler.compilations == 1
+    assert first[0] == second[0] and first[0]["role"] == "system"
+    assert [message["role"] for message in first] == ["system", "user"]
+    assert "translate_tool" not in first[0]["content"]
+
+    mcp_client.tools = TOOLS + [("translate_tool", "将文本翻译为英文")]
+    asyncio.run(tool_manager.load_all_tools(force=True))
+    third = compiler.build_messages("plan", "任务三")
+
+    assert compiler.compilations == 2
+    assert "translate_tool" in third[0]["content"]
+    assert compiler.get_stats()["catalog_version"] == tool_manager.get_catalog_version()
+
+
+def test_retrieved_tools_appended_without_changing_prefix():
+    compiler, _, _ = _compiler(retrieval_enabled=True)
+    prefix = compiler.get_system_prompt("plan")
+
+    messages = compiler.build_messages("plan", "画一张销售数据图表", query="画一张销售数据图表")
+    other = compiler.build_messages("plan", "搜索新闻", query="联网搜索新闻")
+
+    assert compiler.compilations == 1
+    assert "generate_answer_tool" in prefix and "data_chart_tool" not in prefix
+    assert [message["role"] for message in messages] == ["system", "system", "user"]
+    assert messages[0]["content"] == prefix == other[0]["content"]
+    assert "data_chart_tool" in messages[1]["content"]
+    assert "web_search_tool" in other[1]["content"]
+    assert compiler.get_stats()["retrieval_requests"] == 2
@@ -0,0 +1,56 @@
+"""
+步骤结果引用测试
+"""
+
+import pytest
+
+from core.models import Step, StepStatus
+from core.step_references import StepReferenceError, StepReferenceResolver, find_step_references
+
+
+def _step(result, status=StepStatus.COMPLETED):
+    step = Step(step_description="步骤", function_name="tool", args={})
+    step.status = status
+    step.result = result
+    return step
+
+
+def test_find_step_references_in_nested_args():
+    args = {"a": "${step1.file_path}", "b": ["x ${step3} y", {"c": "${step2.results[0].url}"}], "d": 1}
+    assert find_step_references(args) == {1, 2, 3}
+
+
+def test_whole_value_reference_keeps_type_and_identity():
+    payload = {"rows": [1, 2]}
+    resolver = StepReferenceResolver([_step({"data": payload})])
+
+    resolved = resolver.resolve({"data": "${step1.data}"})
+    assert resolved["data"] is payload
+
+
+def test_embedded_reference_and_list_index():
+    resolver = StepReferenceResolver([_step("plain"), _step({"results": [{"url": "http://a/b.png"}]})])
+
+    resolved = resolver.resolve({"text": "图片: ${step2.results[0].url}，说明: ${step1}"})
+    assert resolved["text"] == "图片: http://a/b.png，说明: plain"
+
+
+def test_json_text_result_is_parsed_for_paths():
+    resolver = StepReferenceResolver([_step('{"file_path": "/tmp/out.txt"}')])
+    assert resolver.resolve({"path": "${step1.file_path}"}) == {"path": "/tmp/out.txt"}
+
+
+def test_args_without_references_returned_as_is():
+    args = {"query": "no refs"}
+    assert StepReferenceResolver([]).resolve(args) is args
+
+
+@pytest.mark.parametrize("steps, reference", [
+    ([], "${step1}"),
+    ([_step({"a": 1})], "${step1.b}"),
+    ([_step({"a": [1]})], "${step1.a[3]}"),
+    ([_step(None, status=StepStatus.FAILED)], "${step1}"),
+])
+def test_unresolvable_references_raise(steps, reference):
+    with pytest.raises(StepReferenceError):
+        StepReferenceResolver(steps).resolve({"value": reference})
@@ -0,0 +1,258 @@
+"""
+任务执行器测试：按依赖关系调度步骤，全局与单个工具的并发上限，同一执行器上的并发任务，工具超时与取消
+"""
+
+import asyncio
+
+import pytest
+
+from config import settings
+from core.call_policy import DeadlineExceededError, task_deadline
+from core.event_emitter import ExecutionEventEmitter
+from core.execution_context import execution_context
+from core.file_manager import FileManager
+from core.models import Plan, Step, StepStatus, TaskPlan, TaskStatus
+from core.task_executor import TaskExecutor
+
+
+class _StubToolManager:
+    """按参数中的delay等待后返回，记录各工具同时执行的调用数与调用的起止顺序"""
+
+    def __init__(self):
+        self.running = {}
+        self.peak = {}
+        self.timeline = []
+
+    async def call_tool(self, tool_name, args):
+        self.running[tool_name] = self.running.get(tool_name, 0) + 1
+        self.peak[tool_name] = max(self.peak.get(tool_name, 0), self.running[tool_name])
+        self.timeline.append(("start", args.get("name")))
+        try:
+            await asyncio.sleep(args.get("delay", 0))
+            if args.get("fail"):
+                raise RuntimeError("工具出错")
+            return {"value": args.get("name")}
+        finally:
+            self.running[tool_name] -= 1
+            self.timeline.append(("end", args.get("name")))
+
+
+@pytest.fixture(autouse=True)
+def _settings(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "EXECUTION_JOURNAL_ENABLED", False)
+    monkeypatch.setattr(settings, "MAX_PARALLEL_STEPS", 2)
+    monkeypatch.setattr(settings, "TOOL_CONCURRENCY_LIMITS", {"image_generation_tool": 1})
+
+
+def _executor(tmp_path, tool_manager=None):
+    return TaskExecutor(
+        tool_manager or _StubToolManager(),
+        file_manager=FileManager(base_dir=str(tmp_path)),
+        event_emitter=ExecutionEventEmitter(print_events=False)
+    )
+
+
+def _step(name, function_name="web_search_tool", depends_on=None, **args):
+    return Step(step_description=name, function_name=function_name, args={"name": name, **args},
+                depends_on=depends_on)
+
+
+def _task_plan(*steps):
+    return TaskPlan(user_input="测试", task_type="test", complexity_level="simple", plan=Plan(steps=list(steps)))
+
+
+def test_resolve_dependencies(tmp_path):
+    executor = _executor(tmp_path)
+
+    # depends_on为空时依赖上一步，第一步没有依赖
+    assert executor._resolve_dependencies(_step("a"), 0) == []
+    assert executor._resolve_dependencies(_step("c"), 2) == [1]
+    # 参数中的步骤引用加入依赖
+    assert executor._resolve_dependencies(_step("c", depends_on=[], query="${step1.value}"), 2) == [0]
+    assert executor._resolve_dependencies(_step("c", depends_on=[2], query="${step1.value}"), 2) == [0, 1]
+    # 指向自身或后续步骤的依赖被忽略
+    assert executor._resolve_dependencies(_step("b", depends_on=[2, 3]), 1) == []
+    assert executor._resolve_dependencies(_step("b", depends_on=[], query="${step2.value}"), 1) == []
+
+
+def test_independent_steps_overlap(tmp_path):
+    tool_manager = _StubToolManager()
+
+    async def run():
+        executor = _executor(tmp_path, tool_manager)
+        return await executor.execute_plan(_task_plan(
+            _step("a", depends_on=[], delay=0.05), _step("b", depends_on=[], delay=0.05)
+        ))
+
+    result = asyncio.run(run())
+
+    assert result.success
+    assert tool_manager.peak["web_search_tool"] == 2
+    assert [item["step_description"] for item in result.results] == ["a", "b"]
+
+
+def test_default_dependency_chains_steps(tmp_path):
+    tool_manager = _StubToolManager()
+
+    async def run():
+        executor = _executor(tmp_path, tool_manager)
+        return await executor.execute_plan(_task_plan(_step("a", delay=0.02), _step("b", delay=0.02)))
+
+    assert asyncio.run(run()).success
+    assert tool_manager.timeline == [("start", "a"), ("end", "a"), ("start", "b"), ("end", "b")]
+
+
+def test_reference_adds_dependency(tmp_path):
+    tool_manager = _StubToolManager()
+
+    async def run():
+        executor = _executor(tmp_path, tool_manager)
+        return await executor.execute_plan(_task_plan(
+            _step("a", depends_on=[], delay=0.02), _step("b", depends_on=[], source="${step1.value}")
+        ))
+
+    result = asyncio.run(run())
+
+    assert result.success
+    assert tool_manager.timeline.index(("end", "a")) < tool_manager.timeline.index(("start", "b"))
+
+
+def test_tool_limit_does_not_hold_global_slots(tmp_path):
+    """图片步骤排队等待工具名额时，其他工具的就绪步骤仍能取得全局名额"""
+    tool_manager = _StubToolManager()
+
+    async def run():
+        executor = _executor(tmp_path, tool_manager)
+        return await executor.execute_plan(_task_plan(
+            *[_step(f"image{i}", "image_generation_tool", depends_on=[], delay=0.05) for i in range(3)],
+            _step("search", depends_on=[], delay=0.01)
+        ))
+
+    result = asyncio.run(run())
+
+    assert result.success
+    assert tool_manager.peak["image_generation_tool"] == 1
+    assert tool_manager.timeline.index(("end", "search")) < tool_manager.timeline.index(("end", "image0"))
+
+
+def test_failed_final_step_stops_run(tmp_path):
+    tool_manager = _StubToolManager()
+    final = _step("a", fail=True)
+    final.is_final = True
+
+    async def run():
+        executor = _executor(tmp_path, tool_manager)
+        return await executor.execute_plan(_task_plan(final, _step("b")))
+
+    result = asyncio.run(run())
+
+    assert not result.success
+    assert ("start", "b") not in tool_manager.timeline
+    assert [item["status"] for item in result.results] == [StepStatus.FAILED.value]
+
+
+def test_concurrent_executions_are_isolated(tmp_path):
+    """同一执行器并发执行两个任务：事件只投递给各自的监听器，状态按task_id查询，取消只影响目标任务"""
+    slow = _task_plan(_step("slow-1", depends_on=[], delay=5), _step("slow-2", depends_on=[]))
+    fast = _task_plan(_step("fast-1", depends_on=[], delay=0.1), _step("fast-2"))
+    events = {"slow": [], "fast": []}
+
+    async def run_plan(executor, name, task_plan):
+        with execution_context(name, listeners=[events[name].append]):
+            return await executor.execute_plan(task_plan, name)
+
+    async def run():
+        executor = _executor(tmp_path)
+        slow_run = asyncio.create_task(run_plan(executor, "slow", slow))
+        fast_run = asyncio.create_task(run_plan(executor, "fast", fast))
+        await asyncio.sleep(0.05)
+
+        statuses = {
+            task_plan.task_id: executor.get_execution_status(task_plan.task_id) for task_plan in (slow, fast)
+        }
+        running = executor.get_execution_status()
+
+        assert executor.cancel_task(slow.task_id)
+        fast_result = await fast_run
+        with pytest.raises(asyncio.CancelledError):
+            await slow_run
+        return statuses, running, fast_result, executor
+
+    statuses, running, fast_result, executor = asyncio.run(run())
+
+    assert statuses[slow.task_id]["user_id"] == "slow"
+    assert statuses[slow.task_id]["current_step"] == "slow-1"
+    assert statuses[fast.task_id]["user_id"] == "fast"
+    assert statuses[fast.task_id]["current_step"] == "fast-1"
+    assert {item["task_id"] for item in running["executions"]} == {slow.task_id, fast.task_id}
+
+    assert fast_result.success
+    assert fast.status == TaskStatus.COMPLETED
+    assert slow.status == TaskStatus.CANCELLED
+    assert slow.plan.steps[0].status == StepStatus.CANCELLED
+    assert executor.get_execution_status()["status"] == "idle"
+
+    for name, task_plan in (("slow", slow), ("fast", fast)):
+        task_ids = {event["data"]["task_id"] for event in events[name] if "task_id" in event["data"]}
+        descriptions = {event["data"]["description"] for event in events[name] if event["type"] == "step_start"}
+        assert task_ids == {task_plan.task_id}
+        assert descriptions and all(description.startswith(name) for description in descriptions)
+    assert "task_complete" in [event["type"] for event in events["fast"]]
+    assert "task_complete" not in [event["type"] for event in events["slow"]]
+
+
+def test_step_fails_after_tool_timeout(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TOOL_TIMEOUTS", {"web_search_tool": 0.05})
+    task_plan = _task_plan(_step("a", delay=5))
+
+    async def run():
+        return await _executor(tmp_path).execute_plan(task_plan)
+
+    result = asyncio.run(run())
+
+    step = task_plan.plan.steps[0]
+    assert not result.success
+    assert step.status == StepStatus.FAILED
+    assert "工具 web_search_tool 执行超时（0.05秒）" in step.error_message
+
+
+def test_task_deadline_shorter_than_tool_timeout(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TOOL_TIMEOUTS", {"web_search_tool": 5})
+
+    async def run():
+        executor = _executor(tmp_path)
+        with task_deadline(timeout=0.05, retry_budget=0):
+            await executor._call_tool_with_timeout("web_search_tool", {"name": "a", "delay": 5})
+
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(run())
+
+
+def test_cancel_mid_step_marks_cancelled_and_frees_slots(tmp_path):
+    task_plan = _task_plan(
+        _step("image", "image_generation_tool", depends_on=[], delay=5), _step("search", depends_on=[], delay=5)
+    )
+    results = []
+
+    async def run():
+        executor = _executor(tmp_path)
+        execution = asyncio.create_task(executor.execute_plan(task_plan))
+        await asyncio.sleep(0.05)
+        assert executor._step_semaphore.locked()
+
+        await executor._cancel_execution(execution, task_plan, results, reason="用户取消", status=StepStatus.CANCELLED)
+        freed = (executor._step_semaphore._value, executor._get_tool_semaphore("image_generation_tool")._value)
+
+        # 名额已释放：同一执行器可以继续执行新的任务
+        follow_up = await asyncio.wait_for(
+            executor.execute_plan(_task_plan(_step("next", "image_generation_tool"))), 1
+        )
+        return freed, follow_up
+
+    freed, follow_up = asyncio.run(run())
+
+    assert freed == (2, 1)
+    assert follow_up.success
+    assert task_plan.status == TaskStatus.CANCELLED
+    assert [step.status for step in task_plan.plan.steps] == [StepStatus.CANCELLED, StepStatus.CANCELLED]
+    assert {item["result"]["error"] for item in results} == {"用户取消"}
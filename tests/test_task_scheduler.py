@@ -0,0 +1,94 @@
+"""
+任务调度器测试
+"""
+
+import asyncio
+
+import pytest
+
+from core.task_scheduler import QueueFullError, TaskScheduler
+
+
+def test_round_robin_between_users():
+    started = []
+
+    async def runner(user_id, user_input):
+        started.append(user_input)
+        await asyncio.sleep(0)
+
+    async def run():
+        scheduler = TaskScheduler(runner, workers=1)
+        for user_id, user_input in [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1")]:
+            await scheduler.submit(user_id, user_input)
+        while scheduler.completed < 4:
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+
+    asyncio.run(run())
+    assert started == ["a1", "b1", "a2", "a3"]
+
+
+def test_one_running_task_per_user():
+    running = {"a": 0}
+    peak = []
+
+    async def runner(user_id, user_input):
+        running[user_id] += 1
+        peak.append(running[user_id])
+        await asyncio.sleep(0.01)
+        running[user_id] -= 1
+
+    async def run():
+        scheduler = TaskScheduler(runner, workers=3)
+        for index in range(3):
+            await scheduler.submit("a", str(index))
+        while scheduler.completed < 3:
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+
+    asyncio.run(run())
+    assert max(peak) == 1
+
+
+def test_queue_limits_reject_submissions():
+    async def run():
+        blocker = asyncio.Event()
+
+        async def runner(user_id, user_input):
+            await blocker.wait()
+
+        scheduler = TaskScheduler(runner, workers=1, max_queue=3, max_queue_per_user=2)
+        await scheduler.submit("a", "a1")
+        await scheduler.submit("a", "a2")
+        with pytest.raises(QueueFullError):
+            await scheduler.submit("a", "a3")
+
+        await scheduler.submit("b", "b1")
+        with pytest.raises(QueueFullError):
+            await scheduler.submit("c", "c1")
+
+        stats = scheduler.get_stats()
+        await scheduler.stop()
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats["rejected"] == 2
+    assert stats["queue_depth"] == 3
+
+
+def test_queue_positions_follow_dequeue_order():
+    async def run():
+        blocker = asyncio.Event()
+
+        async def runner(user_id, user_input):
+            await blocker.wait()
+
+        scheduler = TaskScheduler(runner, workers=1)
+        a1 = await scheduler.submit("a", "a1")
+        a2 = await scheduler.submit("a", "a2")
+        b1 = await scheduler.submit("b", "b1")
+        positions = [scheduler.get_position(task) for task in (a1, a2, b1)]
+        await scheduler.stop()
+        return positions
+
+    assert asyncio.run(run()) == [1, 3, 2]
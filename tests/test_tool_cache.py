@@ -0,0 +1,83 @@
+"""
+工具结果缓存测试
+"""
+
+import os
+
+from tools.tool_cache import MISS, ToolResultCache, parse_policies
+
+
+def test_parse_policies():
+    policies = parse_policies("read_file:file, web_search:ttl:60, bad, other:unknown")
+    assert policies == {"read_file": ("file", 0.0), "web_search": ("ttl", 60.0)}
+
+
+def test_uncached_tool_has_no_key():
+    cache = ToolResultCache({"read_file": ("file", 0.0)})
+    assert cache.make_key("generate_file", {"content": "x"}) is None
+
+
+def test_file_policy_invalidated_when_file_changes(tmp_path):
+    target = tmp_path / "data.txt"
+    target.write_text("v1", encoding="utf-8")
+    cache = ToolResultCache({"read_file": ("file", 0.0)})
+    args = {"file_path": str(target)}
+
+    key = cache.make_key("read_file", args)
+    cache.put("read_file", key, {"content": "v1"}, call_time=0.5)
+    assert cache.get("read_file", cache.make_key("read_file", args)) == {"content": "v1"}
+
+    target.write_text("version 2", encoding="utf-8")
+    assert cache.make_key("read_file", args) != key
+
+    target.write_text("v3", encoding="utf-8")
+    stat = os.stat(target)
+    os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.make_key("read_file", args) != key
+    assert cache.get("read_file", cache.make_key("read_file", args)) is MISS
+
+
+def test_missing_file_is_not_cached(tmp_path):
+    cache = ToolResultCache({"read_file": ("file", 0.0)})
+    assert cache.make_key("read_file", {"file_path": str(tmp_path / "missing.txt")}) is None
+
+
+def test_hits_return_independent_copies():
+    cache = ToolResultCache({"web_search": ("ttl", 60.0)})
+    key = cache.make_key("web_search", {"query": "q"})
+    cache.put("web_search", key, {"items": [1]}, call_time=1.0)
+
+    first = cache.get("web_search", key)
+    first["items"].append(2)
+    assert cache.get("web_search", key) == {"items": [1]}
+    assert cache.get_stats()["tools"]["web_search"]["hits"] == 2
+
+
+def test_errors_are_not_cached():
+    cache = ToolResultCache({"web_search": ("ttl", 60.0)})
+    key = cache.make_key("web_search", {"query": "q"})
+    cache.put("web_search", key, {"error": "timeout"}, call_time=1.0)
+    assert cache.get("web_search", key) is MISS
+
+
+def test_byte_bound_lru_evicts_least_recently_used():
+    cache = ToolResultCache({"web_search": ("ttl", 0.0)}, max_bytes=30)
+    keys = [cache.make_key("web_search", {"query": str(index)}) for index in range(3)]
+
+    cache.put("web_search", keys[0], "x" * 10, call_time=0.1)
+    cache.put("web_search", keys[1], "y" * 10, call_time=0.1)
+    cache.get("web_search", keys[0])
+    cache.put("web_search", keys[2], "z" * 10, call_time=0.1)
+
+    assert cache.get("web_search", keys[1]) is MISS
+    assert cache.get("web_search", keys[0]) == "x" * 10
+    stats = cache.get_stats()
+    assert stats["bytes"] <= 30
+    assert stats["tools"]["web_search"]["evictions"] == 1
+
+
+def test_oversized_result_not_kept_in_memory():
+    cache = ToolResultCache({"web_search": ("ttl", 0.0)}, max_bytes=8)
+    key = cache.make_key("web_search", {"query": "big"})
+    cache.put("web_search", key, "x" * 100, call_time=0.1)
+    assert cache.get_stats()["entries"] == 0
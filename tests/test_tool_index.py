@@ -0,0 +1,89 @@
+"""
+工具检索测试：分词、BM25检索与规划用工具清单
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from tools.tool_index import ToolIndex, tokenize
+from tools.tool_manager import ToolManager
+
+TOOLS = [
+    ("generate_answer_tool", "回答用户的问题", {"query": {"title": "Query"}}),
+    ("web_search_tool", "联网搜索最新资料", {"query": {"title": "Query"}}),
+    ("image_generation_tool", "根据文本描述生成图片", {"prompt": {"title": "Prompt"}}),
+    ("data_chart_tool", "将数据绘制为图表", {"data": {"title": "Data"}}),
+    ("read_file_tool", "读取本地文件内容", {"file_path": {"title": "File Path"}}),
+]
+
+
+class _FakeMCPClient:
+    def __init__(self, tools):
+        self.tools = tools
+        self.loads = 0
+
+    async def get_all_mcp_tools(self):
+        self.loads += 1
+        return [SimpleNamespace(name=name, description=description, args=args) for name, description, args in self.tools]
+
+
+def _tool_manager(tools=TOOLS):
+    mcp_client = _FakeMCPClient(tools)
+    tool_manager = ToolManager(mcp_client, tool_cache=None)
+    tool_manager.core_tool_names = ["generate_answer_tool"]
+    tool_manager.retrieval_top_k = 1
+    asyncio.run(tool_manager.load_all_tools())
+    return tool_manager, mcp_client
+
+
+def test_tokenize_cjk_unigrams_and_bigrams():
+    assert tokenize("生成图片") == ["生", "成", "图", "片", "生成", "成图", "图片"]
+
+
+def test_tokenize_splits_snake_and_camel_case():
+    assert tokenize("image_generation_tool") == ["image", "generation", "tool"]
+    assert tokenize("readFile PDFs") == ["read", "file", "pdfs"]
+
+
+def test_search_ranks_relevant_tool_and_excludes_zero_scores():
+    index = ToolIndex()
+    index.build([{"name": name, "description": description, "args": args} for name, description, args in TOOLS])
+
+    results = index.search("帮我生成一张图片")
+
+    assert results[0][0] == "image_generation_tool"
+    assert all(score > 0 for _, score in results)
+    assert "read_file_tool" not in [name for name, _ in results]
+    assert index.search("zzz") == []
+
+
+def test_core_tools_always_in_planning_catalog():
+    tool_manager, _ = _tool_manager()
+
+    names = [info["name"] for info in tool_manager.get_tools_for_planning("画一张数据图表")]
+
+    assert names == ["generate_answer_tool", "data_chart_tool"]
+    assert [info["name"] for info in tool_manager.get_tools_for_planning("zzz")] == ["generate_answer_tool"]
+    assert [info["name"] for info in tool_manager.get_core_tools_for_planning()] == ["generate_answer_tool"]
+    assert [info["name"] for info in tool_manager.get_retrieved_tools_for_planning("画一张数据图表")] == ["data_chart_tool"]
+    # 工具数超过核心工具与检索数量之和时才启用检索
+    tool_manager.retrieval_enabled = True
+    assert tool_manager.is_tool_retrieval_active()
+    tool_manager.retrieval_top_k = len(TOOLS)
+    assert not tool_manager.is_tool_retrieval_active()
+
+
+def test_index_rebuilt_on_forced_reload():
+    tool_manager, mcp_client = _tool_manager()
+    version = tool_manager.get_catalog_version()
+    mcp_client.tools = TOOLS + [("translate_tool", "将文本翻译为英文", {"text": {"title": "Text"}})]
+
+    asyncio.run(tool_manager.load_all_tools())
+    assert len(tool_manager.tool_index) == len(TOOLS)
+
+    asyncio.run(tool_manager.load_all_tools(force=True))
+
+    assert mcp_client.loads == 2
+    assert len(tool_manager.tool_index) == len(TOOLS) + 1
+    assert tool_manager.tool_index.search("翻译")[0][0] == "translate_tool"
+    assert tool_manager.get_catalog_version() != version
@@ -0,0 +1,64 @@
+"""
+工具LLM调用用量测试：用量随工具结果返回，由Web进程的模型路由器统计
+"""
+
+import asyncio
+
+from core.model_router import ModelRouter
+from tools.llm_usage import ROUTE_GENERATE, call_with_usage, split_usage, track_llm_call
+from tools.tool_manager import ToolManager
+from tools.worker_pool import ToolWorkerPool
+
+
+def _answer(query):
+    with track_llm_call(ROUTE_GENERATE, default_model="test-model", latency_budget=60) as call:
+        call.prompt_tokens = 3
+        call.completion_tokens = 5
+    return f"answer: {query}"
+
+
+def _generate(name):
+    with track_llm_call(ROUTE_GENERATE, default_model="test-model"):
+        pass
+    return {"success": True, "file_name": name}
+
+
+def _plain(value):
+    return value
+
+
+def test_text_result_round_trips_with_usage():
+    result, usage = split_usage(call_with_usage(_answer, "q"))
+    assert result == "answer: q"
+    assert len(usage) == 1
+    assert usage[0]["prompt_tokens"] == 3 and usage[0]["completion_tokens"] == 5
+    assert usage[0]["route"] == ROUTE_GENERATE and usage[0]["success"]
+
+
+def test_dict_result_keeps_fields_and_no_usage_is_untouched():
+    result, usage = split_usage(call_with_usage(_generate, "a.txt"))
+    assert result == {"success": True, "file_name": "a.txt"}
+    assert len(usage) == 1
+    assert call_with_usage(_plain, "x") == "x"
+    assert split_usage({"tool_result": "x"}) == ({"tool_result": "x"}, [])
+
+
+def test_usage_from_process_worker_reaches_router():
+    router = ModelRouter()
+    pool = ToolWorkerPool(process_workers=1, process_tools=["answer"])
+
+    class _Client:
+        async def call_mcp_tool(self, mcp_name, tool_name, args):
+            return await pool.run(tool_name, _answer, args["query"])
+
+    manager = ToolManager(_Client(), tool_cache=None, usage_recorder=router.record_usage)
+    manager.validate_tool_call = lambda tool_name, args: {"is_valid": True}
+    try:
+        result = asyncio.run(manager.call_tool("answer", {"query": "q"}))
+    finally:
+        pool.shutdown()
+
+    assert result == "answer: q"
+    stats = router.get_stats()[ROUTE_GENERATE]
+    assert stats["calls"] == 1
+    assert stats["prompt_tokens"] == 3 and stats["completion_tokens"] == 5
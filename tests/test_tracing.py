@@ -0,0 +1,36 @@
+"""
+任务追踪测试：追踪位于utils，通信层与工具层导入时不加载core
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from utils.tracing import span, task_trace
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_span_records_into_current_trace(tmp_path):
+    with span("outside") as s:
+        s.set(ignored=True)
+
+    with task_trace(str(tmp_path), task_id="t1") as trace:
+        with span("tool:web_search_tool", "tool") as s:
+            s.set(cached=False)
+
+    data = json.loads((tmp_path / "trace_t1.json").read_text(encoding="utf-8"))
+    names = [event["name"] for event in data["traceEvents"] if event.get("ph") == "X"]
+    assert names == ["tool:web_search_tool"]
+    assert trace.task_id == "t1"
+
+
+def test_communication_and_tools_do_not_import_core():
+    code = (
+        "import sys\n"
+        "import communication.mcp_client, tools.tool_manager, tools.worker_pool\n"
+        "print([m for m in sys.modules if m == 'core' or m.startswith('core.')])\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "[]"
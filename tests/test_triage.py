@@ -0,0 +1,159 @@
+"""
+任务分诊测试：并行分诊得到决定性结果后取消其余分类器，合并分诊失败时回退到并行分诊
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from openai import AsyncOpenAI
+
+from core.event_emitter import ExecutionEventEmitter
+from core.models import CombinedTriage, IsTaskOrConversation, Plan, TaskClarityScore, TaskPlan, TaskType
+from core.plan_cache import PlanCache
+from core.task_planner import TaskPlanner
+
+CLARITY = TaskClarityScore(clarity_score=8, has_clear_action=True, has_sufficient_params=True,
+                           is_simple_task=True, needs_clarification=False)
+
+
+class _FakeToolManager:
+    def get_catalog_version(self):
+        return "test"
+
+
+def _last_task() -> TaskPlan:
+    return TaskPlan(user_input="生成报告", task_type="文档处理", complexity_level="simple", plan=Plan(steps=[]))
+
+
+def _make_planner(behaviors):
+    """behaviors为分类器名称到(耗时, 结果)的映射，outcomes记录每个分类器是完成还是被取消"""
+    planner = TaskPlanner(
+        AsyncOpenAI(api_key="test", base_url="http://127.0.0.1:9/v1"),
+        _FakeToolManager(),
+        event_emitter=ExecutionEventEmitter(print_events=False),
+        plan_cache=PlanCache(max_entries=4, ttl=0)
+    )
+    outcomes = {}
+
+    def classifier(name):
+        async def run(*args, **kwargs):
+            delay, result = behaviors[name]
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                outcomes[name] = "cancelled"
+                raise
+            outcomes[name] = "done"
+            return result
+        return run
+
+    planner._detect_task_improvement = classifier("improvement")
+    planner._detect_conversation = classifier("conversation")
+    planner.clarity_analyzer.analyze_clarity = classifier("clarity")
+    planner._analyze_task_type = classifier("task_type")
+    return planner, outcomes
+
+
+def test_conversation_result_cancels_pending_classifiers():
+    planner, outcomes = _make_planner({
+        "conversation": (0, True), "clarity": (5, CLARITY), "task_type": (5, "通用任务")
+    })
+
+    triage = asyncio.run(planner._run_parallel_triage("你好"))
+
+    assert triage.is_conversation and not triage.is_improvement
+    assert sorted(triage.cancelled) == ["clarity", "task_type"]
+    assert outcomes == {"conversation": "done", "clarity": "cancelled", "task_type": "cancelled"}
+    assert triage.elapsed < 1
+
+
+def test_conversation_waits_for_improvement_check():
+    planner, outcomes = _make_planner({
+        "improvement": (0.05, False), "conversation": (0, True), "clarity": (5, CLARITY), "task_type": (5, "通用任务")
+    })
+
+    triage = asyncio.run(planner._run_parallel_triage("谢谢", _last_task()))
+
+    assert triage.is_conversation and not triage.is_improvement
+    assert outcomes["improvement"] == "done"
+    assert sorted(triage.cancelled) == ["clarity", "task_type"]
+
+
+def test_improvement_result_cancels_all_other_classifiers():
+    planner, outcomes = _make_planner({
+        "improvement": (0, True), "conversation": (5, False), "clarity": (5, CLARITY), "task_type": (5, "通用任务")
+    })
+
+    triage = asyncio.run(planner._run_parallel_triage("把报告改成英文", _last_task()))
+
+    assert triage.is_improvement
+    assert sorted(triage.cancelled) == ["clarity", "conversation", "task_type"]
+    assert set(outcomes.values()) == {"done", "cancelled"} and outcomes["improvement"] == "done"
+
+
+def test_task_waits_for_all_classifiers():
+    planner, outcomes = _make_planner({
+        "conversation": (0, False), "clarity": (0.02, CLARITY), "task_type": (0.01, "信息检索")
+    })
+
+    triage = asyncio.run(planner._run_parallel_triage("搜索今天的新闻"))
+
+    assert not triage.is_conversation
+    assert triage.cancelled == []
+    assert triage.clarity == CLARITY and triage.task_type == "信息检索"
+    assert set(outcomes.values()) == {"done"}
+
+
+def test_is_triage_decided():
+    planner, _ = _make_planner({})
+    with_improvement = {"improvement": None, "conversation": None}
+    without_improvement = {"conversation": None}
+
+    assert planner._is_triage_decided({"improvement": True}, with_improvement)
+    assert not planner._is_triage_decided({"conversation": True}, with_improvement)
+    assert planner._is_triage_decided({"conversation": True, "improvement": False}, with_improvement)
+    assert planner._is_triage_decided({"conversation": True}, without_improvement)
+    assert not planner._is_triage_decided({"conversation": False, "clarity": CLARITY}, without_improvement)
+
+
+def _combined_planner(parse):
+    planner, outcomes = _make_planner({
+        "conversation": (0, False), "clarity": (0, CLARITY), "task_type": (0, "信息检索")
+    })
+    planner.triage_mode = "combined"
+    planner.llm.parse = parse
+    return planner, outcomes
+
+
+def test_combined_triage_uses_single_call():
+    calls = []
+
+    async def parse(messages, response_format, **kwargs):
+        calls.append(kwargs.get("call_site"))
+        combined = CombinedTriage(conversation=IsTaskOrConversation(type="task"), clarity=CLARITY,
+                                  task_type=TaskType(type="数据分析"), is_improvement=True)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(parsed=combined))])
+
+    planner, outcomes = _combined_planner(parse)
+
+    triage = asyncio.run(planner._run_triage("分析销售数据"))
+
+    assert calls == ["triage"]
+    assert outcomes == {}
+    assert list(triage.timings) == ["combined"]
+    assert triage.task_type == "数据分析" and triage.clarity == CLARITY
+    # 没有上一个任务时不可能是改进请求
+    assert not triage.is_improvement and not triage.is_conversation
+
+
+def test_combined_triage_failure_falls_back_to_parallel():
+    async def parse(messages, response_format, **kwargs):
+        raise RuntimeError("结构化输出解析失败")
+
+    planner, outcomes = _combined_planner(parse)
+
+    triage = asyncio.run(planner._run_triage("搜索今天的新闻"))
+
+    assert outcomes == {"conversation": "done", "clarity": "done", "task_type": "done"}
+    assert set(triage.timings) == {"conversation", "clarity", "task_type"}
+    assert triage.task_type == "信息检索" and triage.clarity == CLARITY
@@ -4,8 +4,14 @@
 """
 
 from .tool_manager import ToolManager
+from .tool_index import ToolIndex
+from .tool_cache import ToolResultCache
+from .worker_pool import ToolWorkerPool
 from .local_tools import *
 
 __all__ = [
-    'ToolManager'
+    'ToolManager',
+    'ToolIndex',
+    'ToolResultCache',
+    'ToolWorkerPool'
 ] 
\ No newline at end of file
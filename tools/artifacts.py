@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+产出物清单
+生成文件的工具在返回结果中附带 "artifacts" 清单（路径、MIME类型、大小、内容哈希），
+文件信息在工具进程中写完文件时即确定，执行器与FileManager直接按清单登记，不再按扩展名猜测、探测路径。
+清单条目为普通字典（经MCP以JSON传输），字段与 core.models.Artifact 一致
+"""
+
+import hashlib
+import mimetypes
+import os
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+# 结果中产出物清单的字段名
+ARTIFACTS_KEY = "artifacts"
+
+_DEFAULT_MIME_TYPE = "application/octet-stream"
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_artifact(file_path: str, file_type: Optional[str] = None, description: str = "") -> Dict[str, Any]:
+    """
+    描述刚写入的本地文件
+
+    Args:
+        file_path: 文件路径
+        file_type: 文件类型，为空时取扩展名
+        description: 文件描述
+
+    Returns:
+        Dict[str, Any]: 产出物清单条目
+    """
+    path = os.path.abspath(file_path)
+    name = os.path.basename(path)
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return {
+        "path": path,
+        "url": None,
+        "name": name,
+        "mime_type": mimetypes.guess_type(name)[0] or _DEFAULT_MIME_TYPE,
+        "size": size,
+        "sha256": digest.hexdigest(),
+        "file_type": file_type or os.path.splitext(name)[1].lstrip(".").lower() or "unknown",
+        "description": description
+    }
+
+
+def remote_artifact(url: str, mime_type: Optional[str] = None, file_type: Optional[str] = None,
+                    description: str = "") -> Dict[str, Any]:
+    """
+    描述远程资源（如图片生成服务返回的URL），不下载内容，大小与哈希为空
+
+    Args:
+        url: 资源地址
+        mime_type: MIME类型，为空时按URL路径推断
+        file_type: 文件类型，为空时取URL路径的扩展名
+        description: 文件描述
+
+    Returns:
+        Dict[str, Any]: 产出物清单条目
+    """
+    name = os.path.basename(urlparse(url).path) or "artifact"
+    return {
+        "path": None,
+        "url": url,
+        "name": name,
+        "mime_type": mime_type or mimetypes.guess_type(name)[0] or _DEFAULT_MIME_TYPE,
+        "size": None,
+        "sha256": None,
+        "file_type": file_type or os.path.splitext(name)[1].lstrip(".").lower() or "unknown",
+        "description": description
+    }
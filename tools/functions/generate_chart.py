@@ -2,9 +2,13 @@ import re
 from openai import OpenAI  
 import sys
 import os
+import time
 from pandas import DataFrame
 from pathlib import Path
 from tools.functions.prompts.chart_prompt import prompt
+from tools.llm_usage import ROUTE_GENERATE, track_llm_call
+from tools.artifacts import ARTIFACTS_KEY, file_artifact
+from config import settings
 # 设置默认编码
 sys.stdout.reconfigure(encoding='utf-8')
 
@@ -36,8 +40,18 @@ class Generate_chart:
         max_retries = 10
         retry_count = 0
         last_error = None
+        # 重试次数之外再限制总耗时，避免修正循环长时间占用工具调用
+        deadline = time.monotonic() + settings.CHART_GENERATION_TIMEOUT
 
         while retry_count < max_retries:
+            if time.monotonic() > deadline:
+                print(f"图表生成超过{settings.CHART_GENERATION_TIMEOUT:.0f}秒，停止重试。")
+                return {
+                    "type": "chart",
+                    "success": False,
+                    "error": f"图表生成超时（{settings.CHART_GENERATION_TIMEOUT:.0f}秒）。最后一次错误: {last_error}",
+                    "message": "图表生成失败"
+                }
             try:
                 if last_error:
                     # 如果存在上一次的错误，将其添加到消息中
@@ -46,11 +60,16 @@ class Generate_chart:
                 else:
                     current_messages = messages
 
-                response = self.client.chat.completions.create(  
-                    model= os.getenv("DEFAULT_MODEL_NAME"),  
-                    messages=current_messages,
-                    stream=False
-                )  
+                with track_llm_call(
+                    ROUTE_GENERATE, default_model=os.getenv("DEFAULT_MODEL_NAME"), latency_budget=60
+                ) as call:
+                    response = self.client.chat.completions.create(  
+                        model=call.model,  
+                        timeout=call.timeout,
+                        messages=current_messages,
+                        stream=False
+                    )  
+                    call.add_usage(response.usage)
                 
                 response_code = response.choices[0].message.content  
                 code_blocks = re.findall(r'```(.*?)```', response_code, re.DOTALL)  
@@ -93,7 +112,8 @@ class Generate_chart:
                                 "file_path": chart_path,
                                 "file_name": chart_filename,
                                 "file_type": "html",
-                                "message": f"图表生成成功！已保存为: {chart_filename}"
+                                "message": f"图表生成成功！已保存为: {chart_filename}",
+                                ARTIFACTS_KEY: [file_artifact(chart_path, "html", "图表文件")]
                             }
                     except Exception as e:
                         print(f"执行代码块时出错: {e}")
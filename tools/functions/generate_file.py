@@ -3,6 +3,8 @@ import os
 import time
 from dotenv import load_dotenv
 from pathlib import Path
+from tools.llm_usage import ROUTE_GENERATE, track_llm_call
+from utils.tokens import estimate_tokens
 
 # 加载根目录的.env文件
 root_dir = Path(__file__).parent.parent.parent  # 获取项目根目录
@@ -32,24 +34,30 @@ class Generate_file_Class:
             system_prompt = self._get_system_prompt()
             
             print(f"📝 正在生成 {self.file_type} 文件内容...")
-            response = self.client.chat.completions.create(
-                model=os.getenv("DEFAULT_MODEL_NAME"),
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": self.prompt}
-                ],
-                temperature=0.7,
-                stream=True
-            )
-            
-            # 处理流式响应
-            full_response = ""
-            for chunk in response:
-                if chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
-                    print(content, end="", flush=True)
-                    full_response += content
-            print()  # 换行
+            with track_llm_call(
+                ROUTE_GENERATE, default_model=os.getenv("DEFAULT_MODEL_NAME"), latency_budget=120
+            ) as call:
+                response = self.client.chat.completions.create(
+                    model=call.model,
+                    timeout=call.timeout,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": self.prompt}
+                    ],
+                    temperature=0.7,
+                    stream=True
+                )
+                
+                # 处理流式响应
+                full_response = ""
+                for chunk in response:
+                    if chunk.choices[0].delta.content:
+                        content = chunk.choices[0].delta.content
+                        print(content, end="", flush=True)
+                        full_response += content
+                print()  # 换行
+                call.prompt_tokens = estimate_tokens(system_prompt + self.prompt)
+                call.completion_tokens = estimate_tokens(full_response)
             
             return full_response
             
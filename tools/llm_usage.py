@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+工具内的LLM调用
+MCP服务器及其工作进程不导入core：调用类别对应的模型按settings.MODEL_ROUTES选择，调用超时取settings.LLM_CALL_TIMEOUT。
+工具执行期间的LLM调用（模型、耗时、token用量）随工具结果返回（llm_usage字段），
+由Web进程的ToolManager取出后交给模型路由器统计，工作进程中不保存任何统计
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import settings
+
+# 调用类别（与core.model_router中的类别一致）
+ROUTE_CHAT = "chat"
+ROUTE_GENERATE = "generate"
+
+# 结果中LLM调用用量的字段名
+USAGE_KEY = "llm_usage"
+# 非字典结果附带用量时，原结果放在该字段中，ToolManager取出用量后还原
+RESULT_KEY = "tool_result"
+
+# 当前工具调用中的LLM调用记录，未在call_with_usage中执行时为None（不记录）
+_current_calls: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("tool_llm_calls", default=None)
+
+
+def resolve_model(route: str, default_model: Optional[str] = None) -> str:
+    """获取调用类别对应的模型，类别未配置模型时使用default_model"""
+    return settings.MODEL_ROUTES.get(route) or default_model or settings.LLM_DEFAULT_MODEL
+
+
+class ToolLLMCall:
+    """一次LLM调用的模型、超时与token用量，在track_llm_call上下文中填写"""
+
+    def __init__(self, route: str, model: str, timeout: Optional[float] = None):
+        self.route = route
+        self.model = model
+        self.timeout = timeout
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add_usage(self, usage: Any) -> None:
+        """累加响应中的token用量（usage为空时忽略）"""
+        if usage:
+            self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
+
+@contextmanager
+def track_llm_call(route: str, default_model: Optional[str] = None,
+                   latency_budget: Optional[float] = None) -> Iterator[ToolLLMCall]:
+    """
+    工具内LLM调用的上下文：进入时选择模型与超时，退出时把耗时与用量记入当前工具调用的结果
+
+    用法：
+        with track_llm_call(ROUTE_GENERATE, latency_budget=120) as call:
+            response = client.chat.completions.create(model=call.model, timeout=call.timeout, ...)
+            call.add_usage(response.usage)
+    """
+    call = ToolLLMCall(route, resolve_model(route, default_model), settings.LLM_CALL_TIMEOUT or None)
+    start_time = time.perf_counter()
+    success = False
+    try:
+        yield call
+        success = True
+    finally:
+        calls = _current_calls.get()
+        if calls is not None:
+            calls.append({
+                "route": route,
+                "model": call.model,
+                "latency": time.perf_counter() - start_time,
+                "prompt_tokens": call.prompt_tokens,
+                "completion_tokens": call.completion_tokens,
+                "success": success,
+                "latency_budget": latency_budget
+            })
+
+
+def call_with_usage(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    执行工具函数并把其间的LLM调用用量附在结果中（模块级函数，可在工作进程中执行）
+
+    字典结果增加llm_usage字段，其他结果包装为 {"tool_result": 原结果, "llm_usage": [...]}；没有LLM调用时原样返回
+    """
+    calls: List[Dict[str, Any]] = []
+    token = _current_calls.set(calls)
+    try:
+        result = func(*args)
+    finally:
+        _current_calls.reset(token)
+    if not calls:
+        return result
+    if isinstance(result, dict):
+        return {**result, USAGE_KEY: calls}
+    return {RESULT_KEY: result, USAGE_KEY: calls}
+
+
+def split_usage(result: Any) -> Tuple[Any, List[Dict[str, Any]]]:
+    """
+    从工具结果中取出LLM调用用量
+
+    Returns:
+        Tuple[Any, List[Dict[str, Any]]]: (去掉用量后的结果, 用量记录列表)
+    """
+    if not isinstance(result, dict) or USAGE_KEY not in result:
+        return result, []
+    usage = result[USAGE_KEY] if isinstance(result[USAGE_KEY], list) else []
+    result = {key: value for key, value in result.items() if key != USAGE_KEY}
+    if set(result) == {RESULT_KEY}:
+        result = result[RESULT_KEY]
+    return result, usage
@@ -7,6 +7,8 @@ from pandas import DataFrame
 from tools.functions.read_file_function import ReadFileFunction
 from tools.functions.generate_file import Generate_file
 from tools.functions.generate_chart import Generate_chart
+from tools.artifacts import ARTIFACTS_KEY, file_artifact, remote_artifact
+from config import settings
 
 # 网络检索
 class SearxngSearch:
@@ -86,16 +88,30 @@ def image_generation(prompt:str, negative_prompt: str = None, size:str = "1024x1
         }
     }
     try:
-        response = requests.post(url, json=json_data, headers=headers)
+        response = requests.post(url, json=json_data, headers=headers, timeout=30)
         response.raise_for_status()
         data = response.json()
         task_id = data.get("output").get("task_id")
-        while True:
-            img_response = requests.get(image_url.format(task_id=task_id), headers=img_headers)
+        # 轮询有最长等待时间，生成任务失败或超时都会结束轮询，避免一直占用工具调用
+        deadline = time.monotonic() + settings.IMAGE_GENERATION_POLL_TIMEOUT
+        while time.monotonic() < deadline:
+            img_response = requests.get(image_url.format(task_id=task_id), headers=img_headers, timeout=30)
             img_data = img_response.json()
-            if img_data.get("output").get("task_status") == "SUCCEEDED":
-                return img_data.get("output").get("results")
+            task_status = img_data.get("output").get("task_status")
+            if task_status == "SUCCEEDED":
+                results = img_data.get("output").get("results")
+                return {
+                    "success": True,
+                    "images": results,
+                    ARTIFACTS_KEY: [
+                        remote_artifact(item["url"], file_type="png", description=prompt)
+                        for item in results if isinstance(item, dict) and item.get("url")
+                    ]
+                }
+            if task_status in ("FAILED", "CANCELED", "UNKNOWN"):
+                return {"error": f"图片生成任务{task_status}: {img_data.get('output').get('message', '')}"}
             time.sleep(1)
+        return {"error": f"图片生成超时（{settings.IMAGE_GENERATION_POLL_TIMEOUT:.0f}秒），任务ID: {task_id}"}
     except Exception as e:
         return {"error": str(e)}
     
@@ -230,6 +246,9 @@ def file_generation(prompt: str, file_type: str = "txt", file_name: str = "", ou
         
         # 清理文件名，移除可能的路径分隔符
         file_name = file_name.replace('/', '_').replace('\\', '_')
+        # 没有后缀时按文件类型补上，产出物清单中的文件名即最终文件名
+        if not os.path.splitext(file_name)[1] and file_type:
+            file_name = f"{file_name}.{file_type}"
 
         full_file_name = f"{file_name}"
         file_path = os.path.join(output_dir, full_file_name)
@@ -250,7 +269,8 @@ def file_generation(prompt: str, file_type: str = "txt", file_name: str = "", ou
             "file_path": file_path,
             "file_name": full_file_name,
             "file_type": file_type,
-            "file_size": len(content)
+            "file_size": len(content),
+            ARTIFACTS_KEY: [file_artifact(file_path, file_type)]
         }
         
     except Exception as e:
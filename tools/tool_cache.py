@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ToolResultCache - 工具结果缓存
+按工具配置缓存策略，相同参数的工具调用直接复用结果，不再经过MCP：
+    file - 按文件路径 + 修改时间 + 大小缓存（文件变化后自动失效），用于读取类工具
+    ttl  - 按参数缓存固定时长，用于搜索类工具
+未配置策略的工具（文件、图片、图表生成等有副作用的工具）从不缓存
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+POLICY_FILE = "file"
+POLICY_TTL = "ttl"
+
+# file策略中表示文件路径的参数名
+_FILE_PATH_ARG = "file_path"
+
+# 未命中时get返回的哨兵（缓存的结果本身可能是None或空字符串）
+MISS = object()
+
+
+def parse_policies(spec: str) -> Dict[str, Tuple[str, float]]:
+    """
+    解析缓存策略配置
+
+    Args:
+        spec: 格式 "工具名:file,工具名:ttl:秒数"
+
+    Returns:
+        Dict[str, Tuple[str, float]]: 工具名到 (策略, TTL秒数) 的映射，file策略的TTL为0（不过期）
+    """
+    policies = {}
+    for item in spec.split(","):
+        parts = [part.strip() for part in item.split(":")]
+        if len(parts) < 2 or not parts[0]:
+            continue
+        name, policy = parts[0], parts[1]
+        if policy == POLICY_FILE:
+            policies[name] = (POLICY_FILE, 0.0)
+        elif policy == POLICY_TTL and len(parts) == 3:
+            policies[name] = (POLICY_TTL, float(parts[2]))
+        else:
+            logger.warning(f"忽略无法识别的工具缓存策略: {item}")
+    return policies
+
+
+class ToolResultCache:
+    """工具结果缓存 - 按序列化字节数限制的LRU内存缓存，可选磁盘缓存，按工具统计命中率"""
+
+    def __init__(self, policies: Dict[str, Tuple[str, float]], max_bytes: int = 64 * 1024 * 1024,
+                 cache_dir: Optional[str] = None):
+        """
+        初始化工具结果缓存
+
+        Args:
+            policies: 工具名到 (策略, TTL秒数) 的映射，见parse_policies
+            max_bytes: 内存中缓存结果序列化后的总字节上限，超出后淘汰最久未使用的条目
+            cache_dir: 磁盘缓存目录，为空时仅使用内存缓存
+        """
+        self.policies = dict(policies)
+        self.max_bytes = max_bytes
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        # 值为 (工具名, 条目)，条目中的结果以JSON文本保存，命中时反序列化得到独立副本
+        self._entries: "OrderedDict[str, Tuple[str, Dict[str, Any]]]" = OrderedDict()
+        self._bytes = 0
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        logger.info(f"ToolResultCache初始化完成，策略: {self.policies or '无'}，内存上限: {max_bytes}字节，"
+                    f"磁盘目录: {self.cache_dir or '无'}")
+
+    def make_key(self, tool_name: str, args: Dict[str, Any]) -> Optional[str]:
+        """
+        生成缓存键
+
+        Returns:
+            Optional[str]: 缓存键；工具不缓存、参数无法序列化或文件无法访问时返回None
+        """
+        policy = self.policies.get(tool_name)
+        if policy is None:
+            return None
+        try:
+            raw = f"{tool_name}\n{json.dumps(args, ensure_ascii=False, sort_keys=True)}"
+        except (TypeError, ValueError):
+            return None
+
+        if policy[0] == POLICY_FILE:
+            file_path = args.get(_FILE_PATH_ARG)
+            if not isinstance(file_path, str):
+                return None
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                return None
+            raw += f"\n{os.path.abspath(file_path)}\n{stat.st_mtime_ns}\n{stat.st_size}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, tool_name: str, key: str) -> Any:
+        """
+        查询缓存
+
+        Returns:
+            Any: 命中时返回结果副本，未命中返回MISS
+        """
+        stats = self._tool_stats(tool_name)
+        item = self._entries.get(key)
+        entry = item[1] if item else self._load_from_disk(key)
+        if entry is not None and self._is_expired(entry):
+            stats["expirations"] += 1
+            self._remove(key)
+            entry = None
+
+        if entry is None:
+            stats["misses"] += 1
+            return MISS
+
+        if item is None:
+            self._store(key, tool_name, entry)
+        else:
+            self._entries.move_to_end(key)
+        stats["hits"] += 1
+        stats["saved_seconds"] += entry["call_time"]
+        return json.loads(entry["result"])
+
+    def put(self, tool_name: str, key: str, result: Any, call_time: float) -> None:
+        """
+        写入缓存，执行失败的结果（包含error字段的字典）不缓存
+
+        Args:
+            tool_name: 工具名称
+            key: make_key生成的缓存键
+            result: 工具执行结果
+            call_time: 本次调用耗时(秒)，用于统计缓存节省的时间
+        """
+        if isinstance(result, dict) and result.get("error"):
+            return
+        try:
+            serialized = json.dumps(result, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return
+        ttl = self.policies[tool_name][1]
+        entry = {
+            "result": serialized,
+            "call_time": call_time,
+            "expires_at": time.time() + ttl if ttl > 0 else None
+        }
+        self._store(key, tool_name, entry)
+        self._save_to_disk(key, entry)
+
+    def clear(self) -> None:
+        """清空内存与磁盘缓存"""
+        self._entries.clear()
+        self._bytes = 0
+        if self.cache_dir:
+            for cache_file in self.cache_dir.glob("*.json"):
+                cache_file.unlink(missing_ok=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存占用与各工具的命中统计"""
+        tools = {}
+        for tool_name, stats in self._stats.items():
+            lookups = stats["hits"] + stats["misses"]
+            tools[tool_name] = {
+                **stats,
+                "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+                "saved_seconds": round(stats["saved_seconds"], 3)
+            }
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "tools": tools
+        }
+
+    def _tool_stats(self, tool_name: str) -> Dict[str, float]:
+        return self._stats.setdefault(tool_name, {
+            "hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "saved_seconds": 0.0
+        })
+
+    @staticmethod
+    def _is_expired(entry: Dict[str, Any]) -> bool:
+        return entry["expires_at"] is not None and time.time() > entry["expires_at"]
+
+    def _store(self, key: str, tool_name: str, entry: Dict[str, Any]) -> None:
+        """写入内存并按字节上限LRU淘汰（单个结果超过上限时只保存在磁盘）"""
+        size = len(entry["result"].encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        self._discard(key)
+        self._entries[key] = (tool_name, entry)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            evicted_key, (evicted_tool, _) = next(iter(self._entries.items()))
+            self._discard(evicted_key)
+            self._tool_stats(evicted_tool)["evictions"] += 1
+
+    def _discard(self, key: str) -> None:
+        """从内存中移除条目"""
+        item = self._entries.pop(key, None)
+        if item:
+            self._bytes -= len(item[1]["result"].encode("utf-8"))
+
+    def _remove(self, key: str) -> None:
+        self._discard(key)
+        if self.cache_dir:
+            (self.cache_dir / f"{key}.json").unlink(missing_ok=True)
+
+    def _load_from_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.cache_dir:
+            return None
+        cache_file = self.cache_dir / f"{key}.json"
+        if not cache_file.exists():
+            return None
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"读取工具缓存文件失败: {cache_file} - {e}")
+            return None
+
+    def _save_to_disk(self, key: str, entry: Dict[str, Any]) -> None:
+        if not self.cache_dir:
+            return
+        cache_file = self.cache_dir / f"{key}.json"
+        try:
+            with open(cache_file, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+        except OSError as e:
+            logger.warning(f"写入工具缓存文件失败: {cache_file} - {e}")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ToolIndex - 工具检索索引
+基于BM25对工具名称、描述和参数定义建立本地索引，规划时只选取与用户需求相关的工具
+"""
+
+import logging
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_ASCII_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_CJK_RUN_PATTERN = re.compile(r"[\u4e00-\u9fff]+")
+_CAMEL_CASE_PATTERN = re.compile(r"([a-z0-9])([A-Z])")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    分词：英文按单词（拆分下划线与驼峰命名），中文按单字与相邻双字
+
+    Args:
+        text: 待分词文本
+
+    Returns:
+        List[str]: 词项列表
+    """
+    text = _CAMEL_CASE_PATTERN.sub(r"\1 \2", text).lower()
+    tokens = _ASCII_WORD_PATTERN.findall(text)
+    for run in _CJK_RUN_PATTERN.findall(text):
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def tool_document(tool_info: Dict[str, Any]) -> str:
+    """将工具信息拼接为待索引文本（名称、描述、参数名及参数说明）"""
+    parts = [tool_info.get("name", ""), tool_info.get("description") or ""]
+    args = tool_info.get("args") or {}
+    if isinstance(args, dict):
+        for arg_name, arg_schema in args.items():
+            parts.append(arg_name)
+            if isinstance(arg_schema, dict):
+                parts.append(str(arg_schema.get("title", "")))
+                parts.append(str(arg_schema.get("description", "")))
+    return " ".join(parts)
+
+
+class ToolIndex:
+    """工具检索索引 - BM25"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        初始化工具索引
+
+        Args:
+            k1: BM25词频饱和参数
+            b: BM25文档长度归一化参数
+        """
+        self.k1 = k1
+        self.b = b
+        self._names: List[str] = []
+        self._term_freqs: List[Counter] = []
+        self._doc_lengths: List[int] = []
+        self._doc_freqs: Counter = Counter()
+        self._avg_doc_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def build(self, tools_info: List[Dict[str, Any]]) -> None:
+        """
+        根据工具信息重建索引
+
+        Args:
+            tools_info: 工具信息列表（name/description/args）
+        """
+        self._names = []
+        self._term_freqs = []
+        self._doc_lengths = []
+        self._doc_freqs = Counter()
+
+        for tool_info in tools_info:
+            tokens = tokenize(tool_document(tool_info))
+            term_freq = Counter(tokens)
+            self._names.append(tool_info["name"])
+            self._term_freqs.append(term_freq)
+            self._doc_lengths.append(len(tokens))
+            self._doc_freqs.update(term_freq.keys())
+
+        self._avg_doc_length = sum(self._doc_lengths) / len(self._doc_lengths) if self._doc_lengths else 0.0
+        logger.info(f"工具检索索引已重建，共{len(self._names)}个工具，{len(self._doc_freqs)}个词项")
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """
+        检索与查询最相关的工具
+
+        Args:
+            query: 查询文本（通常为用户输入）
+            top_k: 返回的工具数量
+
+        Returns:
+            List[Tuple[str, float]]: (工具名称, 相关度得分) 列表，按得分降序，不含零分工具
+        """
+        query_terms = set(tokenize(query))
+        total_docs = len(self._names)
+        if not query_terms or not total_docs:
+            return []
+
+        scores = []
+        for name, term_freq, doc_length in zip(self._names, self._term_freqs, self._doc_lengths):
+            score = 0.0
+            for term in query_terms:
+                freq = term_freq.get(term)
+                if not freq:
+                    continue
+                doc_freq = self._doc_freqs[term]
+                idf = math.log(1 + (total_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * doc_length / self._avg_doc_length)
+                score += idf * freq * (self.k1 + 1) / (freq + norm)
+            if score > 0:
+                scores.append((name, score))
+
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores[:top_k]
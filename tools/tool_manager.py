@@ -7,8 +7,10 @@ ToolManager - 工具管理器（简化版）
 """
 
 import asyncio
+import hashlib
 import logging
-from typing import Dict, Any, List, Optional
+import time
+from typing import Dict, Any, List, Optional, Callable
 import os
 import json
 import sys
@@ -19,6 +21,11 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from communication.mcp_client import MultiMCPClient
+from config import settings
+from utils.tracing import span
+from tools.tool_index import ToolIndex
+from tools.tool_cache import MISS, ToolResultCache, parse_policies
+from tools.llm_usage import split_usage
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -26,22 +33,43 @@ logger = logging.getLogger(__name__)
 class ToolManager:
     """工具管理器 - 统一从MCP获取所有工具"""
     
-    def __init__(self, mcp_client: MultiMCPClient):
+    def __init__(self, mcp_client: MultiMCPClient, tool_cache: Optional[ToolResultCache] = None,
+                 usage_recorder: Optional[Callable[[Dict[str, Any]], None]] = None):
         """
         初始化工具管理器
         
         Args:
             mcp_client: MCP客户端
+            tool_cache: 工具结果缓存，为空时按settings创建（TOOL_CACHE_ENABLED为false时不缓存）
+            usage_recorder: 工具结果中附带的LLM调用用量的接收函数（每次调用一条记录），为空时丢弃
         """
         self.mcp_client = mcp_client
+        self.usage_recorder = usage_recorder
         self.available_tools = []
         self._tools_loaded = False
+        self._catalog_version = None
+        self.tool_index = ToolIndex()
+        self.core_tool_names = list(settings.TOOL_RETRIEVAL_CORE_TOOLS)
+        self.retrieval_top_k = settings.TOOL_RETRIEVAL_TOP_K
+        self.retrieval_enabled = settings.TOOL_RETRIEVAL_ENABLED
+        if tool_cache is None and settings.TOOL_CACHE_ENABLED:
+            tool_cache = ToolResultCache(
+                parse_policies(settings.TOOL_CACHE_POLICIES),
+                max_bytes=settings.TOOL_CACHE_MAX_BYTES,
+                cache_dir=settings.TOOL_CACHE_DIR or None
+            )
+        self.tool_cache = tool_cache
         
         logger.info("ToolManager初始化完成")
     
-    async def load_all_tools(self) -> None:
-        """从MCP服务器加载所有可用工具"""
-        if self._tools_loaded:
+    async def load_all_tools(self, force: bool = False) -> None:
+        """
+        从MCP服务器加载所有可用工具
+        
+        Args:
+            force: 是否强制重新加载（MCP服务器工具变化后刷新）
+        """
+        if self._tools_loaded and not force:
             return
             
         try:
@@ -49,6 +77,8 @@ class ToolManager:
             
             # 从MCP获取所有工具
             self.available_tools = await self.mcp_client.get_all_mcp_tools()
+            self._catalog_version = None
+            self.tool_index.build(self.get_tools_for_planning())
             
             self._tools_loaded = True
             logger.info(f"工具加载完成，共加载{len(self.available_tools)}个工具")
@@ -118,6 +148,35 @@ class ToolManager:
         if not validation_result["is_valid"]:
                 raise ValueError(f"工具调用验证失败: {validation_result['error_message']}")
         
+        with span(f"tool:{tool_name}", "tool") as tool_span:
+            cache_key = self.tool_cache.make_key(tool_name, args) if self.tool_cache else None
+            if cache_key:
+                cached_result = self.tool_cache.get(tool_name, cache_key)
+                if cached_result is not MISS:
+                    logger.info(f"♻️ 工具结果缓存命中: {tool_name}")
+                    tool_span.set(cached=True)
+                    return cached_result
+
+            start_time = time.perf_counter()
+            result = self._take_usage(await self._call_mcp_tool(tool_name, args))
+            if cache_key:
+                self.tool_cache.put(tool_name, cache_key, result, time.perf_counter() - start_time)
+            tool_span.set(cached=False)
+            return result
+    
+    def _take_usage(self, result: Any) -> Any:
+        """取出工具结果中附带的LLM调用用量交给usage_recorder，返回不含用量的结果（缓存的也是该结果）"""
+        result, usage = split_usage(result)
+        if self.usage_recorder:
+            for call in usage:
+                try:
+                    self.usage_recorder(call)
+                except Exception as e:
+                    logger.warning(f"记录工具LLM调用用量失败: {e}")
+        return result
+    
+    async def _call_mcp_tool(self, tool_name: str, args: Dict[str, Any]) -> Any:
+        """通过MCP调用工具并解析返回内容"""
         try:
             # 统一通过MCP调用工具
             result = await self.mcp_client.call_mcp_tool(
@@ -159,8 +218,17 @@ class ToolManager:
             logger.error(f"工具调用失败: {tool_name} - {str(e)}")
             raise
     
-    def get_tools_for_planning(self) -> List[Dict[str, Any]]:
-        """获取用于任务规划的工具信息"""
+    def get_tools_for_planning(self, query: Optional[str] = None, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        获取用于任务规划的工具信息
+        
+        Args:
+            query: 查询文本，为空时返回全部工具；否则返回核心工具与检索出的相关工具
+            top_k: 检索的相关工具数量，默认settings.TOOL_RETRIEVAL_TOP_K
+            
+        Returns:
+            List[Dict]: 工具信息列表，保持工具清单原有顺序
+        """
         tools_info = []
         for tool in self.available_tools:
             tools_info.append({
@@ -168,11 +236,42 @@ class ToolManager:
                 "description": tool.description,
                 "args": tool.args
             })
-        return tools_info
+        if query is None:
+            return tools_info
+        
+        selected = set(self.core_tool_names)
+        selected.update(name for name, _ in self.tool_index.search(query, top_k or self.retrieval_top_k))
+        return [info for info in tools_info if info["name"] in selected]
+    
+    def is_tool_retrieval_active(self) -> bool:
+        """工具数量超过核心工具与检索数量之和时才启用检索，工具较少时直接提供全部工具"""
+        return self.retrieval_enabled and len(self.available_tools) > len(self.core_tool_names) + self.retrieval_top_k
+    
+    def get_core_tools_for_planning(self) -> List[Dict[str, Any]]:
+        """获取核心工具信息（每次规划都会提供的工具）"""
+        core_names = set(self.core_tool_names)
+        return [info for info in self.get_tools_for_planning() if info["name"] in core_names]
+    
+    def get_retrieved_tools_for_planning(self, query: str, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """获取与查询相关的非核心工具信息"""
+        core_names = set(self.core_tool_names)
+        return [info for info in self.get_tools_for_planning(query, top_k) if info["name"] not in core_names]
     
-    def generate_tool_constraint_prompt(self) -> str:
-        """生成工具约束提示词"""
-        available_tools = self.get_available_tool_names()
+    def get_catalog_version(self) -> str:
+        """获取工具清单版本（规划用工具信息的哈希），工具增删或参数变化时版本随之改变"""
+        if self._catalog_version is None:
+            catalog = json.dumps(self.get_tools_for_planning(), ensure_ascii=False, sort_keys=True, default=str)
+            self._catalog_version = hashlib.sha256(catalog.encode("utf-8")).hexdigest()[:16]
+        return self._catalog_version
+    
+    def generate_tool_constraint_prompt(self, tool_names: Optional[List[str]] = None) -> str:
+        """
+        生成工具约束提示词
+        
+        Args:
+            tool_names: 提示词中列出的工具名称，默认为全部可用工具
+        """
+        available_tools = tool_names if tool_names is not None else self.get_available_tool_names()
         return f"""
 重要约束：你只能使用以下可用工具，不得创造或使用不存在的工具：
 
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ToolWorkerPool - 工具执行池
+MCP服务器中的同步工具原本直接在服务器事件循环中执行，所有用户的图表代码执行、PDF解析等
+CPU密集步骤串行占用同一个核心。执行池将CPU密集的工具分发到多个工作进程并行执行，
+其余同步工具（网络请求、LLM调用）在线程中执行，服务器事件循环始终可以接收新的调用。
+工具执行期间的LLM调用用量随结果返回（见tools.llm_usage），工作进程中不保存统计
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from tools.llm_usage import call_with_usage
+
+logger = logging.getLogger(__name__)
+
+
+class ToolWorkerPool:
+    """工具执行池 - CPU密集的工具在工作进程中执行，其余同步工具在线程中执行"""
+
+    def __init__(self, process_workers: int = 0, process_tools: Iterable[str] = (),
+                 max_tasks_per_child: Optional[int] = None):
+        """
+        初始化工具执行池
+
+        Args:
+            process_workers: 工作进程数，<=0 时所有工具都在线程中执行
+            process_tools: 在工作进程中执行的工具名称
+            max_tasks_per_child: 每个工作进程最多执行的调用数，达到后替换为新进程（释放exec代码遗留的状态与内存）
+        """
+        self.process_workers = process_workers
+        self.process_tools = set(process_tools)
+        self.max_tasks_per_child = max_tasks_per_child if max_tasks_per_child and max_tasks_per_child > 0 else None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+        logger.info(f"ToolWorkerPool初始化完成，工作进程: {process_workers}，进程执行的工具: {sorted(self.process_tools) or '无'}")
+
+    def uses_process(self, tool_name: str) -> bool:
+        return self.process_workers > 0 and tool_name in self.process_tools
+
+    async def run(self, tool_name: str, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        执行工具函数
+
+        在工作进程中执行时func与参数需可pickle（模块级函数），返回值同样需可pickle
+
+        Args:
+            tool_name: 工具名称，决定在工作进程还是线程中执行
+            func: 同步工具函数
+            *args: 位置参数
+
+        Returns:
+            Any: 工具函数返回值（其间有LLM调用时附带llm_usage，见call_with_usage）
+        """
+        in_process = self.uses_process(tool_name)
+        stats = self._stats.setdefault(tool_name, {
+            "mode": "process" if in_process else "thread", "calls": 0, "errors": 0, "in_flight": 0, "total_time": 0.0
+        })
+        stats["calls"] += 1
+        stats["in_flight"] += 1
+        start_time = time.perf_counter()
+        try:
+            if in_process:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._get_pool(), call_with_usage, func, *args
+                )
+            return await asyncio.to_thread(call_with_usage, func, *args)
+        except BrokenProcessPool:
+            # 工作进程异常退出（如被OOM终止），下次调用时重建进程池
+            logger.error(f"工具 {tool_name} 的工作进程异常退出，重建进程池")
+            stats["errors"] += 1
+            self._discard_pool()
+            raise
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            stats["in_flight"] -= 1
+            stats["total_time"] += time.perf_counter() - start_time
+
+    def shutdown(self) -> None:
+        """关闭工作进程（等待执行中的调用结束）"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取各工具的执行方式、调用次数与平均耗时"""
+        return {
+            tool_name: {
+                **stats,
+                "total_time": round(stats["total_time"], 3),
+                "mean_time": round(stats["total_time"] / stats["calls"], 3) if stats["calls"] else None
+            }
+            for tool_name, stats in self._stats.items()
+        }
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn启动：MCP服务器进程中已有线程，fork可能复制持有中的锁
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=self.max_tasks_per_child
+            )
+        return self._pool
+
+    def _discard_pool(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
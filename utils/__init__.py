@@ -0,0 +1,13 @@
+"""
+通用工具模块
+不依赖core、tools、communication的基础函数，各层（包括MCP服务器及其工作进程）均可导入
+"""
+
+from .tokens import estimate_tokens
+from .tracing import TaskTrace, task_trace, span, traced, get_current_trace
+
+__all__ = [
+    'estimate_tokens',
+    # 任务追踪
+    'TaskTrace', 'task_trace', 'span', 'traced', 'get_current_trace'
+]
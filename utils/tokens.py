@@ -0,0 +1,17 @@
+"""
+token估算
+"""
+
+import re
+
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本token数
+
+    不依赖具体分词器的近似估算：中文字符及全角标点按每字1个token，其余字符按每4个字符1个token
+    """
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
@@ -0,0 +1,239 @@
+"""
+任务追踪
+记录一次任务中规划、LLM调用、MCP会话、工具执行、文件登记与报告写入的耗时区间，
+任务结束时写出Chrome trace-event格式的JSON（chrome://tracing 或 Perfetto 打开）。
+追踪通过contextvars传递到任务内创建的所有asyncio任务，每个asyncio任务显示为一条时间线；
+未启用追踪时span只做一次上下文变量读取，返回共享的空对象
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 单个任务最多记录的区间数，超出后丢弃并计数（避免异常任务占用过多内存）
+_MAX_EVENTS = 20000
+
+
+class _NoopSpan:
+    """未启用追踪时使用的空区间"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+        return False
+
+    def set(self, **args: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """一个耗时区间，退出时写入所属的追踪"""
+
+    __slots__ = ("trace", "name", "category", "args", "start_ns", "tid")
+
+    def __init__(self, trace: "TaskTrace", name: str, category: str, args: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start_ns = 0
+        self.tid = 0
+
+    def __enter__(self) -> "Span":
+        self.tid = self.trace.lane(self.name)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+        if exc_type is not None:
+            self.args["error"] = "cancelled" if exc_type is asyncio.CancelledError else f"{exc_type.__name__}: {exc_val}"
+        self.trace.add(self.name, self.category, self.start_ns, time.perf_counter_ns(), self.args, self.tid)
+        return False
+
+    def set(self, **args: Any) -> None:
+        """补充区间参数（如缓存是否命中、结果大小）"""
+        self.args.update(args)
+
+
+class TaskTrace:
+    """单个任务的追踪记录"""
+
+    def __init__(self, task_id: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None):
+        """
+        初始化任务追踪
+
+        Args:
+            task_id: 任务ID，规划前未知时可在之后设置，决定输出文件名
+            metadata: 写入输出文件otherData的附加信息（如用户ID）
+        """
+        self.trace_id = str(uuid.uuid4())
+        self.task_id = task_id
+        self.metadata = dict(metadata or {})
+        self.started_at = time.time()
+        self.dropped = 0
+        self._origin_ns = time.perf_counter_ns()
+        self._events: List[Dict[str, Any]] = []
+        # asyncio任务（或线程）到时间线编号的映射，每条时间线以其中最先开始的区间命名
+        self._lanes: Dict[Any, int] = {}
+        self._lane_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def lane(self, name: str) -> int:
+        """获取当前asyncio任务（或线程）的时间线编号，首次出现时以name命名"""
+        lane_key = _current_lane_key()
+        with self._lock:
+            tid = self._lanes.get(lane_key)
+            if tid is None:
+                tid = self._lanes[lane_key] = len(self._lanes) + 1
+                self._lane_names[tid] = name
+            return tid
+
+    def add(self, name: str, category: str, start_ns: int, end_ns: int, args: Optional[Dict[str, Any]] = None,
+            tid: Optional[int] = None) -> None:
+        """记录一个已结束的区间（时间为time.perf_counter_ns()），tid为空时记在当前时间线上"""
+        if tid is None:
+            tid = self.lane(name)
+        with self._lock:
+            if len(self._events) >= _MAX_EVENTS:
+                self.dropped += 1
+                return
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start_ns - self._origin_ns) / 1000,
+                "dur": (end_ns - start_ns) / 1000,
+                "pid": 1,
+                "tid": tid
+            }
+            if args:
+                event["args"] = args
+            self._events.append(event)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """生成Chrome trace-event格式的数据"""
+        with self._lock:
+            events = list(self._events)
+            lane_names = dict(self._lane_names)
+        metadata_events = [{
+            "name": "process_name", "ph": "M", "pid": 1, "tid": 0,
+            "args": {"name": f"task {self.task_id or self.trace_id}"}
+        }]
+        for tid, name in sorted(lane_names.items()):
+            metadata_events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}})
+            metadata_events.append({"name": "thread_sort_index", "ph": "M", "pid": 1, "tid": tid, "args": {"sort_index": tid}})
+        return {
+            "traceEvents": metadata_events + sorted(events, key=lambda event: event["ts"]),
+            "displayTimeUnit": "ms",
+            "otherData": {
+                **self.metadata,
+                "task_id": self.task_id,
+                "trace_id": self.trace_id,
+                "started_at": self.started_at,
+                "dropped_events": self.dropped
+            }
+        }
+
+    def save(self, trace_dir: str) -> Optional[str]:
+        """
+        写出追踪文件
+
+        Returns:
+            Optional[str]: 文件路径，写入失败返回None
+        """
+        trace_file = Path(trace_dir) / f"trace_{self.task_id or self.trace_id}.json"
+        try:
+            trace_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(trace_file, "w", encoding="utf-8") as f:
+                json.dump(self.to_chrome_trace(), f, ensure_ascii=False, default=str)
+        except OSError as e:
+            logger.warning(f"写入任务追踪文件失败: {trace_file} - {e}")
+            return None
+        logger.info(f"🧭 任务追踪已写入: {trace_file}")
+        return str(trace_file)
+
+
+def _current_lane_key() -> Any:
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return task if task is not None else threading.get_ident()
+
+
+_current_trace: ContextVar[Optional[TaskTrace]] = ContextVar("task_trace", default=None)
+
+
+def span(name: str, category: str = "task", **args: Any):
+    """
+    记录一个耗时区间，不在追踪作用域内时几乎没有开销
+
+    用法：
+        with span("tool:web_search_tool", "tool", cached=False) as s:
+            result = await call()
+            s.set(result_size=len(result))
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return Span(trace, name, category, args)
+
+
+def traced(name: str, category: str = "task") -> Callable:
+    """将异步函数的整次调用记录为一个区间的装饰器"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            trace = _current_trace.get()
+            if trace is None:
+                return await func(*args, **kwargs)
+            with Span(trace, name, category, {}):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def task_trace(trace_dir: str, enabled: bool = True, task_id: Optional[str] = None,
+               **metadata: Any) -> Iterator[Optional[TaskTrace]]:
+    """
+    在作用域内追踪一次任务，退出时写出追踪文件；未启用时产出None
+
+    用法：
+        with task_trace(settings.TRACE_DIR, settings.TRACE_ENABLED, user_id=user_id) as trace:
+            task_plan = await planner.analyze_task(user_input, user_id=user_id)
+            if trace:
+                trace.task_id = task_plan.task_id
+            result = await executor.execute_plan(task_plan, user_id)
+    """
+    if not enabled:
+        yield None
+        return
+    trace = TaskTrace(task_id, metadata)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace.save(trace_dir)
+
+
+def get_current_trace() -> Optional[TaskTrace]:
+    """获取当前任务的追踪，不在追踪作用域内时返回None"""
+    return _current_trace.get()